@@ -0,0 +1,229 @@
+"""
+In-process response cache for GET endpoints with ETag / If-None-Match support.
+
+Every table has a version counter. Any commit that inserted, updated or deleted rows of a table
+(CRUD repositories, bulk upserts from sync endpoints) bumps the counter of that table, which
+invalidates all cached responses that were built from it.
+Cached responses are kept in an LRU bounded by total body size.
+
+Responses under /sessions/{session_id}/... (SESSION_SCOPED_PATHS) are versioned per session: writes
+to rows of other sessions don't invalidate them.
+
+Writes from other processes (sync scripts) are not seen by the counters, so cached entries are
+also rebuilt after CACHE_TTL_SECONDS. The ETag is a hash of the body, so a rebuilt response with
+unchanged data still answers If-None-Match with 304.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from fastapi import Request, Response
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from starlette.middleware.base import BaseHTTPMiddleware
+
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_MAX_ENTRY_BYTES = 8 * 1024 * 1024
+CACHE_TTL_SECONDS = 300
+
+# first path segment -> tables the responses are built from
+CACHED_PATHS = {
+    "races": ("races",),
+    "drivers": ("drivers",),
+    "sessions": ("sessions",),
+    "laps": ("laps",),
+    "stints": ("stints",),
+    "telemetry": ("telemetry",),
+}
+
+# paths under CACHED_PATHS that are not built from the tables (telemetry store files written by other processes,
+# the trace cache checks their modification time), never cached
+UNCACHED_PATHS = {"/telemetry/trace"}
+
+# /sessions/{session_id}/<name> -> tables the response is built from, cached per session
+SESSION_SCOPED_PATHS = {
+    "pace": ("laps",),
+}
+
+# version key for writes whose session is not known (for example UPDATE ... WHERE), invalidates every session
+ANY_SESSION = "*"
+
+def session_key(table: str, session_id) -> str:
+    return f"{table}:{session_id}"
+
+def path_dependencies(path: str) -> Optional[Tuple[str, ...]]:
+    """Version keys a cached GET response of `path` depends on (None if the path is not cached)."""
+    parts = path.strip("/").split("/")
+    if "/" + "/".join(parts) in UNCACHED_PATHS:
+        return None
+    if len(parts) == 3 and parts[0] == "sessions" and parts[2] in SESSION_SCOPED_PATHS:
+        return tuple(
+            key
+            for table in SESSION_SCOPED_PATHS[parts[2]]
+            for key in (session_key(table, parts[1]), session_key(table, ANY_SESSION))
+        )
+    return CACHED_PATHS.get(parts[0])
+
+# response headers that are stored with the cached body (for example pagination cursor)
+STORED_HEADERS = ("content-type", "x-next-cursor")
+
+_versions: Dict[str, int] = defaultdict(int)
+_versions_lock = threading.Lock()
+
+def bump(*tables: str):
+    """Invalidate cached responses that depend on any of the tables."""
+    with _versions_lock:
+        for table in tables:
+            _versions[table] += 1
+
+def get_versions(tables: Tuple[str, ...]) -> Tuple[int, ...]:
+    with _versions_lock:
+        return tuple(_versions[table] for table in tables)
+
+@dataclass
+class CacheEntry:
+    versions: Tuple[int, ...]
+    etag: str
+    body: bytes
+    headers: Dict[str, str]
+    created: float
+
+class ResponseCache:
+    """Thread-safe LRU of CacheEntry, bounded by the total size of cached bodies."""
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, CacheEntry]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: tuple, entry: CacheEntry):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old.body)
+            self._entries[key] = entry
+            self._size += len(entry.body)
+            while self._size > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+response_cache = ResponseCache()
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+class ETagCacheMiddleware(BaseHTTPMiddleware):
+    """
+    Serves GET responses of CACHED_PATHS from response_cache while the versions of their tables
+    are unchanged, adds ETag headers and answers a matching If-None-Match with 304 Not Modified.
+    Only 200 JSON responses are cached (streamed NDJSON/CSV responses are passed through).
+    """
+    async def dispatch(self, request: Request, call_next):
+        tables = path_dependencies(request.url.path)
+        if request.method != "GET" or not tables:
+            return await call_next(request)
+
+        key = (request.url.path, tuple(sorted(request.query_params.multi_items())), request.headers.get("accept", ""))
+        versions = get_versions(tables)
+        if_none_match = request.headers.get("if-none-match")
+
+        entry = response_cache.get(key)
+        if entry is not None and entry.versions == versions and time.monotonic() - entry.created < CACHE_TTL_SECONDS:
+            if etag_matches(if_none_match, entry.etag):
+                return _not_modified(entry.etag)
+            return Response(content=entry.body, headers={**entry.headers, "ETag": entry.etag, "Cache-Control": "no-cache"})
+
+        response = await call_next(request)
+        if response.status_code != 200 or not response.headers.get("content-type", "").startswith("application/json"):
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        headers = {name: value for name, value in response.headers.items() if name in STORED_HEADERS}
+
+        if len(body) <= CACHE_MAX_ENTRY_BYTES:
+            response_cache.set(key, CacheEntry(versions, etag, body, headers, time.monotonic()))
+
+        if etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+        return Response(content=body, headers={**headers, "ETag": etag, "Cache-Control": "no-cache"})
+
+# collect tables written in a database session and bump their versions when the session commits
+WRITTEN_TABLES_KEY = "cache_written_tables"
+
+def _written_tables(session: Session) -> set:
+    return session.info.setdefault(WRITTEN_TABLES_KEY, set())
+
+def _add_written(session: Session, table, session_ids=None):
+    """Record a write to `table`; tables with a session_id column also record the written sessions."""
+    written = _written_tables(session)
+    written.add(table.name)
+    if "session_id" in table.c:
+        if session_ids is None:
+            written.add(session_key(table.name, ANY_SESSION))
+        else:
+            written.update(session_key(table.name, session_id) for session_id in session_ids)
+
+def _after_flush(session: Session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(obj, "__table__", None)
+        if table is None:
+            continue
+        session_ids = None
+        if "session_id" in table.c:
+            # current value and the value before an update that moved the row to another session
+            history = inspect(obj).attrs.session_id.history
+            session_ids = {obj.session_id, *history.deleted}
+        _add_written(session, table, session_ids)
+
+def _do_orm_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is None:
+            return
+        # INSERT with parameter rows (bulk upsert): sessions are known from the rows
+        session_ids = None
+        parameters = orm_execute_state.parameters
+        rows = parameters if isinstance(parameters, list) else [parameters or {}]
+        if orm_execute_state.is_insert and all("session_id" in row for row in rows):
+            session_ids = {row["session_id"] for row in rows}
+        _add_written(orm_execute_state.session, table, session_ids)
+
+def _after_commit(session: Session):
+    tables = session.info.pop(WRITTEN_TABLES_KEY, None)
+    if tables:
+        bump(*tables)
+
+def _after_rollback(session: Session):
+    session.info.pop(WRITTEN_TABLES_KEY, None)
+
+def register_invalidation_events():
+    """Listen to all ORM sessions so every committed write bumps the versions of written tables."""
+    if not event.contains(Session, "after_commit", _after_commit):
+        event.listen(Session, "after_flush", _after_flush)
+        event.listen(Session, "do_orm_execute", _do_orm_execute)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_rollback", _after_rollback)
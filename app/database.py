@@ -1,14 +1,109 @@
-from sqlalchemy import create_engine
+import asyncio
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
+from typing import Callable, Dict, Optional
 
-# SQLite connection URL
-DATABASE_URL = "sqlite:///./f1_stats.db"
+# database URL can be set with environment variable (default: SQLite file in project root)
+DATABASE_URL = os.getenv("F1_STATS_DATABASE_URL", "sqlite:///./f1_stats.db")
 
-# connection to the database
-engine = create_engine (DATABASE_URL, connect_args={"check_same_thread": False})
+# same database for the async engine used by API endpoints (SQLite through aiosqlite driver)
+ASYNC_DATABASE_URL = os.getenv("F1_STATS_ASYNC_DATABASE_URL", DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1))
 
-# session factory for database operations (CRUD)
+# SQLite settings for API + sync scripts running at the same time:
+# - WAL journal: readers don't block the writer and the writer doesn't block readers
+# - synchronous=NORMAL: safe with WAL, much faster commits
+# - busy_timeout: wait for a lock instead of failing with "database is locked"
+# - cache_size (negative = KiB) and mmap_size: keep hot pages in memory
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": int(os.getenv("F1_STATS_SQLITE_BUSY_TIMEOUT_MS", "30000")),
+    "cache_size": -int(os.getenv("F1_STATS_SQLITE_CACHE_KB", "65536")),
+    "mmap_size": int(os.getenv("F1_STATS_SQLITE_MMAP_BYTES", str(256 * 1024 * 1024))),
+    "temp_store": "MEMORY",
+}
+
+# journal_mode is stored in the database file, read-only connections don't change it
+READ_ONLY_SKIPPED_PRAGMAS = {"journal_mode"}
+
+def _set_pragmas_on_connect(engine: Engine, read_only: bool, pragmas: Optional[Dict]):
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            if read_only and name in READ_ONLY_SKIPPED_PRAGMAS:
+                continue
+            cursor.execute(f"PRAGMA {name} = {value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only = ON")
+        cursor.close()
+
+def create_db_engine(url: str = DATABASE_URL, read_only: bool = False, pragmas: Optional[Dict] = None, **kwargs) -> Engine:
+    """
+    Create an engine with the SQLite production profile (SQLITE_PRAGMAS, or `pragmas` if given).
+    read_only=True sets PRAGMA query_only on every connection, so the pool can only be used for reads.
+    Other databases get a plain engine.
+    """
+    if not url.startswith("sqlite"):
+        return create_engine(url, **kwargs)
+
+    engine = create_engine(url, connect_args={"check_same_thread": False}, **kwargs)
+    _set_pragmas_on_connect(engine, read_only, pragmas)
+    return engine
+
+def create_async_db_engine(url: str = ASYNC_DATABASE_URL, read_only: bool = False, pragmas: Optional[Dict] = None, **kwargs) -> AsyncEngine:
+    """Async version of create_db_engine (same SQLite profile), used with AsyncSession."""
+    engine = create_async_engine(url, **kwargs)
+    if url.startswith("sqlite"):
+        _set_pragmas_on_connect(engine.sync_engine, read_only, pragmas)
+    return engine
+
+# connection pool for writes (CRUD, sync) and a separate read-only pool for GET endpoints
+engine = create_db_engine(DATABASE_URL)
+read_engine = create_db_engine(DATABASE_URL, read_only=True, pool_size=int(os.getenv("F1_STATS_READ_POOL_SIZE", "10")))
+
+# async pools with the same split, used by API endpoints
+async_engine = create_async_db_engine(ASYNC_DATABASE_URL)
+async_read_engine = create_async_db_engine(ASYNC_DATABASE_URL, read_only=True, pool_size=int(os.getenv("F1_STATS_READ_POOL_SIZE", "10")))
+
+# session factories for database operations (CRUD)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# async session factories, objects stay loaded after commit because lazy loading is not possible in async code
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(bind=async_read_engine, autoflush=False, expire_on_commit=False)
 
 # base class for all ORM models
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+# dependency for read-only endpoints (GET)
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# async dependency for read-only endpoints (GET)
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+def _call_with_session(function: Callable, *args):
+    db = SessionLocal()
+    try:
+        return function(db, *args)
+    finally:
+        db.close()
+
+# run function(db, *args) with its own session in a worker thread, for whole-race pandas work and large writes
+# called from endpoints and background jobs (db.run_sync on an AsyncSession runs on the event loop
+# and every other request waits until it's done)
+async def run_in_thread(function: Callable, *args):
+    return await asyncio.to_thread(_call_with_session, function, *args)
@@ -0,0 +1,197 @@
+"""
+In-process background jobs for the OpenF1 sync endpoints.
+
+`POST .../sync?background=true` submits the sync as a job and answers 202 with the job, the work runs
+as an asyncio task on the API event loop, at most MAX_WORKERS jobs at once (the rest wait as "queued").
+GET /jobs/{job_id} returns live progress counters and stage timings, POST /jobs/{job_id}/cancel cancels it.
+
+A request for a sync that is already queued or running (same key, e.g. "laps:1229") gets the existing job
+instead of starting a second one. Finished jobs are kept for GET until MAX_FINISHED_JOBS newer jobs finished.
+Jobs live in the API process only, they are lost on restart.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import database, schemas
+from app.openf1_client import OpenF1Client, app_openf1_client
+
+MAX_WORKERS = int(os.getenv("F1_STATS_JOB_WORKERS", "2"))
+MAX_FINISHED_JOBS = 1000
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+class Job:
+    """One background sync: status, progress counters, stage timings (seconds) and the result or error."""
+    def __init__(self, key: str):
+        self.job_id = uuid.uuid4().hex
+        self.key = key
+        self.status = JOB_QUEUED
+        self.stage: Optional[str] = None
+        self.progress: Dict[str, int] = {}
+        self.timings: Dict[str, float] = {}
+        self.result = None
+        self.error: Optional[str] = None
+        self.created_at = _now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def count(self, **counters: int):
+        """Add to progress counters, e.g. job.count(fetched=120)."""
+        for name, value in counters.items():
+            self.progress[name] = self.progress.get(name, 0) + value
+
+# progress helpers for work functions that run with or without a job (job is None for synchronous requests)
+def count(job: Optional[Job], **counters: int):
+    if job is not None:
+        job.count(**counters)
+
+@contextmanager
+def stage(job: Optional[Job], name: str):
+    """Mark the current stage of the job and record how long it took in job.timings[name]."""
+    if job is None:
+        yield
+        return
+    job.stage = name
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        job.timings[name] = job.timings.get(name, 0.0) + time.perf_counter() - start
+
+class JobRunner:
+    """Runs jobs as asyncio tasks with at most `max_workers` running at once."""
+    def __init__(self, max_workers: int = MAX_WORKERS):
+        self.max_workers = max_workers
+        self._jobs: Dict[str, Job] = {}
+        self._active: Dict[str, Job] = {}
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # one semaphore per event loop (tests start a new loop for every TestClient)
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+            self._loop = loop
+        return self._semaphore
+
+    def submit(self, key: str, work: Callable[[Job], Awaitable]) -> Job:
+        """
+        Start `work(job)` in the background, or return the queued/running job with the same key.
+        Must be called from the event loop (an async endpoint).
+        """
+        job = self._active.get(key)
+        if job is not None and job.status in ACTIVE_STATUSES:
+            return job
+
+        job = Job(key)
+        self._jobs[job.job_id] = job
+        self._active[key] = job
+        job._task = asyncio.create_task(self._run(job, work))
+        return job
+
+    async def _run(self, job: Job, work: Callable[[Job], Awaitable]):
+        try:
+            async with self._get_semaphore():
+                job.status = JOB_RUNNING
+                job.started_at = _now()
+                job.result = await work(job)
+            job.status = JOB_SUCCEEDED
+        except asyncio.CancelledError:
+            job.status = JOB_CANCELLED
+        except HTTPException as e:
+            job.status = JOB_FAILED
+            job.error = str(e.detail)
+        except Exception as e:
+            job.status = JOB_FAILED
+            job.error = f"{type(e).__name__}: {e}"
+        finally:
+            job.finished_at = _now()
+            job.stage = None
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+            self._forget_old(job)
+
+    def _forget_old(self, job: Job):
+        self._finished[job.job_id] = None
+        while len(self._finished) > MAX_FINISHED_JOBS:
+            job_id, _ = self._finished.popitem(last=False)
+            self._jobs.pop(job_id, None)
+
+    def get(self, job_id: str) -> Job:
+        job = self._jobs.get(job_id)
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Job with job_id='{job_id}' is not found."
+            )
+        return job
+
+    async def cancel(self, job_id: str) -> Job:
+        """
+        Cancel a queued or running job and wait until it stopped
+        (batches that were already committed stay in the database).
+        """
+        job = self.get(job_id)
+        if job.status not in ACTIVE_STATUSES:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Job with job_id='{job_id}' is already {job.status}."
+            )
+        job._task.cancel()
+        await asyncio.wait({job._task})
+        return job
+
+    async def shutdown(self):
+        """
+        Cancel all queued and running jobs and wait until they stopped, called on app shutdown
+        before the OpenF1 client and the database engines are closed.
+        """
+        loop = asyncio.get_running_loop()
+        tasks = {
+            job._task for job in self._active.values()
+            if job._task is not None and not job._task.done() and job._task.get_loop() is loop
+        }
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+
+# shared runner of the API process
+job_runner = JobRunner()
+
+def submit_sync(app, key: str, sync: Callable[[AsyncSession, OpenF1Client, Job], Awaitable]) -> JSONResponse:
+    """
+    Submit `sync(db, openf1, job)` as a background job with its own database session and the app's OpenF1 client,
+    answer 202 with the job (Location: /jobs/{job_id}).
+    """
+    async def work(job: Job):
+        async with database.AsyncSessionLocal() as db, app_openf1_client(app) as openf1:
+            return await sync(db, openf1, job)
+
+    job = job_runner.submit(key, work)
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=schemas.Job.model_validate(job).model_dump(mode="json"),
+        headers={"Location": f"/jobs/{job.job_id}"}
+    )
@@ -1,8 +1,11 @@
 from fastapi import FastAPI, HTTPException, status
 from fastapi.responses import JSONResponse
-from app.database import Base, engine
-from app import models
-from app.routers import drivers, races, sessions, laps, stints, telemetry
+from app.database import Base, engine, async_engine, async_read_engine
+from app import models, migrations, cache
+from app.routers import drivers, races, sessions, laps, stints, telemetry, jobs, predict
+from app.openf1_client import OpenF1Client
+from app.jobs import job_runner
+from contextlib import asynccontextmanager
 import httpx
 from sqlalchemy.exc import SQLAlchemyError
 import logging
@@ -13,9 +16,45 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# aiosqlite logs every database call on DEBUG level
+logging.getLogger("aiosqlite").setLevel(logging.INFO)
 
-models.Base.metadata.create_all(bind=engine)
+# create missing tables and bring existing database files up to date (new columns, indexes) on startup,
+# before the first request; duplicate natural keys stop the startup with the affected tables and the command
+# that removes them, instead of an import error traceback
+def migrate_database():
+    models.Base.metadata.create_all(bind=engine)
+    try:
+        migrations.upgrade(engine)
+    except migrations.DuplicateKeysError:
+        tables = ", ".join(f"{table} ({count} keys)" for table, count in migrations.find_duplicate_keys(engine).items())
+        logger.error(
+            f"Database migration stopped, tables with duplicate natural keys: {tables}. "
+            "Remove the duplicates (the first inserted row is kept) with: python -m scripts.migrate_db --remove-duplicates"
+        )
+        raise SystemExit(1) from None
+
+# one shared OpenF1 client (connection pool, rate limiter) for all sync endpoints
+# on shutdown background jobs are cancelled first, then the client and the async database pools are closed
+# (aiosqlite connections run in their own threads)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    migrate_database()
+    async with OpenF1Client() as openf1_client:
+        app.state.openf1_client = openf1_client
+        try:
+            yield
+        finally:
+            await job_runner.shutdown()
+    app.state.openf1_client = None
+    await async_engine.dispose()
+    await async_read_engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
+
+# cache GET responses (ETag / 304), invalidated by database writes
+cache.register_invalidation_events()
+app.add_middleware(cache.ETagCacheMiddleware)
 
 # add drivers router
 app.include_router(drivers.router)
@@ -35,6 +74,12 @@ app.include_router(stints.router)
 # add telemetry router
 app.include_router(telemetry.router)
 
+# add background jobs router
+app.include_router(jobs.router)
+
+# add race pace prediction router
+app.include_router(predict.router)
+
 # root
 @app.get("/")
 def root():
@@ -0,0 +1,151 @@
+"""
+Schema migrations for existing SQLite database files.
+
+Base.metadata.create_all() only creates missing tables, it never changes a table that already exists
+(new columns and new indexes are not added). Every schema change for existing tables is added here
+as a new function at the end of MIGRATIONS. The number of applied migrations is stored in the
+SQLite header (PRAGMA user_version), so every migration runs only once per database file.
+Migrations must be safe to run on a database that was just created by create_all().
+"""
+
+from sqlalchemy.engine import Connection, Engine
+
+def _column_names(conn: Connection, table: str) -> set:
+    return {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+
+def _add_column(conn: Connection, table: str, column: str, column_type: str):
+    if column not in _column_names(conn, table):
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+class DuplicateKeysError(Exception):
+    """A unique index can't be created because the table has rows with the same natural key."""
+
+# natural keys of the upsert paths: table, primary key, unique index, key columns
+NATURAL_KEYS = [
+    ("laps", "lap_id", "uq_laps_lap", ["session_id", "driver_number", "lap_number"]),
+    ("stints", "stint_id", "uq_stints_stint", ["session_id", "driver_number", "stint_number"]),
+    ("telemetry", "telemetry_id", "uq_telemetry_lap", ["session_id", "driver_number", "lap_number"]),
+]
+
+# rows with a NULL in the key are never duplicates for a unique index
+def _key_not_null(key_columns: list) -> str:
+    return " AND ".join(f"{column} IS NOT NULL" for column in key_columns)
+
+def _duplicate_keys(conn: Connection, table: str, key_columns: list) -> list:
+    """Keys that occur more than once in the table, with their row count."""
+    key = ", ".join(key_columns)
+    return conn.exec_driver_sql(
+        f"SELECT {key}, COUNT(*) FROM {table} WHERE {_key_not_null(key_columns)} GROUP BY {key} HAVING COUNT(*) > 1"
+    ).all()
+
+def _create_unique_index(conn: Connection, table: str, index_name: str, key_columns: list):
+    """
+    Create a unique index on the key. Duplicate rows are not removed here (data is never deleted by a migration),
+    DuplicateKeysError lists them, remove_duplicate_keys (scripts/migrate_db.py --remove-duplicates) removes them.
+    """
+    duplicates = _duplicate_keys(conn, table, key_columns)
+    if duplicates:
+        shown = ", ".join(f"{tuple(row[:-1])} x{row[-1]}" for row in duplicates[:10])
+        more = f" and {len(duplicates) - 10} more" if len(duplicates) > 10 else ""
+        raise DuplicateKeysError(
+            f"Table {table} has {len(duplicates)} duplicate keys ({', '.join(key_columns)}): {shown}{more}. "
+            "Remove them (the first inserted row is kept) with: python -m scripts.migrate_db --remove-duplicates"
+        )
+    conn.exec_driver_sql(f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON {table} ({', '.join(key_columns)})")
+
+def find_duplicate_keys(engine: Engine) -> dict:
+    """Number of duplicate natural keys per table, only tables that have duplicates."""
+    found = {}
+    with engine.connect() as conn:
+        tables = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table, _, _, key_columns in NATURAL_KEYS:
+            if table in tables:
+                duplicates = _duplicate_keys(conn, table, key_columns)
+                if duplicates:
+                    found[table] = len(duplicates)
+    return found
+
+def remove_duplicate_keys(engine: Engine) -> dict:
+    """
+    Delete rows with the same natural key as an earlier row (keeps the first inserted row, rows with a NULL
+    in the key are not touched). Returns the number of removed rows per table.
+    """
+    removed = {}
+    with engine.begin() as conn:
+        tables = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table, pk, _, key_columns in NATURAL_KEYS:
+            if table not in tables:
+                continue
+            not_null = _key_not_null(key_columns)
+            result = conn.exec_driver_sql(
+                f"DELETE FROM {table} WHERE {not_null} AND {pk} NOT IN "
+                f"(SELECT MIN({pk}) FROM {table} WHERE {not_null} GROUP BY {', '.join(key_columns)})"
+            )
+            removed[table] = result.rowcount
+    return removed
+
+# 1: additional lap columns from FastF1 (replaces scripts/add_fastf1_laps_columns.py)
+def add_fastf1_lap_columns(conn: Connection):
+    _add_column(conn, "laps", "pit_in_time", "REAL")
+    _add_column(conn, "laps", "pit_out_time", "REAL")
+    _add_column(conn, "laps", "track_status", "TEXT")
+
+# 2: composite unique indexes on natural keys used by all upsert paths
+# (DuplicateKeysError if a table has duplicate keys, the migration is applied after they are removed)
+def add_natural_key_indexes(conn: Connection):
+    for table, _, index_name, key_columns in NATURAL_KEYS:
+        _create_unique_index(conn, table, index_name, key_columns)
+
+# 3: stint of every lap (equi-join instead of lap_number BETWEEN lap_start AND lap_end), filled for existing laps
+def add_lap_stint_columns(conn: Connection):
+    _add_column(conn, "laps", "stint_id", "INTEGER REFERENCES stints (stint_id)")
+    _add_column(conn, "laps", "stint_lap_number", "INTEGER")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_laps_stint_id ON laps (stint_id)")
+    # same rule as lap_repository.assign_lap_stints: the stint with the latest lap_start <= lap_number
+    conn.exec_driver_sql(
+        """
+        UPDATE laps SET stint_id = (
+            SELECT stints.stint_id FROM stints
+            WHERE stints.session_id = laps.session_id AND stints.driver_number = laps.driver_number
+              AND stints.lap_start <= laps.lap_number AND stints.lap_end IS NOT NULL
+            ORDER BY stints.lap_start DESC LIMIT 1
+        )
+        """
+    )
+    conn.exec_driver_sql(
+        """
+        UPDATE laps SET stint_id = NULL WHERE stint_id IS NOT NULL
+          AND lap_number > (SELECT lap_end FROM stints WHERE stints.stint_id = laps.stint_id)
+        """
+    )
+    conn.exec_driver_sql(
+        """
+        UPDATE laps SET stint_lap_number = lap_number - (SELECT lap_start FROM stints WHERE stints.stint_id = laps.stint_id) + 1
+        WHERE stint_id IS NOT NULL
+        """
+    )
+
+MIGRATIONS = [
+    add_fastf1_lap_columns,
+    add_natural_key_indexes,
+    add_lap_stint_columns,
+]
+
+def get_schema_version(conn: Connection) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+def upgrade(engine: Engine) -> int:
+    """
+    Apply all migrations that are not yet applied to the database, each one in its own transaction.
+    Returns the schema version after upgrade.
+    """
+    with engine.connect() as conn:
+        version = get_schema_version(conn)
+
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        with engine.begin() as conn:
+            migration(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {number}")
+        version = number
+
+    return version
@@ -8,5 +8,7 @@ from .lap import Lap
 from .session import Session
 from .stint import Stint
 from .telemetry import Telemetry
+from .sync_state import SyncState
+from .lap_feature import LapFeature
 
-__all__ = ["Driver", "Race", "Lap", "Session", "Stint", "Telemetry"]
\ No newline at end of file
+__all__ = ["Driver", "Race", "Lap", "Session", "Stint", "Telemetry", "SyncState", "LapFeature"]
\ No newline at end of file
@@ -1,12 +1,12 @@
 #SQLAlchemy ORM models
 
-from sqlalchemy import Column, String, Integer, Float, Boolean, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, String, Integer, Float, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 from app.models import Base
 
 # SQLAlchemy model for storing F1 laps. 
-# Each lap is uniquely identified by ...
+# Each lap is uniquely identified by session_id + driver_number + lap_number.
 
 class Lap(Base):
     __tablename__ = "laps"
@@ -28,4 +28,13 @@ class Lap(Base):
     # from FastF1 library
     pit_in_time = Column(Float, nullable=True)
     pit_out_time = Column(Float, nullable=True)
-    track_status = Column(String, nullable=True)
\ No newline at end of file
+    track_status = Column(String, nullable=True)
+
+    # stint the lap belongs to and lap number within the stint (1 = first lap of the stint),
+    # assigned after stint and lap sync (lap_repository.assign_lap_stints)
+    stint_id = Column(Integer, ForeignKey("stints.stint_id"), nullable=True, index=True)
+    stint_lap_number = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("uq_laps_lap", "session_id", "driver_number", "lap_number", unique=True),
+    )
@@ -0,0 +1,34 @@
+#SQLAlchemy ORM models
+
+from sqlalchemy import Column, String, Integer, Float, ForeignKey, Index
+from app.database import Base
+from app.models import Base
+
+# SQLAlchemy model for the ML feature table: laps joined with races, sessions, drivers and stints, already cleaned.
+# One row per exported lap (lap_id), rows of a session are rebuilt by sync (lap_feature_repository.refresh_lap_features).
+
+class LapFeature(Base):
+    __tablename__ = "lap_features"
+
+    lap_id = Column(Integer, ForeignKey("laps.lap_id"), primary_key=True)
+    race_id = Column(Integer, nullable=False, index=True)
+    session_id = Column(Integer, nullable=False)
+    session_name = Column(String, nullable=True)
+    driver_id = Column(String, nullable=True)
+    circuit_location = Column(String, nullable=True)
+    lap_number = Column(Integer, nullable=True)
+    stint_number = Column(Integer, nullable=True)
+    stint_lap_number = Column(Integer, nullable=True)
+    tyre_compound = Column(String, nullable=True)
+    tyre_age_at_start = Column(Integer, nullable=True)
+    duration_sector_1 = Column(Float, nullable=True)
+    duration_sector_2 = Column(Float, nullable=True)
+    duration_sector_3 = Column(Float, nullable=True)
+    pit_in_time = Column(Float, nullable=True)
+    pit_out_time = Column(Float, nullable=True)
+    track_status = Column(String, nullable=True)
+    lap_duration = Column(Float, nullable=True)
+
+    __table_args__ = (
+        Index("ix_lap_features_session", "session_id"),
+    )
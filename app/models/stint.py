@@ -1,9 +1,12 @@
 #SQLAlchemy ORM models
 
-from sqlalchemy import Column, String, Integer, ForeignKey
+from sqlalchemy import Column, String, Integer, ForeignKey, Index
 from app.database import Base
 from app.models import Base
 
+# SQLAlchemy model for storing F1 stints.
+# Each stint is uniquely identified by session_id + driver_number + stint_number.
+
 class Stint(Base):
     __tablename__ = "stints"
 
@@ -15,4 +18,8 @@ class Stint(Base):
     lap_start = Column(Integer, nullable=True)
     lap_end = Column(Integer, nullable=True)
     tyre_compound = Column(String, nullable=True)
-    tyre_age_at_start = Column(Integer, nullable=True)
\ No newline at end of file
+    tyre_age_at_start = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("uq_stints_stint", "session_id", "driver_number", "stint_number", unique=True),
+    )
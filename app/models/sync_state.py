@@ -0,0 +1,27 @@
+#SQLAlchemy ORM models
+
+from sqlalchemy import Column, String, Integer, DateTime, Index
+from app.database import Base
+from app.models import Base
+
+# SQLAlchemy model for sync checkpoints of the sync scripts.
+# Each row is uniquely identified by source + race_id + session_id + stage
+# (session_id is 0 for stages that are synced per race, e.g. OpenF1 laps of a whole meeting).
+
+class SyncState(Base):
+    __tablename__ = "sync_state"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    source = Column(String, nullable=False)
+    race_id = Column(Integer, nullable=False, index=True)
+    session_id = Column(Integer, nullable=False, default=0)
+    stage = Column(String, nullable=False)
+    status = Column(String, nullable=False)
+    row_count = Column(Integer, nullable=True)
+    content_hash = Column(String, nullable=True)
+    last_attempt_at = Column(DateTime, nullable=True)
+    failure_reason = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("uq_sync_state_key", "source", "race_id", "session_id", "stage", unique=True),
+    )
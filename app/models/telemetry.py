@@ -1,9 +1,12 @@
 #SQLAlchemy ORM models
 
-from sqlalchemy import Column, Integer, Float, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, Float, ForeignKey, Index
 from app.database import Base
 from app.models import Base
 
+# SQLAlchemy model for storing lap-level aggregated telemetry.
+# Each row is uniquely identified by session_id + driver_number + lap_number (same key as laps).
+
 class Telemetry(Base):
     __tablename__ = "telemetry"
 
@@ -19,12 +22,6 @@ class Telemetry(Base):
     brake_usage = Column(Float, nullable=True)
     drs_usage = Column(Integer, nullable=True)
 
-    __table_args = (
-        UniqueConstraint(
-            "race_id",
-            "session_id",
-            "driver_number",
-            "lap_number",
-            name="uq_telemetry_lap"
-        ),
-    )
\ No newline at end of file
+    __table_args__ = (
+        Index("uq_telemetry_lap", "session_id", "driver_number", "lap_number", unique=True),
+    )
@@ -0,0 +1,283 @@
+"""
+Shared async client for the OpenF1 API.
+
+- one pooled httpx.AsyncClient (connections are reused between requests)
+- bounded number of concurrent requests
+- token-bucket rate limiter (replaces fixed sleeps between requests)
+- retry with exponential backoff for timeouts, connection errors, 429 and 5xx responses
+- streaming of large JSON array responses in fixed-size batches (iter_json_batches)
+"""
+
+import asyncio
+import json
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from fastapi import Request
+from typing import Any, AsyncIterator, Callable, Iterable, Optional, Tuple
+import httpx
+
+OPENF1_BASE_URL = "https://api.openf1.org/v1"
+
+# defaults are kept below the public OpenF1 rate limits
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_RATE_PER_SECOND = 3.0
+DEFAULT_BURST = 3
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_TIMEOUT = 30
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# records per batch when a JSON array response is streamed
+DEFAULT_STREAM_BATCH_SIZE = 1000
+
+# errors of a single request in fetch_ordered (failed request, body that is not JSON),
+# yielded as the result of that item so the other items are still fetched
+FETCH_ERRORS = (httpx.HTTPError, ValueError)
+
+class InvalidJSONError(ValueError):
+    """Response body is not the expected JSON (raised while parsing a streamed JSON array)."""
+
+_json_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+async def iter_json_array(chunks: AsyncIterator[str], batch_size: int = DEFAULT_STREAM_BATCH_SIZE) -> AsyncIterator[list]:
+    """
+    Incrementally parse a JSON array from text chunks and yield its items in lists of up to `batch_size`.
+    Only the unparsed rest of the text and one batch are kept in memory, not the whole array.
+    Raises InvalidJSONError if the text is not a JSON array.
+    """
+    buffer = ""
+    position = 0
+    # next token: "[" at the start, then "value" / "," / "]", "end" after the closing bracket
+    expect = "["
+    batch = []
+    done = False
+
+    while not done:
+        chunk = await anext(chunks, None)
+        done = chunk is None
+        if chunk:
+            buffer = buffer[position:] + chunk
+            position = 0
+
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position == len(buffer):
+                break
+            char = buffer[position]
+
+            if expect == "end":
+                raise InvalidJSONError("Extra data after the JSON array.")
+            if expect == "[":
+                if char != "[":
+                    raise InvalidJSONError("Expected a JSON array.")
+                expect = "first"
+                position += 1
+            elif char == "]" and expect in ("first", ","):
+                expect = "end"
+                position += 1
+            elif char == "," and expect == ",":
+                expect = "value"
+                position += 1
+            elif expect == ",":
+                raise InvalidJSONError(f"Invalid JSON array at {char!r}.")
+            else:
+                try:
+                    item, end = _json_decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if done:
+                        raise InvalidJSONError("Invalid JSON array.")
+                    break
+                # a value that ends with the buffer (e.g. a number) may continue in the next chunk
+                if end == len(buffer) and not done:
+                    break
+
+                batch.append(item)
+                position = end
+                expect = ","
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+
+    if expect != "end":
+        raise InvalidJSONError("Incomplete JSON array.")
+    if batch:
+        yield batch
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter: allows `burst` requests at once and then `rate` requests per second.
+    """
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class OpenF1Client:
+    """
+    Async OpenF1 client. Use as `async with OpenF1Client() as client:`.
+    `transport` can be set to an httpx transport (for example httpx.MockTransport) for tests and benchmarks.
+    """
+    def __init__(
+        self,
+        base_url: str = OPENF1_BASE_URL,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        rate_per_second: float = DEFAULT_RATE_PER_SECOND,
+        burst: int = DEFAULT_BURST,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        timeout: float = DEFAULT_TIMEOUT,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._rate_limiter = TokenBucket(rate_per_second, burst)
+        self._client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/") + "/",
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            transport=transport
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        # honor Retry-After (seconds) from 429/503 responses, otherwise exponential backoff with jitter
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.replace(".", "", 1).isdigit():
+                return float(retry_after)
+        return self.backoff * (2 ** attempt) * (0.5 + random.random() / 2)
+
+    async def get(self, endpoint: str, params: Optional[dict] = None, stream: bool = False) -> httpx.Response:
+        """
+        GET {base_url}/{endpoint} with bounded concurrency, rate limiting and retries.
+        With stream=True only the headers are read, the caller reads the body and closes the response.
+        Raises httpx.HTTPError when the request still fails after all retries.
+        """
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            async with self._semaphore:
+                await self._rate_limiter.acquire()
+                try:
+                    request = self._client.build_request("GET", endpoint, params=params)
+                    response = await self._client.send(request, stream=stream)
+                except (httpx.TimeoutException, httpx.NetworkError):
+                    if last_attempt:
+                        raise
+                    response = None
+
+            if response is not None:
+                if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                    if response.is_error and stream:
+                        await response.aread()
+                        await response.aclose()
+                    response.raise_for_status()
+                    return response
+                if stream:
+                    await response.aclose()
+
+            # wait outside of the semaphore so other requests can use the slot
+            await asyncio.sleep(self._retry_delay(attempt, response))
+
+    async def get_json(self, endpoint: str, params: Optional[dict] = None) -> Any:
+        response = await self.get(endpoint, params)
+        return response.json()
+
+    async def iter_json_batches(
+        self,
+        endpoint: str,
+        params: Optional[dict] = None,
+        batch_size: int = DEFAULT_STREAM_BATCH_SIZE
+    ) -> AsyncIterator[list]:
+        """
+        Like get_json for endpoints that return a JSON array, but the body is parsed while it is downloaded
+        and yielded in lists of up to `batch_size` items, so memory doesn't grow with the response size.
+        Raises httpx.HTTPError for failed requests and InvalidJSONError if the body is not a JSON array.
+        """
+        response = await self.get(endpoint, params, stream=True)
+        try:
+            async for batch in iter_json_array(response.aiter_text(), batch_size):
+                yield batch
+        finally:
+            await response.aclose()
+
+    async def fetch_ordered(
+        self,
+        endpoint: str,
+        items: Iterable[Any],
+        params: Callable[[Any], dict],
+        window: Optional[int] = None
+    ) -> AsyncIterator[Tuple[Any, Any]]:
+        """
+        Fetch `endpoint` for every item concurrently and yield (item, json) in the same order as `items`,
+        so the caller can write results in order while the next requests are already running.
+        At most `window` responses are fetched ahead of the caller (default 2 x max_concurrency).
+        If a request fails or its body is not JSON, the exception (one of FETCH_ERRORS) is yielded instead of json.
+        """
+        window = window or 2 * self.max_concurrency
+        pending = deque()
+
+        async def fetch(item):
+            try:
+                return await self.get_json(endpoint, params(item))
+            except FETCH_ERRORS as e:
+                return e
+
+        try:
+            for item in items:
+                pending.append((item, asyncio.ensure_future(fetch(item))))
+                if len(pending) >= window:
+                    item, task = pending.popleft()
+                    yield item, await task
+
+            while pending:
+                item, task = pending.popleft()
+                yield item, await task
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+# shared client created on app startup (see app/main.py),
+# or a short-lived client if the app runs without lifespan (for example in tests)
+@asynccontextmanager
+async def app_openf1_client(app) -> AsyncIterator[OpenF1Client]:
+    client = getattr(app.state, "openf1_client", None)
+    if client is not None:
+        yield client
+    else:
+        async with OpenF1Client() as client:
+            yield client
+
+# dependency for routers
+async def get_openf1_client(request: Request):
+    async with app_openf1_client(request.app) as client:
+        yield client
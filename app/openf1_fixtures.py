@@ -0,0 +1,129 @@
+"""
+Record/replay of OpenF1 responses for offline tests and benchmarks.
+
+- RecordingTransport forwards requests to the real OpenF1 API and saves every successful response body
+  as a gzip compressed file (one file per endpoint + query parameters)
+- ReplayTransport serves the saved files without network, with optional latency and a rate limit
+  (requests over the limit get 429 with Retry-After, like the real API)
+
+Both are httpx transports, so they plug into OpenF1Client(transport=...):
+
+    async with OpenF1Client(transport=ReplayTransport("data/openf1_fixtures", latency=0.05)) as client:
+        await sync_all_laps_async(client)
+
+Fixtures are recorded with scripts/record_openf1_fixtures.py.
+"""
+
+import asyncio
+import gzip
+import json
+import time
+from pathlib import Path
+from typing import Any, Optional, Union
+from urllib.parse import quote
+import httpx
+
+FIXTURE_SUFFIX = ".json.gz"
+
+# file name of one response: endpoint and sorted query parameters, e.g. laps__meeting_key=1229.json.gz
+def fixture_name(endpoint: str, params: Optional[dict] = None) -> str:
+    name = endpoint.strip("/").rsplit("/", 1)[-1]
+    for key, value in sorted((params or {}).items()):
+        name += f"__{quote(str(key), safe='')}={quote(str(value), safe='')}"
+    return name + FIXTURE_SUFFIX
+
+def _request_fixture_name(request: httpx.Request) -> str:
+    return fixture_name(request.url.path, dict(request.url.params))
+
+# save one response body (already decoded json) as a fixture, used by the recorder and by synthetic benchmark data
+def write_fixture(directory: Union[str, Path], endpoint: str, params: Optional[dict], data: Any) -> Path:
+    path = Path(directory) / fixture_name(endpoint, params)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(gzip.compress(json.dumps(data, separators=(",", ":")).encode()))
+    return path
+
+def read_fixture(directory: Union[str, Path], endpoint: str, params: Optional[dict] = None) -> Any:
+    return json.loads(gzip.decompress((Path(directory) / fixture_name(endpoint, params)).read_bytes()))
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """
+    Forwards requests to `transport` (real network by default) and saves bodies of 200 responses to `directory`.
+    """
+    def __init__(self, directory: Union[str, Path], transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._transport = transport or httpx.AsyncHTTPTransport()
+        self.recorded = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self._transport.handle_async_request(request)
+        if response.status_code != 200:
+            return response
+
+        body = await response.aread()
+        await response.aclose()
+        path = self.directory / _request_fixture_name(request)
+        await asyncio.to_thread(path.write_bytes, gzip.compress(body))
+        self.recorded += 1
+        return httpx.Response(200, headers={"Content-Type": "application/json"}, content=body, request=request)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    Serves recorded fixtures from `directory` (404 for requests that were not recorded).
+    - latency: seconds added to every response
+    - rate_per_second / burst: token-bucket rate limit, requests over the limit get 429 with Retry-After
+    Counts served requests and 429 responses (`requests`, `rate_limited`).
+    """
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        latency: float = 0.0,
+        rate_per_second: Optional[float] = None,
+        burst: int = 1
+    ):
+        self.directory = Path(directory)
+        self.latency = latency
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._cache = {}
+        self.requests = 0
+        self.rate_limited = 0
+
+    def _take_token(self) -> float:
+        """Take a token, returns 0 if allowed or the seconds until the next token."""
+        if self.rate_per_second is None:
+            return 0.0
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate_per_second
+
+    def _load(self, name: str) -> Optional[bytes]:
+        # decompressed bodies are kept in memory, so benchmarks don't measure gzip
+        if name not in self._cache:
+            path = self.directory / name
+            self._cache[name] = gzip.decompress(path.read_bytes()) if path.exists() else None
+        return self._cache[name]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        retry_after = self._take_token()
+        if retry_after:
+            self.rate_limited += 1
+            return httpx.Response(429, headers={"Retry-After": f"{retry_after:.3f}"}, json={"detail": "rate limited"}, request=request)
+
+        body = self._load(_request_fixture_name(request))
+        if body is None:
+            return httpx.Response(404, json={"detail": "no fixture recorded"}, request=request)
+        return httpx.Response(200, headers={"Content-Type": "application/json"}, content=body, request=request)
@@ -0,0 +1,40 @@
+from fastapi import Response
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query
+from typing import Optional, Union
+
+# response header that carries the cursor for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def _page_query(query: Union[Query, Select], pk_column, cursor: Optional[int], limit: int):
+    if cursor is not None:
+        query = query.filter(pk_column > cursor)
+    return query.order_by(pk_column).limit(limit + 1)
+
+def _split_page(rows: list, pk_column, limit: int):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = getattr(rows[-1], pk_column.key)
+    return rows, next_cursor
+
+def paginate(query: Query, pk_column, cursor: Optional[int], limit: int):
+    """
+    Keyset (cursor) pagination on the primary key.
+    Returns rows with pk > cursor ordered by pk and the cursor for the next page
+    (None if this is the last page).
+    One extra row is fetched to know if another page exists, so no COUNT(*) is needed.
+    """
+    rows = _page_query(query, pk_column, cursor, limit).all()
+    return _split_page(rows, pk_column, limit)
+
+async def paginate_async(db: AsyncSession, stmt: Select, pk_column, cursor: Optional[int], limit: int):
+    """Same as paginate for a select() of columns executed with an AsyncSession (rows are Row tuples)."""
+    rows = (await db.execute(_page_query(stmt, pk_column, cursor, limit))).all()
+    return _split_page(rows, pk_column, limit)
+
+def set_next_cursor(response: Response, next_cursor: Optional[int]):
+    """Expose the next page cursor in the response headers (only if there is a next page)."""
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = str(next_cursor)
@@ -0,0 +1,94 @@
+"""
+Race pace models (pipelines saved by ml/race_pace_*.py with ml.utils.save_model) for prediction in the API.
+
+Models are loaded lazily on the first request and kept in an LRU cache keyed by model name and the
+modification time of model.pkl, so a retrained model is loaded again (its old version is dropped) and a few
+models can be served side by side. A batch of laps is scored with one vectorized predict call.
+Random forests saved by save_model are memory-mapped on load, so API workers share their tree arrays.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from ml import utils
+
+# saved models, ml/models/{model_name}/model.pkl
+MODELS_DIR = Path(os.environ.get("F1_STATS_MODELS_DIR", utils.ML_DIR / "models"))
+DEFAULT_MODEL = "race_pace_random_forest_tuned"
+MODEL_CACHE_SIZE = 4
+
+# model input columns (prepare_data in ml/race_pace_*.py)
+NUMERIC_FEATURES = ["lap_number", "stint_number", "stint_lap_number", "tyre_age_at_start", "pit_in_time", "pit_out_time"]
+CATEGORICAL_FEATURES = ["driver_id", "tyre_compound", "circuit_location", "session_name"]
+
+class ModelCache:
+    """LRU cache of loaded models per model name and model.pkl modification time."""
+    def __init__(self, max_entries: int = MODEL_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int], object]" = OrderedDict()
+        # guards _entries and _loading, never held while a model is loaded
+        self._lock = threading.Lock()
+        # one lock per model being loaded, so concurrent requests don't load the same model twice
+        # while requests for other models are served from the cache
+        self._loading: Dict[Tuple[str, int], threading.Lock] = {}
+
+    def _cached(self, key: Tuple[str, int]):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            return None
+
+    def get(self, model_name: str, models_dir: Optional[Path] = None):
+        """Loaded model, FileNotFoundError if the model is not saved."""
+        models_dir = models_dir or MODELS_DIR
+        path = utils.model_path(model_name, models_dir)
+        key = (str(path), path.stat().st_mtime_ns)
+        model = self._cached(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.Lock())
+        with loading:
+            # loaded by another request while this one waited
+            model = self._cached(key)
+            if model is not None:
+                return model
+            try:
+                model = utils.load_model(model_name, models_dir)
+                with self._lock:
+                    # older versions of a retrained model are not used anymore
+                    for old_key in [old_key for old_key in self._entries if old_key[0] == key[0]]:
+                        del self._entries[old_key]
+                    self._entries[key] = model
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+            return model
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# shared cache of the API process
+model_cache = ModelCache()
+
+def features_frame(laps: Sequence) -> pd.DataFrame:
+    """
+    Model input of a batch of laps (objects with the feature attributes, e.g. schemas.RacePaceFeatures),
+    built column by column, numeric columns as float with NaN for missing values.
+    """
+    columns = {column: np.array([getattr(lap, column) for lap in laps], dtype=np.float64) for column in NUMERIC_FEATURES}
+    columns.update({column: [getattr(lap, column) for lap in laps] for column in CATEGORICAL_FEATURES})
+    return pd.DataFrame(columns)
+
+def predict_lap_durations(model, laps: Sequence) -> np.ndarray:
+    """Predicted lap durations of a batch of laps, one predict call."""
+    return np.asarray(model.predict(features_frame(laps)), dtype=np.float64).reshape(-1)
@@ -0,0 +1,121 @@
+import asyncio
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from typing import Callable, Dict, Iterable, List, Optional
+from app import database, models, schemas
+
+# number of rows written per INSERT ... ON CONFLICT executemany (one transaction per batch)
+BATCH_SIZE = 1000
+
+def _existing_keys(db: Session, table, key_columns: List[str], keys: List[tuple]) -> set:
+    """Return which of the given natural keys already exist in the table (one indexed query)."""
+    columns = [table.c[column] for column in key_columns]
+    if len(columns) == 1:
+        query = select(columns[0]).where(columns[0].in_([key[0] for key in keys]))
+    else:
+        query = select(*columns).where(tuple_(*columns).in_(keys))
+    return {tuple(row) for row in db.execute(query)}
+
+def bulk_upsert(
+    db: Session,
+    model,
+    rows: Iterable[Dict],
+    key_columns: List[str],
+    batch_size: int = BATCH_SIZE,
+    on_batch: Optional[Callable[[int, int], None]] = None
+) -> Dict[str, int]:
+    """
+    Insert new rows and update existing rows (matched by the unique natural key in key_columns)
+    with SQLite INSERT ... ON CONFLICT DO UPDATE, executed as executemany and committed once per batch.
+    NULL values never overwrite existing values, same as the per-row updates that skipped None.
+    If the same key appears more than once, the last row wins.
+    on_batch(created, updated) is called after every committed batch (progress of background sync jobs).
+    Returns count of created and updated rows.
+    """
+    table = model.__table__
+
+    # deduplicate by natural key, keeping the order of first appearance
+    unique_rows = {}
+    for row in rows:
+        unique_rows[tuple(row[column] for column in key_columns)] = row
+    unique_rows = list(unique_rows.items())
+
+    created = 0
+    updated = 0
+
+    for start in range(0, len(unique_rows), batch_size):
+        batch = unique_rows[start:start + batch_size]
+        keys = [key for key, _ in batch]
+        values = [row for _, row in batch]
+
+        existing = _existing_keys(db, table, key_columns, keys)
+
+        stmt = insert(table)
+        update_columns = [column for column in values[0] if column not in key_columns]
+        if update_columns:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=key_columns,
+                set_={column: func.coalesce(stmt.excluded[column], table.c[column]) for column in update_columns}
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=key_columns)
+
+        try:
+            db.execute(stmt, values)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        updated += len(existing)
+        created += len(batch) - len(existing)
+        if on_batch is not None:
+            on_batch(len(batch) - len(existing), len(existing))
+
+    return {"created": created, "updated": updated}
+
+# upsert laps by (session_id, driver_number, lap_number)
+def upsert_laps(db: Session, laps: Iterable[schemas.LapCreate], on_batch: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    return bulk_upsert(db, models.Lap, (lap.model_dump() for lap in laps), ["session_id", "driver_number", "lap_number"], on_batch=on_batch)
+
+# upsert stints by (session_id, driver_number, stint_number)
+def upsert_stints(db: Session, stints: Iterable[schemas.StintCreate], on_batch: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    return bulk_upsert(db, models.Stint, (stint.model_dump() for stint in stints), ["session_id", "driver_number", "stint_number"], on_batch=on_batch)
+
+# upsert sessions by session_id
+def upsert_sessions(db: Session, sessions: Iterable[schemas.SessionCreate], on_batch: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    return bulk_upsert(db, models.Session, (session.model_dump() for session in sessions), ["session_id"], on_batch=on_batch)
+
+# upsert drivers by driver_id
+def upsert_drivers(db: Session, drivers: Iterable[schemas.DriverCreate], on_batch: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    return bulk_upsert(db, models.Driver, (driver.model_dump() for driver in drivers), ["driver_id"], on_batch=on_batch)
+
+# upsert races by race_id
+def upsert_races(db: Session, races: Iterable[schemas.RaceCreate], on_batch: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    return bulk_upsert(db, models.Race, (race.model_dump() for race in races), ["race_id"], on_batch=on_batch)
+
+# progress callbacks of the async variants run on the event loop, not in the worker thread
+# (job progress is read by GET /jobs/{job_id} on the loop)
+def _on_loop(on_batch: Optional[Callable[[int, int], None]]) -> Optional[Callable[[int, int], None]]:
+    if on_batch is None:
+        return None
+    loop = asyncio.get_running_loop()
+    return lambda created, updated: loop.call_soon_threadsafe(on_batch, created, updated)
+
+# async variants for sync endpoints and background jobs, the upsert (deduplication, model_dump and executemany
+# of a whole meeting) runs in a worker thread with its own session, so other requests aren't blocked
+async def upsert_laps_async(laps: Iterable[schemas.LapCreate], on_batch: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    return await database.run_in_thread(upsert_laps, laps, _on_loop(on_batch))
+
+async def upsert_stints_async(stints: Iterable[schemas.StintCreate], on_batch: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    return await database.run_in_thread(upsert_stints, stints, _on_loop(on_batch))
+
+async def upsert_sessions_async(sessions: Iterable[schemas.SessionCreate], on_batch: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    return await database.run_in_thread(upsert_sessions, sessions, _on_loop(on_batch))
+
+async def upsert_drivers_async(drivers: Iterable[schemas.DriverCreate], on_batch: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    return await database.run_in_thread(upsert_drivers, drivers, _on_loop(on_batch))
+
+async def upsert_races_async(races: Iterable[schemas.RaceCreate], on_batch: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    return await database.run_in_thread(upsert_races, races, _on_loop(on_batch))
@@ -1,6 +1,9 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from app import models, schemas
+from app.serialization import schema_columns
 
 # return all drivers from the database
 def get_all_drivers(db: Session):
@@ -61,3 +64,32 @@ def delete_driver(db: Session, driver_id: str):
     db.commit()
     return {"detail": f"Driver '{driver_id}' is deleted."}
 
+# async variants for API endpoints (AsyncSession)
+# reads build the same queries with select(), writes run the functions above on the async connection
+
+# columns returned by list endpoints (fields of schemas.Driver, plain tuples without ORM objects)
+DRIVER_COLUMNS = schema_columns(models.Driver, schemas.Driver)
+
+# return all drivers from the database as column tuples (async)
+async def get_all_drivers_async(db: AsyncSession):
+    return (await db.execute(select(*DRIVER_COLUMNS))).all()
+
+# return a driver by driver_id if it exists (async)
+async def get_driver_by_driver_id_async(db: AsyncSession, driver_id: str):
+    driver = await db.get(models.Driver, driver_id)
+    if not driver:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Driver with driver_id='{driver_id}' is not found."
+        )
+    return driver
+
+# create, update and delete (async)
+async def create_driver_async(db: AsyncSession, driver: schemas.DriverCreate):
+    return await db.run_sync(create_driver, driver)
+
+async def update_driver_async(db: AsyncSession, driver_id: str, driver_update: schemas.DriverUpdate):
+    return await db.run_sync(update_driver, driver_id, driver_update)
+
+async def delete_driver_async(db: AsyncSession, driver_id: str):
+    return await db.run_sync(delete_driver, driver_id)
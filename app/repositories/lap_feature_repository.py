@@ -0,0 +1,162 @@
+import pandas as pd
+from typing import Iterable, Optional
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+from app import database, models
+
+# columns of the ML dataset (table lap_features, scripts/export_laps.py) and their pandas dtypes
+LAP_FEATURE_COLUMNS = {
+    "race_id": "Int64",
+    "session_id": "Int64",
+    "session_name": "string",
+    "driver_id": "string",
+    "circuit_location": "string",
+    "lap_number": "Int64",
+    "stint_number": "Int64",
+    "stint_lap_number": "Int64",
+    "tyre_compound": "string",
+    "tyre_age_at_start": "Int64",
+    "duration_sector_1": "float64",
+    "duration_sector_2": "float64",
+    "duration_sector_3": "float64",
+    "pit_in_time": "float64",
+    "pit_out_time": "float64",
+    "track_status": "string",
+    "lap_duration": "float64",
+}
+
+# sessions in the ML dataset
+FEATURE_SESSION_NAMES = ["Race", "Practice 2"]
+
+def laps_mask(df: pd.DataFrame) -> pd.Series:
+    """
+    Rows to keep, all conditions in one vectorized mask:
+    - lap_duration, tyre_compound and all sectors are not NULL, tyre_compound is not UNKNOWN
+    - not an out lap
+    - no outliers (laps between 60 and 150 s)
+    """
+    mask = (
+        df["lap_duration"].notnull()
+        & df["tyre_compound"].notnull()
+        & (df["tyre_compound"] != "UNKNOWN")
+        & (df["lap_duration"] > 60) & (df["lap_duration"] < 150)
+        & df[["duration_sector_1", "duration_sector_2", "duration_sector_3"]].notnull().all(axis=1)
+    )
+    if "is_pit_out_lap" in df.columns:
+        mask &= df["is_pit_out_lap"] == False
+    return mask.fillna(False).astype(bool)
+
+def clean_laps_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Remove:
+    - NULL values for lap_duration, tyre_compound, sectors
+    - out laps
+    - outliers (very long or very short laps)
+    - if any of duration sectors is NULL
+    """
+    return df[laps_mask(df)].reset_index(drop=True)
+
+# join laps + races + drivers + stints (Race and Practice 2 sessions),
+# with since_race only races after that race_id, with session_ids only these sessions
+# all joins are equi-joins, laps are joined to their stint by laps.stint_id
+def lap_features_query(db: Session, since_race: Optional[int] = None, session_ids: Optional[Iterable[int]] = None):
+    query = (
+        db.query(
+            models.Lap.race_id,
+            models.Lap.session_id,
+            models.Session.session_name,
+            models.Driver.driver_id,
+            models.Race.location.label("circuit_location"),
+            models.Lap.lap_number,
+            models.Stint.stint_number,
+            models.Lap.stint_lap_number,
+            models.Stint.tyre_compound,
+            models.Stint.tyre_age_at_start,
+            models.Lap.duration_sector_1,
+            models.Lap.duration_sector_2,
+            models.Lap.duration_sector_3,
+            models.Lap.pit_in_time,
+            models.Lap.pit_out_time,
+            models.Lap.track_status,
+            models.Lap.lap_duration
+        )
+        .join(models.Race, models.Lap.race_id == models.Race.race_id)
+        .join(models.Session, models.Lap.session_id == models.Session.session_id)
+        .join(models.Driver, models.Lap.driver_number == models.Driver.driver_number)
+        # stint assigned to the lap during sync (lap_repository.assign_lap_stints)
+        .join(models.Stint, models.Lap.stint_id == models.Stint.stint_id)
+        .filter(models.Session.session_name.in_(FEATURE_SESSION_NAMES))
+    )
+    if since_race is not None:
+        query = query.filter(models.Lap.race_id > since_race)
+    if session_ids is not None:
+        query = query.filter(models.Lap.session_id.in_(list(session_ids)))
+    return query
+
+# cleaned lap_features rows (dicts with lap_id) of a lap_features_query
+def _feature_records(query) -> list:
+    columns = list(LAP_FEATURE_COLUMNS) + ["lap_id"]
+    df = clean_laps_dataframe(pd.DataFrame(query.add_columns(models.Lap.lap_id).all(), columns=columns).astype(LAP_FEATURE_COLUMNS))
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+def refresh_lap_features(db: Session, session_ids: Iterable[int]) -> int:
+    """
+    Rebuild the lap_features rows of the given sessions from laps, stints, races and drivers
+    (same join and cleaning as the dataset export), rows of other sessions are not touched.
+    Returns the number of rows written.
+    """
+    session_ids = list(session_ids)
+    if not session_ids:
+        return 0
+
+    records = _feature_records(lap_features_query(db, session_ids=session_ids))
+    try:
+        db.execute(delete(models.LapFeature).where(models.LapFeature.session_id.in_(session_ids)))
+        if records:
+            db.execute(insert(models.LapFeature), records)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(records)
+
+def refresh_lap_feature_rows(db: Session, lap_ids: Iterable[int]) -> int:
+    """
+    Rebuild the lap_features rows of the given laps only (lap or stint written through the API),
+    without commit so they are written in the same transaction. Returns the number of rows written.
+    """
+    lap_ids = list(lap_ids)
+    if not lap_ids:
+        return 0
+
+    records = _feature_records(lap_features_query(db).filter(models.Lap.lap_id.in_(lap_ids)))
+    db.execute(delete(models.LapFeature).where(models.LapFeature.lap_id.in_(lap_ids)))
+    if records:
+        db.execute(insert(models.LapFeature), records)
+    return len(records)
+
+# rebuild lap_features of all dataset sessions of a race (after stint or lap sync of the race)
+def refresh_race_lap_features(db: Session, race_id: int) -> int:
+    session_ids = db.scalars(
+        select(models.Session.session_id)
+        .where(models.Session.race_id == race_id, models.Session.session_name.in_(FEATURE_SESSION_NAMES))
+    ).all()
+    return refresh_lap_features(db, session_ids)
+
+def load_lap_features(db: Session, session_name: Optional[str] = None) -> pd.DataFrame:
+    """
+    The ML dataset from table lap_features, optionally only one session type (e.g. "Race").
+    Columns have the same plain dtypes as a DataFrame read from the exported CSV.
+    """
+    query = select(*(getattr(models.LapFeature, column) for column in LAP_FEATURE_COLUMNS)).order_by(models.LapFeature.lap_id)
+    if session_name is not None:
+        query = query.where(models.LapFeature.session_name == session_name)
+    # read_sql builds the DataFrame from the cursor without ORM rows
+    df = pd.read_sql(query, db.connection())
+    # float columns stay float even when all values are NULL
+    return df.astype({column: dtype for column, dtype in LAP_FEATURE_COLUMNS.items() if dtype == "float64"})
+
+# async variant for sync endpoints and background jobs, runs the function above in a worker thread
+# with its own session (join and pandas cleaning of a whole race would block the event loop)
+async def refresh_race_lap_features_async(race_id: int) -> int:
+    return await database.run_in_thread(refresh_race_lap_features, race_id)
@@ -1,10 +1,41 @@
+import bisect
+import pandas as pd
+from typing import List, Optional, Tuple
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
-from app import models, schemas
+from app import database, models, schemas
+from app.repositories import lap_feature_repository
+from app.serialization import schema_columns
+from app.pagination import paginate, paginate_async
 
-# return all laps from the database
-def get_all_laps(db: Session):
-    return db.query(models.Lap).all()
+# apply optional list filters (race, session, driver, lap number range)
+def filter_laps(query, params: schemas.LapListParams):
+    if params.race_id is not None:
+        query = query.filter(models.Lap.race_id == params.race_id)
+    if params.session_id is not None:
+        query = query.filter(models.Lap.session_id == params.session_id)
+    if params.driver_number is not None:
+        query = query.filter(models.Lap.driver_number == params.driver_number)
+    if params.lap_number_min is not None:
+        query = query.filter(models.Lap.lap_number >= params.lap_number_min)
+    if params.lap_number_max is not None:
+        query = query.filter(models.Lap.lap_number <= params.lap_number_max)
+    return query
+
+# return one page of laps from the database and the cursor for the next page
+def get_all_laps(db: Session, params: schemas.LapListParams):
+    query = filter_laps(db.query(models.Lap), params)
+    return paginate(query, models.Lap.lap_id, params.cursor, params.limit)
+
+# return all laps matching the filters as plain column tuples, read from the database in chunks
+# (used for streaming responses, limit is ignored)
+def stream_laps(db: Session, params: schemas.LapListParams, batch_size: int = 1000):
+    query = filter_laps(db.query(*models.Lap.__table__.columns), params)
+    if params.cursor is not None:
+        query = query.filter(models.Lap.lap_id > params.cursor)
+    return query.order_by(models.Lap.lap_id).yield_per(batch_size)
 
 # return a lap by lap_id if it exists
 def get_lap_by_lap_id(db: Session, lap_id: int):
@@ -41,7 +72,12 @@ def create_lap(db: Session, lap: schemas.LapCreate):
             )
 
     db_lap = models.Lap(**lap.model_dump())
+    # the new lap gets its stint in the same transaction (export and lap_features join laps to stints by stint_id)
+    db_lap.stint_id, db_lap.stint_lap_number = find_lap_stint(db, db_lap.session_id, db_lap.driver_number, db_lap.lap_number)
     db.add(db_lap)
+    db.flush()
+    # lap_features row of the new lap (the ML dataset is read from that table)
+    lap_feature_repository.refresh_lap_feature_rows(db, [db_lap.lap_id])
     db.commit()
     db.refresh(db_lap)
     return db_lap
@@ -59,7 +95,12 @@ def update_lap(db: Session, lap_id: int, lap_update: schemas.LapUpdate):
     for field, value in update_data.items():
         if value is not None:
             setattr(lap_exists, field, value)
+    lap_exists.stint_id, lap_exists.stint_lap_number = find_lap_stint(
+        db, lap_exists.session_id, lap_exists.driver_number, lap_exists.lap_number
+    )
 
+    db.flush()
+    lap_feature_repository.refresh_lap_feature_rows(db, [lap_id])
     db.commit()
     db.refresh(lap_exists)
     return lap_exists
@@ -72,7 +113,148 @@ def delete_lap(db: Session, lap_id: int):
             status_code=status.HTTP_404_NOT_FOUND, 
             detail=f"Lap with this lap_id='{lap_id}' is not found."
         )
+    # lap_features.lap_id has no ON DELETE cascade (and SQLite doesn't enforce foreign keys)
+    db.execute(delete(models.LapFeature).where(models.LapFeature.lap_id == lap_id))
     db.delete(lap_exists)
     db.commit()
     return {"detail": f"Lap '{lap_id}' is deleted."}
 
+# assign every lap of a race to its stint (stint_id, stint_lap_number), one interval search per session and driver:
+# merge_asof picks the stint with the latest lap_start <= lap_number, laps after its lap_end get no stint
+# only laps whose assignment changed are written (one executemany UPDATE), returns their count
+def assign_lap_stints(db: Session, race_id: int) -> int:
+    laps = pd.DataFrame(
+        db.execute(
+            select(models.Lap.lap_id, models.Lap.session_id, models.Lap.driver_number, models.Lap.lap_number,
+                   models.Lap.stint_id, models.Lap.stint_lap_number)
+            .where(models.Lap.race_id == race_id, models.Lap.driver_number.isnot(None), models.Lap.lap_number.isnot(None))
+        ).all(),
+        columns=["lap_id", "session_id", "driver_number", "lap_number", "stint_id", "stint_lap_number"]
+    )
+    if laps.empty:
+        return 0
+    stints = pd.DataFrame(
+        db.execute(
+            select(models.Stint.stint_id, models.Stint.session_id, models.Stint.driver_number, models.Stint.lap_start, models.Stint.lap_end)
+            .where(models.Stint.race_id == race_id, models.Stint.lap_start.isnot(None), models.Stint.lap_end.isnot(None))
+        ).all(),
+        columns=["new_stint_id", "session_id", "driver_number", "lap_start", "lap_end"]
+    )
+
+    key_types = {"session_id": "int64", "driver_number": "int64"}
+    matched = pd.merge_asof(
+        laps.astype({**key_types, "lap_number": "int64"}).sort_values("lap_number"),
+        stints.astype({**key_types, "lap_start": "int64"}).sort_values("lap_start"),
+        left_on="lap_number",
+        right_on="lap_start",
+        by=["session_id", "driver_number"],
+        direction="backward"
+    )
+    # laps without a stint (before the first stint or after lap_end) get NULL
+    in_stint = (matched["lap_number"] <= matched["lap_end"].astype("Int64")).fillna(False).astype(bool)
+    new_stint_id = matched["new_stint_id"].where(in_stint).astype("Int64")
+    new_stint_lap_number = (matched["lap_number"] - matched["lap_start"] + 1).where(in_stint).astype("Int64")
+
+    def changed(old: pd.Series, new: pd.Series) -> pd.Series:
+        old = old.astype("Int64")
+        return (old != new).fillna(old.isna() != new.isna())
+
+    changes = changed(matched["stint_id"], new_stint_id) | changed(matched["stint_lap_number"], new_stint_lap_number)
+    if not changes.any():
+        return 0
+
+    records = [
+        {"lap_id": int(lap_id), "stint_id": None if pd.isna(stint_id) else int(stint_id),
+         "stint_lap_number": None if pd.isna(stint_lap_number) else int(stint_lap_number)}
+        for lap_id, stint_id, stint_lap_number in zip(matched["lap_id"][changes], new_stint_id[changes], new_stint_lap_number[changes])
+    ]
+    try:
+        db.execute(update(models.Lap), records)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(records)
+
+# stint of one lap by the rule of assign_lap_stints (latest lap_start <= lap_number, lap_number <= lap_end),
+# one indexed lookup for API writes of a single lap, returns (stint_id, stint_lap_number) or (None, None)
+def find_lap_stint(db: Session, session_id: int, driver_number: Optional[int], lap_number: Optional[int]) -> Tuple[Optional[int], Optional[int]]:
+    if driver_number is None or lap_number is None:
+        return None, None
+    stint = db.execute(
+        select(models.Stint.stint_id, models.Stint.lap_start, models.Stint.lap_end)
+        .where(models.Stint.session_id == session_id, models.Stint.driver_number == driver_number,
+               models.Stint.lap_start <= lap_number, models.Stint.lap_end.isnot(None))
+        .order_by(models.Stint.lap_start.desc())
+        .limit(1)
+    ).first()
+    if stint is None or lap_number > stint.lap_end:
+        return None, None
+    return stint.stint_id, lap_number - stint.lap_start + 1
+
+# assign the laps of one driver in a session with lap_number in [lap_min, lap_max] to their stints
+# (after a stint is written through the API: its old and new lap range), same rule as assign_lap_stints
+# changed laps are written without commit (same transaction as the stint write), returns the lap_ids in the range
+def assign_driver_lap_stints(db: Session, session_id: int, driver_number: int, lap_min: int, lap_max: int) -> List[int]:
+    stints = db.execute(
+        select(models.Stint.stint_id, models.Stint.lap_start, models.Stint.lap_end)
+        .where(models.Stint.session_id == session_id, models.Stint.driver_number == driver_number,
+               models.Stint.lap_start.isnot(None), models.Stint.lap_end.isnot(None))
+        .order_by(models.Stint.lap_start)
+    ).all()
+    laps = db.execute(
+        select(models.Lap.lap_id, models.Lap.lap_number, models.Lap.stint_id, models.Lap.stint_lap_number)
+        .where(models.Lap.session_id == session_id, models.Lap.driver_number == driver_number,
+               models.Lap.lap_number.between(lap_min, lap_max))
+    ).all()
+
+    lap_starts = [stint.lap_start for stint in stints]
+    records = []
+    for lap in laps:
+        # latest stint with lap_start <= lap_number
+        position = bisect.bisect_right(lap_starts, lap.lap_number) - 1
+        stint = stints[position] if position >= 0 else None
+        if stint is None or lap.lap_number > stint.lap_end:
+            stint_id, stint_lap_number = None, None
+        else:
+            stint_id, stint_lap_number = stint.stint_id, lap.lap_number - stint.lap_start + 1
+        if (stint_id, stint_lap_number) != (lap.stint_id, lap.stint_lap_number):
+            records.append({"lap_id": lap.lap_id, "stint_id": stint_id, "stint_lap_number": stint_lap_number})
+    if records:
+        db.execute(update(models.Lap), records)
+    return [lap.lap_id for lap in laps]
+
+# async variants for API endpoints (AsyncSession)
+# reads build the same queries with select(), writes run the functions above on the async connection
+
+# columns returned by list endpoints (fields of schemas.Lap, plain tuples without ORM objects)
+LAP_COLUMNS = schema_columns(models.Lap, schemas.Lap)
+
+# return one page of laps as column tuples and the cursor for the next page (async)
+async def get_all_laps_async(db: AsyncSession, params: schemas.LapListParams):
+    stmt = filter_laps(select(*LAP_COLUMNS), params)
+    return await paginate_async(db, stmt, models.Lap.lap_id, params.cursor, params.limit)
+
+# return a lap by lap_id if it exists (async)
+async def get_lap_by_lap_id_async(db: AsyncSession, lap_id: int):
+    lap = await db.get(models.Lap, lap_id)
+    if not lap:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Lap with lap_id='{lap_id}' is not found."
+        )
+    return lap
+
+# create, update and delete (async)
+async def create_lap_async(db: AsyncSession, lap: schemas.LapCreate):
+    return await db.run_sync(create_lap, lap)
+
+async def update_lap_async(db: AsyncSession, lap_id: int, lap_update: schemas.LapUpdate):
+    return await db.run_sync(update_lap, lap_id, lap_update)
+
+async def delete_lap_async(db: AsyncSession, lap_id: int):
+    return await db.run_sync(delete_lap, lap_id)
+
+# whole race pandas pass, in a worker thread with its own session (sync endpoints and background jobs)
+async def assign_lap_stints_async(race_id: int) -> int:
+    return await database.run_in_thread(assign_lap_stints, race_id)
@@ -0,0 +1,30 @@
+import asyncio
+from fastapi import HTTPException, status
+from app import schemas
+from app.race_pace_model import DEFAULT_MODEL, model_cache, predict_lap_durations
+
+# predict lap durations of a batch of laps with a saved race pace model (loaded once, kept in the model cache)
+def predict_race_pace(request: schemas.RacePaceRequest) -> schemas.RacePacePrediction:
+    model_name = request.model or DEFAULT_MODEL
+    try:
+        model = model_cache.get(model_name)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Model '{model_name}' is not found."
+        )
+
+    try:
+        lap_durations = predict_lap_durations(model, request.laps)
+    except ValueError as e:
+        # e.g. a driver, tyre compound or circuit the model was not trained on
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Model '{model_name}' can't score these laps: {e}"
+        )
+
+    return schemas.RacePacePrediction(model=model_name, lap_durations=lap_durations.tolist())
+
+# model loading and predict are CPU work, run in a thread so the event loop keeps serving requests
+async def predict_race_pace_async(request: schemas.RacePaceRequest) -> schemas.RacePacePrediction:
+    return await asyncio.to_thread(predict_race_pace, request)
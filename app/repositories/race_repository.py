@@ -1,6 +1,9 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from app import models, schemas
+from app.serialization import schema_columns
 
 # return all races from the database
 def get_all_races(db: Session):
@@ -61,3 +64,32 @@ def delete_race(db: Session, race_id: int):
     db.commit()
     return {"detail": f"Race '{race_id}' is deleted."}
 
+# async variants for API endpoints (AsyncSession)
+# reads build the same queries with select(), writes run the functions above on the async connection
+
+# columns returned by list endpoints (fields of schemas.Race, plain tuples without ORM objects)
+RACE_COLUMNS = schema_columns(models.Race, schemas.Race)
+
+# return all races from the database as column tuples (async)
+async def get_all_races_async(db: AsyncSession):
+    return (await db.execute(select(*RACE_COLUMNS))).all()
+
+# return a race by race_id if it exists (async)
+async def get_race_by_race_id_async(db: AsyncSession, race_id: int):
+    race = await db.get(models.Race, race_id)
+    if not race:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Race with race_id='{race_id}' is not found."
+        )
+    return race
+
+# create, update and delete (async)
+async def create_race_async(db: AsyncSession, race: schemas.RaceCreate):
+    return await db.run_sync(create_race, race)
+
+async def update_race_async(db: AsyncSession, race_id: int, race_update: schemas.RaceUpdate):
+    return await db.run_sync(update_race, race_id, race_update)
+
+async def delete_race_async(db: AsyncSession, race_id: int):
+    return await db.run_sync(delete_race, race_id)
@@ -1,6 +1,9 @@
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from app import models, schemas
+from app.serialization import schema_columns
 
 # return all sessions from the database
 def get_all_sessions(db: Session):
@@ -61,3 +64,79 @@ def delete_session(db: Session, id: int):
     db.commit()
     return {"detail": f"Session '{id}' is deleted."}
 
+# async variants for API endpoints (AsyncSession)
+# reads build the same queries with select(), writes run the functions above on the async connection
+
+# columns returned by list endpoints (fields of schemas.Session, plain tuples without ORM objects)
+SESSION_COLUMNS = schema_columns(models.Session, schemas.Session)
+
+# return all sessions from the database as column tuples (async)
+async def get_all_sessions_async(db: AsyncSession):
+    return (await db.execute(select(*SESSION_COLUMNS))).all()
+
+# return a session by id if it exists (async)
+async def get_session_by_id_async(db: AsyncSession, id: int):
+    session = await db.get(models.Session, id)
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Session with id='{id}' is not found."
+        )
+    return session
+
+# create, update and delete (async)
+async def create_session_async(db: AsyncSession, session: schemas.SessionCreate):
+    return await db.run_sync(create_session, session)
+
+async def update_session_async(db: AsyncSession, id: int, session_update: schemas.SessionUpdate):
+    return await db.run_sync(update_session, id, session_update)
+
+async def delete_session_async(db: AsyncSession, id: int):
+    return await db.run_sync(delete_session, id)
+
+# lap or sector time, None for missing and 0 placeholders
+def _timed(column):
+    return case((column > 0, column))
+
+def session_pace_query(session_id: int):
+    """
+    One query for the pace summary of every driver in a session (laps.session_id).
+    A window pass ranks timed laps per driver (untimed laps last), then GROUP BY driver picks
+    best lap, sector bests and the median (average of the middle one or two ranked laps).
+    """
+    lap = models.Lap
+    lap_time = _timed(lap.lap_duration)
+    ranked = select(
+        lap.driver_number,
+        lap_time.label("lap_time"),
+        _timed(lap.duration_sector_1).label("sector_1"),
+        _timed(lap.duration_sector_2).label("sector_2"),
+        _timed(lap.duration_sector_3).label("sector_3"),
+        func.row_number().over(partition_by=lap.driver_number, order_by=(lap_time.is_(None), lap_time)).label("lap_rank"),
+        func.count(lap_time).over(partition_by=lap.driver_number).label("timed_laps")
+    ).where(lap.session_id == session_id).subquery()
+
+    middle = ranked.c.lap_rank.in_([(ranked.c.timed_laps + 1) // 2, (ranked.c.timed_laps + 2) // 2])
+    best_sectors = [func.min(ranked.c.sector_1), func.min(ranked.c.sector_2), func.min(ranked.c.sector_3)]
+    best_lap = func.min(ranked.c.lap_time)
+
+    return select(
+        ranked.c.driver_number,
+        func.count().label("lap_count"),
+        best_lap.label("best_lap"),
+        func.avg(case((middle, ranked.c.lap_time))).label("median_lap"),
+        best_sectors[0].label("best_sector_1"),
+        best_sectors[1].label("best_sector_2"),
+        best_sectors[2].label("best_sector_3"),
+        (best_sectors[0] + best_sectors[1] + best_sectors[2]).label("theoretical_best")
+    ).group_by(ranked.c.driver_number).order_by(best_lap.is_(None), best_lap, ranked.c.driver_number)
+
+# return pace summary per driver for a session (async)
+async def get_session_pace_async(db: AsyncSession, session_id: int):
+    pace = (await db.execute(session_pace_query(session_id))).all()
+    if not pace:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No laps found for session_id='{session_id}'."
+        )
+    return pace
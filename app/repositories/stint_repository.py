@@ -1,10 +1,33 @@
+from typing import List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from app import models, schemas
+from app.repositories import lap_feature_repository
+from app.repositories.lap_repository import assign_driver_lap_stints
+from app.serialization import schema_columns
+from app.pagination import paginate, paginate_async
 
-# return all stints from the database
-def get_all_stints(db: Session):
-    return db.query(models.Stint).all()
+# apply optional list filters (race, session, driver)
+# lap number range returns stints that overlap the range
+def filter_stints(query, params: schemas.LapListParams):
+    if params.race_id is not None:
+        query = query.filter(models.Stint.race_id == params.race_id)
+    if params.session_id is not None:
+        query = query.filter(models.Stint.session_id == params.session_id)
+    if params.driver_number is not None:
+        query = query.filter(models.Stint.driver_number == params.driver_number)
+    if params.lap_number_min is not None:
+        query = query.filter(models.Stint.lap_end >= params.lap_number_min)
+    if params.lap_number_max is not None:
+        query = query.filter(models.Stint.lap_start <= params.lap_number_max)
+    return query
+
+# return one page of stints from the database and the cursor for the next page
+def get_all_stints(db: Session, params: schemas.LapListParams):
+    query = filter_stints(db.query(models.Stint), params)
+    return paginate(query, models.Stint.stint_id, params.cursor, params.limit)
 
 # return a stint by stint_id if it exists
 def get_stint_by_stint_id(db: Session, stint_id: int):
@@ -16,6 +39,22 @@ def get_stint_by_stint_id(db: Session, stint_id: int):
         )
     return stint
 
+# laps a stint covers (lap_start, lap_end), None if a bound is missing (the stint is not assigned to laps)
+def lap_range(stint: models.Stint) -> Optional[Tuple[int, int]]:
+    if stint.lap_start is None or stint.lap_end is None:
+        return None
+    return stint.lap_start, stint.lap_end
+
+# assign the laps of the stint's driver and session within the given lap ranges to their stints again,
+# returns the lap_ids in the ranges
+def assign_stint_laps(db: Session, stint: models.Stint, *ranges: Optional[Tuple[int, int]]) -> List[int]:
+    ranges = [lap_range for lap_range in ranges if lap_range is not None]
+    if not ranges or stint.driver_number is None:
+        return []
+    lap_min = min(lap_start for lap_start, _ in ranges)
+    lap_max = max(lap_end for _, lap_end in ranges)
+    return assign_driver_lap_stints(db, stint.session_id, stint.driver_number, lap_min, lap_max)
+
 # create a new stint in the database (if stint_id doesn't already exist)
 def create_stint(db: Session, stint: schemas.StintCreate):
     stint_exists = db.query(models.Stint).filter(
@@ -32,6 +71,10 @@ def create_stint(db: Session, stint: schemas.StintCreate):
     
     db_stint = models.Stint(**stint.model_dump())
     db.add(db_stint)
+    db.flush()
+    # laps of the stint are assigned to it and their lap_features rows rebuilt in the same transaction
+    lap_ids = assign_stint_laps(db, db_stint, lap_range(db_stint))
+    lap_feature_repository.refresh_lap_feature_rows(db, lap_ids)
     db.commit()
     db.refresh(db_stint)
     return db_stint
@@ -45,11 +88,17 @@ def update_stint(db: Session, stint_id: int, stint_update: schemas.StintUpdate):
             detail=f"Session with this stint_id='{stint_id}' is not found."
         )
 
+    old_range = lap_range(stint_exists)
     update_data = stint_update.model_dump()
     for field, value in update_data.items():
         if value is not None:
             setattr(stint_exists, field, value)
+    db.flush()
 
+    # lap_start / lap_end may have changed, laps of the old and the new range are assigned again
+    # (tyre columns of their lap_features rows may have changed as well)
+    lap_ids = assign_stint_laps(db, stint_exists, old_range, lap_range(stint_exists))
+    lap_feature_repository.refresh_lap_feature_rows(db, lap_ids)
     db.commit()
     db.refresh(stint_exists)
     return stint_exists
@@ -62,7 +111,42 @@ def delete_stint(db: Session, stint_id: int):
             status_code=status.HTTP_404_NOT_FOUND, 
             detail=f"Stint with this stint_id='{stint_id}' is not found."
         )
+    old_range = lap_range(stint_exists)
     db.delete(stint_exists)
+    db.flush()
+    # laps of the deleted stint get no stint (foreign keys are not enforced in SQLite), nor lap_features rows
+    lap_ids = assign_stint_laps(db, stint_exists, old_range)
+    lap_feature_repository.refresh_lap_feature_rows(db, lap_ids)
     db.commit()
     return {"detail": f"Stint '{stint_id}' is deleted."}
 
+# async variants for API endpoints (AsyncSession)
+# reads build the same queries with select(), writes run the functions above on the async connection
+
+# columns returned by list endpoints (fields of schemas.Stint, plain tuples without ORM objects)
+STINT_COLUMNS = schema_columns(models.Stint, schemas.Stint)
+
+# return one page of stints as column tuples and the cursor for the next page (async)
+async def get_all_stints_async(db: AsyncSession, params: schemas.LapListParams):
+    stmt = filter_stints(select(*STINT_COLUMNS), params)
+    return await paginate_async(db, stmt, models.Stint.stint_id, params.cursor, params.limit)
+
+# return a stint by stint_id if it exists (async)
+async def get_stint_by_stint_id_async(db: AsyncSession, stint_id: int):
+    stint = await db.get(models.Stint, stint_id)
+    if not stint:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Stint with stint_id='{stint_id}' is not found."
+        )
+    return stint
+
+# create, update and delete (async)
+async def create_stint_async(db: AsyncSession, stint: schemas.StintCreate):
+    return await db.run_sync(create_stint, stint)
+
+async def update_stint_async(db: AsyncSession, stint_id: int, stint_update: schemas.StintUpdate):
+    return await db.run_sync(update_stint, stint_id, stint_update)
+
+async def delete_stint_async(db: AsyncSession, stint_id: int):
+    return await db.run_sync(delete_stint, stint_id)
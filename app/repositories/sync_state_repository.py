@@ -0,0 +1,114 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+from sqlalchemy.orm import Session
+from app import models
+from app.serialization import dumps
+
+# sync_state status values
+SYNC_DONE = "done"
+SYNC_FAILED = "failed"
+SYNC_SKIPPED = "skipped"
+
+# session_id of stages that are synced per race
+RACE_LEVEL = 0
+
+# sha256 of the JSON encoded data (fetched OpenF1 json or records built from FastF1)
+def content_hash(data) -> str:
+    return hashlib.sha256(dumps(data)).hexdigest()
+
+# last_attempt_at is stored as naive UTC
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class ContentHasher:
+    """content_hash of a list that is received in batches (same digest as content_hash(whole_list))."""
+    def __init__(self):
+        self._hash = hashlib.sha256(b"[")
+        self.count = 0
+
+    def update(self, items: list):
+        for item in items:
+            if self.count:
+                self._hash.update(b",")
+            self._hash.update(dumps(item))
+            self.count += 1
+
+    def hexdigest(self) -> str:
+        digest = self._hash.copy()
+        digest.update(b"]")
+        return digest.hexdigest()
+
+# return sync states of one source + stage as {(race_id, session_id): SyncState}
+def get_states(db: Session, source: str, stage: str) -> Dict[Tuple[int, int], models.SyncState]:
+    states = (
+        db.query(models.SyncState)
+        .filter(models.SyncState.source == source, models.SyncState.stage == stage)
+        .all()
+    )
+    return {(state.race_id, state.session_id): state for state in states}
+
+# true if the race/session has to be synced: never synced, failed before or synced without rows (not published yet)
+# done and skipped ones are synced again only with force, or done ones with refetch_after once their last sync
+# is older than that (OpenF1 corrects published data later, is_unchanged then skips writing the same content)
+def is_pending(
+    states: Dict[Tuple[int, int], models.SyncState],
+    race_id: int,
+    session_id: int = RACE_LEVEL,
+    force: bool = False,
+    refetch_after: Optional[timedelta] = None
+) -> bool:
+    if force:
+        return True
+    state = states.get((race_id, session_id))
+    if state is None or state.status == SYNC_FAILED or (state.status == SYNC_DONE and not state.row_count):
+        return True
+    return (
+        refetch_after is not None and state.status == SYNC_DONE
+        and (state.last_attempt_at is None or state.last_attempt_at <= _utcnow() - refetch_after)
+    )
+
+# true if the data has the same content hash as the last successful sync
+def is_unchanged(states: Dict[Tuple[int, int], models.SyncState], race_id: int, session_id: int, data_hash: str) -> bool:
+    state = states.get((race_id, session_id))
+    return state is not None and state.status == SYNC_DONE and state.content_hash == data_hash
+
+# create or update the sync state of one race/session and commit
+def record_state(
+    db: Session,
+    source: str,
+    stage: str,
+    race_id: int,
+    session_id: int = RACE_LEVEL,
+    status: str = SYNC_DONE,
+    row_count: Optional[int] = None,
+    content_hash: Optional[str] = None,
+    failure_reason: Optional[str] = None
+) -> models.SyncState:
+    state = (
+        db.query(models.SyncState)
+        .filter(
+            models.SyncState.source == source,
+            models.SyncState.race_id == race_id,
+            models.SyncState.session_id == session_id,
+            models.SyncState.stage == stage
+        ).first())
+    if not state:
+        state = models.SyncState(source=source, race_id=race_id, session_id=session_id, stage=stage)
+        db.add(state)
+
+    state.status = status
+    state.last_attempt_at = _utcnow()
+    state.failure_reason = failure_reason
+    # a failed attempt keeps row count and hash of the last successful sync
+    if status != SYNC_FAILED:
+        state.row_count = row_count
+        state.content_hash = content_hash
+
+    db.commit()
+    return state
+
+# race_id of the latest meeting (highest year, then highest race_id = OpenF1 meeting_key), None for an empty database
+def get_latest_race_id(db: Session) -> Optional[int]:
+    race = db.query(models.Race.race_id).order_by(models.Race.year.desc(), models.Race.race_id.desc()).first()
+    return race.race_id if race else None
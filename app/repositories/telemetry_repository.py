@@ -1,10 +1,40 @@
+import asyncio
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
-from app import models, schemas
+from app import models, schemas, telemetry_store
+from app.telemetry_trace import trace_cache
+from app.serialization import schema_columns
+from app.pagination import paginate, paginate_async
 
-# return all telemetry from the database
-def get_all_telemetry(db: Session):
-    return db.query(models.Telemetry).all()
+# apply optional list filters (race, session, driver, lap number range)
+def filter_telemetry(query, params: schemas.LapListParams):
+    if params.race_id is not None:
+        query = query.filter(models.Telemetry.race_id == params.race_id)
+    if params.session_id is not None:
+        query = query.filter(models.Telemetry.session_id == params.session_id)
+    if params.driver_number is not None:
+        query = query.filter(models.Telemetry.driver_number == params.driver_number)
+    if params.lap_number_min is not None:
+        query = query.filter(models.Telemetry.lap_number >= params.lap_number_min)
+    if params.lap_number_max is not None:
+        query = query.filter(models.Telemetry.lap_number <= params.lap_number_max)
+    return query
+
+# return one page of telemetry from the database and the cursor for the next page
+def get_all_telemetry(db: Session, params: schemas.LapListParams):
+    query = filter_telemetry(db.query(models.Telemetry), params)
+    return paginate(query, models.Telemetry.telemetry_id, params.cursor, params.limit)
+
+# return all telemetry matching the filters as plain column tuples, read from the database in chunks
+# (used for streaming responses, limit is ignored)
+def stream_telemetry(db: Session, params: schemas.LapListParams, batch_size: int = 1000):
+    query = filter_telemetry(db.query(*models.Telemetry.__table__.columns), params)
+    if params.cursor is not None:
+        query = query.filter(models.Telemetry.telemetry_id > params.cursor)
+    return query.order_by(models.Telemetry.telemetry_id).yield_per(batch_size)
 
 # return a telemetry by telemetry_id if it exists
 def get_telemetry_by_telemetry_id(db: Session, telemetry_id: int):
@@ -16,6 +46,39 @@ def get_telemetry_by_telemetry_id(db: Session, telemetry_id: int):
         )
     return telemetry
 
+# return the downsampled speed/throttle/brake trace of one lap from the telemetry store (not the database)
+def get_telemetry_trace(session_id: int, driver_number: int, lap_number: int, points: int) -> schemas.TelemetryTrace:
+    stored = telemetry_store.open_driver_telemetry(session_id, driver_number)
+    trace = trace_cache.get(stored, lap_number) if stored is not None else None
+    if trace is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Telemetry trace for session_id='{session_id}', driver_number='{driver_number}', lap_number='{lap_number}' is not found."
+        )
+
+    indices = trace.indices(points)
+    def values(channel: np.ndarray) -> list:
+        # NaN samples become null
+        selected = channel[indices]
+        return np.where(np.isnan(selected), None, selected).tolist()
+
+    return schemas.TelemetryTrace(
+        session_id = session_id,
+        driver_number = driver_number,
+        lap_number = lap_number,
+        samples = trace.samples,
+        points = len(indices),
+        distance = trace.distance[indices].tolist(),
+        time = trace.time[indices].tolist(),
+        speed = values(trace.channels["Speed"]),
+        throttle = values(trace.channels["Throttle"]) if "Throttle" in trace.channels else None,
+        brake = values(trace.channels["Brake"]) if "Brake" in trace.channels else None
+    )
+
+# the trace is read from files and reduced with numpy, run it outside of the event loop
+async def get_telemetry_trace_async(session_id: int, driver_number: int, lap_number: int, points: int) -> schemas.TelemetryTrace:
+    return await asyncio.to_thread(get_telemetry_trace, session_id, driver_number, lap_number, points)
+
 # create a new telemetry in the database (if telemetry_id doesn't already exist)
 def create_telemetry(db: Session, telemetry: schemas.TelemetryCreate):
     telemetry_exists = db.query(models.Telemetry).filter(
@@ -66,3 +129,33 @@ def delete_telemetry(db: Session, telemetry_id: int):
     db.commit()
     return {"detail": f"Telemetry '{telemetry_id}' is deleted."}
 
+# async variants for API endpoints (AsyncSession)
+# reads build the same queries with select(), writes run the functions above on the async connection
+
+# columns returned by list endpoints (fields of schemas.Telemetry, plain tuples without ORM objects)
+TELEMETRY_COLUMNS = schema_columns(models.Telemetry, schemas.Telemetry)
+
+# return one page of telemetry as column tuples and the cursor for the next page (async)
+async def get_all_telemetry_async(db: AsyncSession, params: schemas.LapListParams):
+    stmt = filter_telemetry(select(*TELEMETRY_COLUMNS), params)
+    return await paginate_async(db, stmt, models.Telemetry.telemetry_id, params.cursor, params.limit)
+
+# return a telemetry by telemetry_id if it exists (async)
+async def get_telemetry_by_telemetry_id_async(db: AsyncSession, telemetry_id: int):
+    telemetry = await db.get(models.Telemetry, telemetry_id)
+    if not telemetry:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Telemetry with telemetry_id='{telemetry_id}' is not found."
+        )
+    return telemetry
+
+# create, update and delete (async)
+async def create_telemetry_async(db: AsyncSession, telemetry: schemas.TelemetryCreate):
+    return await db.run_sync(create_telemetry, telemetry)
+
+async def update_telemetry_async(db: AsyncSession, telemetry_id: int, telemetry_update: schemas.TelemetryUpdate):
+    return await db.run_sync(update_telemetry, telemetry_id, telemetry_update)
+
+async def delete_telemetry_async(db: AsyncSession, telemetry_id: int):
+    return await db.run_sync(delete_telemetry, telemetry_id)
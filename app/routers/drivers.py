@@ -1,120 +1,128 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from app import database, models, schemas
-from app.repositories import driver_repository
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app import database, models, schemas, jobs
+from app.repositories import driver_repository, bulk_repository
+from app.serialization import rows_response
 import httpx
+from app.openf1_client import OpenF1Client, get_openf1_client
 from app.utils import normalize_driver_id, normalize_full_name
 
 # initializing router 
 router = APIRouter(prefix="/drivers", tags=["Drivers"])
 
-OPENF1_DRIVERS_URL = "https://api.openf1.org/v1/drivers"
+OPENF1_DRIVERS_ENDPOINT = "drivers"
 
 # dependency for the database
-def get_db():
-    db = database.SessionLocal()
-    try:
+async def get_db():
+    async with database.AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 # endpoint for retrieving all drivers -> GET /drivers/
 @router.get("/", response_model=List[schemas.Driver])
-def get_all_drivers(db: Session = Depends(get_db)):
-    return driver_repository.get_all_drivers(db)
+async def get_all_drivers(db: AsyncSession = Depends(database.get_async_read_db)):
+    return rows_response(await driver_repository.get_all_drivers_async(db))
 
 # endpoint for retrieving a driver by driver_id -> GET /drivers/{driver_id}
 @router.get("/{driver_id}", response_model=schemas.Driver)
-def get_driver(driver_id: str, db: Session = Depends(get_db)):
-    return driver_repository.get_driver_by_driver_id(db, driver_id)
+async def get_driver(driver_id: str, db: AsyncSession = Depends(database.get_async_read_db)):
+    return await driver_repository.get_driver_by_driver_id_async(db, driver_id)
 
 # endpoint for creating a new driver -> POST /drivers/
 @router.post("/", response_model=schemas.Driver, status_code=201)
-def create_driver(driver: schemas.DriverCreate, db: Session = Depends(get_db)):
+async def create_driver(driver: schemas.DriverCreate, db: AsyncSession = Depends(get_db)):
     if not driver.driver_id:
         driver.driver_id = normalize_driver_id(driver.full_name)
-    return driver_repository.create_driver(db, driver)
+    return await driver_repository.create_driver_async(db, driver)
 
 # endpoint for updating a driver -> PUT /drivers/{driver_id}
 @router.put("/{driver_id}", response_model=schemas.Driver)
-def update_driver(driver_id: str, driver: schemas.DriverUpdate, db: Session = Depends(get_db)):
-    return driver_repository.update_driver(db, driver_id, driver)
+async def update_driver(driver_id: str, driver: schemas.DriverUpdate, db: AsyncSession = Depends(get_db)):
+    return await driver_repository.update_driver_async(db, driver_id, driver)
 
 # endpoint for deleting a driver -> DELETE /drivers/{driver_id}
 @router.delete("/{driver_id}")
-def delete_driver(driver_id: str, db: Session = Depends(get_db)):
-    return driver_repository.delete_driver(db, driver_id)
+async def delete_driver(driver_id: str, db: AsyncSession = Depends(get_db)):
+    return await driver_repository.delete_driver_async(db, driver_id)
+
+# OpenF1 driver attributes copied to DriverCreate (full_name and driver_id are normalized separately)
+OPENF1_DRIVER_FIELDS = ("first_name", "last_name", "driver_number", "name_acronym", "team_name", "country_code")
+
+def merge_openf1_drivers(drivers_json: list) -> List[schemas.DriverCreate]:
+    """
+    OpenF1 returns one row per driver and session. Group the rows by driver_id in one pass
+    (every distinct full_name is normalized once) and keep the latest non-empty value of every attribute,
+    so a missing country_code, team_name, ... is taken from another row of the same driver.
+    Returns one DriverCreate per driver in order of first appearance.
+    """
+    normalized_names = {}
+    merged = {}
+
+    for d in drivers_json:
+        # full_name from OpenF1 used ONLY for generating driver_id
+        openf1_full_name = (d.get("full_name") or "").strip()
+        if openf1_full_name not in normalized_names:
+            # use function to normalize full_name (only first letters of every word and after apostrophe are capitalized)
+            normalized_names[openf1_full_name] = (normalize_driver_id(openf1_full_name), normalize_full_name(openf1_full_name))
+        driver_id, clean_full_name = normalized_names[openf1_full_name]
+        if not driver_id:
+            continue
+
+        driver = merged.setdefault(driver_id, {"driver_id": driver_id})
+        driver["full_name"] = clean_full_name
+        for field in OPENF1_DRIVER_FIELDS:
+            value = d.get(field)
+            if value:
+                driver[field] = value
+
+    # attributes that no row had are left empty
+    return [
+        schemas.DriverCreate(
+            driver_id = driver["driver_id"],
+            full_name = driver["full_name"],
+            first_name = driver.get("first_name", ""),
+            last_name = driver.get("last_name", ""),
+            driver_number = driver.get("driver_number", 0),
+            name_acronym = driver.get("name_acronym", ""),
+            team_name = driver.get("team_name", ""),
+            country_code = driver.get("country_code", "")
+        )
+        for driver in merged.values()
+    ]
 
 # fetch drivers from OpenF1 API and save/update them in the database
 # returns count of created and updated drivers
-@router.post("/sync")
-def fetch_drivers(db: Session = Depends(get_db)):
-    try:
-        response = httpx.get(OPENF1_DRIVERS_URL, timeout=10)
-        response.raise_for_status()
-        drivers_json = response.json()
-    except httpx.HTTPError as e:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=f"Error retrieving drivers from OpenF1 API: {str(e)}"
-        )
+async def sync_drivers(db: AsyncSession, openf1: OpenF1Client, job: Optional[jobs.Job] = None) -> dict:
+    with jobs.stage(job, "fetch"):
+        try:
+            drivers_json = await openf1.get_json(OPENF1_DRIVERS_ENDPOINT)
+        except httpx.HTTPError as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Error retrieving drivers from OpenF1 API: {str(e)}"
+            )
     
     if not isinstance(drivers_json, list) or len(drivers_json) == 0:
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail=f"OpenF1 API returned an invalid or empty response."
         )
+    jobs.count(job, fetched=len(drivers_json))
 
-    created = 0
-    updated = 0
+    drivers = merge_openf1_drivers(drivers_json)
 
-    for d in drivers_json:
-        # full_name from OpenF1 used ONLY for generating driver_id
-        openf1_full_name = d.get("full_name", "").strip()
-        driver_id = normalize_driver_id(openf1_full_name)
-
-        # use function to normalize full_name (only first letters of every word and after apostrophe are capitalized)
-        clean_full_name = normalize_full_name(openf1_full_name)
-
-        # if country_code is not fetched iterate through all entries 
-        country_code = d.get("country_code")
-        if not country_code:
-            for entry in drivers_json:
-                if normalize_driver_id(entry.get("full_name")) == driver_id and entry.get("country_code"):
-                    country_code = entry.get("country_code")
-                    break
-        
-        # if country_code is not found in any of the entries for driver then leave it empty
-        if not country_code:
-            country_code = ""       
-
-        driver_data = schemas.DriverCreate(
-            driver_id = driver_id,
-            full_name = clean_full_name,
-            first_name = d.get("first_name") or "",
-            last_name = d.get("last_name") or "",
-            driver_number = d.get("driver_number", 0),
-            name_acronym = d.get("name_acronym") or "",
-            team_name = d.get("team_name") or "",
-            country_code = country_code      
+    with jobs.stage(job, "write"):
+        result = await bulk_repository.upsert_drivers_async(
+            drivers, on_batch=lambda created, updated: jobs.count(job, created=created, updated=updated)
         )
 
-        driver_exists = db.query(models.Driver).filter(models.Driver.driver_id == driver_id).first()
-        
-        if driver_exists:
-            update_data = driver_data.model_dump(exclude_unset=True)
-            for field, value in update_data.items():
-                if value is not None:
-                    setattr(driver_exists, field, value)
-
-            db.commit()
-            db.refresh(driver_exists)
-            updated += 1
-        else:
-            driver_repository.create_driver(db, driver_data)
-            created += 1
-        
-    return {"created": created, "updated": updated, "total": len(drivers_json)}
-
+    return {"created": result["created"], "updated": result["updated"], "total": len(drivers_json)}
 
+# endpoint for syncing drivers from OpenF1 -> POST /drivers/sync
+# with ?background=true returns 202 with a job right away (progress: GET /jobs/{job_id}),
+# a request while the same sync is queued or running gets the existing job
+@router.post("/sync", responses={202: {"model": schemas.Job}})
+async def fetch_drivers(request: Request, background: bool = False, db: AsyncSession = Depends(get_db), openf1: OpenF1Client = Depends(get_openf1_client)):
+    if background:
+        return jobs.submit_sync(request.app, "drivers", sync_drivers)
+    return await sync_drivers(db, openf1)
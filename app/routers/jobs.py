@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from app import schemas
+from app.jobs import job_runner
+
+# initializing router 
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+# endpoint for status, progress and timings of a background sync job -> GET /jobs/{job_id}
+@router.get("/{job_id}", response_model=schemas.Job)
+async def get_job(job_id: str):
+    return job_runner.get(job_id)
+
+# endpoint for cancelling a queued or running job -> POST /jobs/{job_id}/cancel
+@router.post("/{job_id}/cancel", response_model=schemas.Job)
+async def cancel_job(job_id: str):
+    return await job_runner.cancel(job_id)
@@ -1,104 +1,150 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from app import models, schemas, database
-from app.repositories import lap_repository
+from contextlib import aclosing
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Annotated, List, Optional
+from app import models, schemas, database, jobs
+from app.pagination import set_next_cursor
+from app.serialization import rows_response
+from app.streaming import get_stream_format, stream_rows, STREAM_BATCH_SIZE
+from app.repositories import lap_repository, bulk_repository, lap_feature_repository
 import httpx
+from app.openf1_client import InvalidJSONError, OpenF1Client, get_openf1_client
 
 # initializing router 
 router = APIRouter(prefix="/laps", tags=["Laps"])
 
-OPENF1_LAPS_URL = "https://api.openf1.org/v1/laps"
+OPENF1_LAPS_ENDPOINT = "laps"
+
+# laps parsed from the OpenF1 response and written per batch in POST /laps/sync/{race_id}
+LAP_SYNC_BATCH_SIZE = bulk_repository.BATCH_SIZE
 
 # dependency for the database
-def get_db():
-    db = database.SessionLocal()
-    try:
+async def get_db():
+    async with database.AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-# endpoint for retrieving all laps -> GET /laps/
+# endpoint for retrieving laps (filtered, one page per cursor) -> GET /laps/
+# with ?format=ndjson|csv (or Accept: application/x-ndjson / text/csv) all matching rows are streamed instead
 @router.get("/", response_model=List[schemas.Lap])
-def get_all_laps(db: Session = Depends(get_db)):
-    return lap_repository.get_all_laps(db)
+async def get_all_laps(
+    request: Request,
+    params: Annotated[schemas.LapStreamParams, Query()],
+    db: AsyncSession = Depends(database.get_async_read_db)
+):
+    stream_format = get_stream_format(request, params.format)
+    if stream_format:
+        columns = [column.key for column in models.Lap.__table__.columns]
+        return stream_rows(lambda stream_db: lap_repository.stream_laps(stream_db, params, STREAM_BATCH_SIZE), columns, stream_format)
+
+    laps, next_cursor = await lap_repository.get_all_laps_async(db, params)
+    response = rows_response(laps)
+    set_next_cursor(response, next_cursor)
+    return response
 
 # endpoint for retrieving a lap by lap_id -> GET /laps/{lap_id}
 @router.get("/{lap_id}", response_model=schemas.Lap)
-def get_lap(lap_id: int, db: Session = Depends(get_db)):
-    return lap_repository.get_lap_by_lap_id(db, lap_id)
+async def get_lap(lap_id: int, db: AsyncSession = Depends(database.get_async_read_db)):
+    return await lap_repository.get_lap_by_lap_id_async(db, lap_id)
 
 # endpoint for creating a new lap -> POST /laps/
 @router.post("/", response_model=schemas.Lap, status_code=201)
-def create_lap(lap: schemas.LapCreate, db: Session = Depends(get_db)):
-    return lap_repository.create_lap(db, lap)
+async def create_lap(lap: schemas.LapCreate, db: AsyncSession = Depends(get_db)):
+    return await lap_repository.create_lap_async(db, lap)
 
 # endpoint for updating a lap -> PUT /laps/{lap_id}
 @router.put("/{lap_id}", response_model=schemas.Lap)
-def update_lap(lap_id: int, lap: schemas.LapUpdate, db: Session = Depends(get_db)):
-    return lap_repository.update_lap(db, lap_id, lap)
+async def update_lap(lap_id: int, lap: schemas.LapUpdate, db: AsyncSession = Depends(get_db)):
+    return await lap_repository.update_lap_async(db, lap_id, lap)
 
 # endpoint for deleting a lap -> DELETE /laps/{lap_id}
 @router.delete("/{lap_id}")
-def delete_lap(lap_id: int, db: Session = Depends(get_db)):
-    return lap_repository.delete_lap(db, lap_id)
+async def delete_lap(lap_id: int, db: AsyncSession = Depends(get_db)):
+    return await lap_repository.delete_lap_async(db, lap_id)
 
-# fetch all laps by race_id from OpenF1 API and save/update them in the database -> POST /laps/sync/{race_id}
+# fetch all laps by race_id from OpenF1 API and save/update them in the database
 # returns count of created and updated laps
-@router.post("/sync/{race_id}")
-def fetch_laps(race_id: int, db: Session = Depends(get_db)):
+async def sync_laps(db: AsyncSession, openf1: OpenF1Client, race_id: int, job: Optional[jobs.Job] = None) -> dict:
+    """
+    The response is parsed while it's downloaded and every batch of LAP_SYNC_BATCH_SIZE laps is written
+    before the next one is parsed, so memory depends on the batch size and not on the size of the meeting.
+    Batches written before an error stay in the database (upserts are idempotent, the sync can be repeated).
+    """
+    total = 0
+    created = 0
+    updated = 0
+
     try:
-        response = httpx.get(OPENF1_LAPS_URL, params={"meeting_key": race_id}, timeout=10)
-        response.raise_for_status()
-        laps_json = response.json()
+        batches = openf1.iter_json_batches(OPENF1_LAPS_ENDPOINT, params={"meeting_key": race_id}, batch_size=LAP_SYNC_BATCH_SIZE)
+        # the HTTP stream is closed also when a write fails
+        async with aclosing(batches):
+            with jobs.stage(job, "fetch"):
+                laps_json = await anext(batches, [])
+            while laps_json:
+                total += len(laps_json)
+                jobs.count(job, fetched=len(laps_json))
+
+                laps = [
+                    schemas.LapCreate(
+                        race_id = race_id,
+                        session_id = l.get("session_key"),
+                        driver_number = l.get("driver_number"),
+                        lap_number = l.get("lap_number"),
+                        lap_duration = l.get("lap_duration", 0),
+                        duration_sector_1 = l.get("duration_sector_1", 0),
+                        duration_sector_2 = l.get("duration_sector_2", 0),
+                        duration_sector_3 = l.get("duration_sector_3", 0),
+                        i1_speed = l.get("i1_speed", 0),
+                        i2_speed = l.get("i2_speed", 0),
+                        st_speed = l.get("st_speed", 0),
+                        is_pit_out_lap = l.get("is_pit_out_lap", False)
+                    )
+                    for l in laps_json
+                ]
+
+                with jobs.stage(job, "write"):
+                    result = await bulk_repository.upsert_laps_async(
+                        laps, on_batch=lambda created, updated: jobs.count(job, created=created, updated=updated)
+                    )
+                created += result["created"]
+                updated += result["updated"]
+
+                with jobs.stage(job, "fetch"):
+                    laps_json = await anext(batches, [])
     except httpx.HTTPError as e:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Error retrieving laps from OpenF1 API: {str(e)}"
         )
-    
-    if not isinstance(laps_json, list) or len(laps_json) == 0:
+    except InvalidJSONError:
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail=f"OpenF1 API returned an invalid or empty response."
         )
+    except ValidationError as e:
+        # laps that don't fit schemas.LapCreate (e.g. missing session_key), not a broken response
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Laps from OpenF1 API don't match the lap schema ({e.error_count()} errors): {e.errors()[0]['loc']} {e.errors()[0]['msg']}"
+        )
 
-    created = 0
-    updated = 0
+    if total == 0:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"OpenF1 API returned an invalid or empty response."
+        )
+
+    with jobs.stage(job, "write"):
+        await lap_repository.assign_lap_stints_async(race_id)
+        await lap_feature_repository.refresh_race_lap_features_async(race_id)
+
+    return {"created": created, "updated": updated, "total": total}
 
-    for l in laps_json:
-        lap_data = schemas.LapCreate(
-            race_id = race_id,
-            session_id = l.get("session_key"),
-            driver_number = l.get("driver_number"),
-            lap_number = l.get("lap_number"),
-            lap_duration = l.get("lap_duration", 0),
-            duration_sector_1 = l.get("duration_sector_1", 0),
-            duration_sector_2 = l.get("duration_sector_2", 0),
-            duration_sector_3 = l.get("duration_sector_3", 0),
-            i1_speed = l.get("i1_speed", 0),
-            i2_speed = l.get("i2_speed", 0),
-            st_speed = l.get("st_speed", 0),
-            is_pit_out_lap = l.get("is_pit_out_lap", False)
-        ) 
-
-        lap_exists = db.query(models.Lap).filter(
-            models.Lap.race_id == race_id,
-            models.Lap.session_id == lap_data.session_id,
-            models.Lap.driver_number == lap_data.driver_number,
-            models.Lap.lap_number == lap_data.lap_number
-            ).first()
-        
-        if lap_exists:
-            update_data = lap_data.model_dump(exclude_unset=True)
-            for field, value in update_data.items():
-                if value is not None:
-                    setattr(lap_exists, field, value)
-            db.commit()
-            db.refresh(lap_exists)
-            updated += 1
-        else:
-            lap_repository.create_session(db, lap_data)
-            created += 1
-        
-    return {"created": created, "updated": updated, "total": len(laps_json)}
\ No newline at end of file
+# endpoint for syncing laps from OpenF1 -> POST /laps/sync/{race_id}
+# with ?background=true returns 202 with a job right away (progress: GET /jobs/{job_id}),
+# a request while the same sync is queued or running gets the existing job
+@router.post("/sync/{race_id}", responses={202: {"model": schemas.Job}})
+async def fetch_laps(race_id: int, request: Request, background: bool = False, db: AsyncSession = Depends(get_db), openf1: OpenF1Client = Depends(get_openf1_client)):
+    if background:
+        return jobs.submit_sync(request.app, f"laps:{race_id}", lambda db, openf1, job: sync_laps(db, openf1, race_id, job))
+    return await sync_laps(db, openf1, race_id)
@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from app import schemas
+from app.repositories import prediction_repository
+
+# initializing router 
+router = APIRouter(prefix="/predict", tags=["Predict"])
+
+# endpoint for predicting lap durations of a batch of laps with a race pace model -> POST /predict/race-pace
+@router.post("/race-pace", response_model=schemas.RacePacePrediction)
+async def predict_race_pace(request: schemas.RacePaceRequest):
+    return await prediction_repository.predict_race_pace_async(request)
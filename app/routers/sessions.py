@@ -1,98 +1,94 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from app import models, schemas, database
-from app.repositories import session_repository
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app import models, schemas, database, jobs
+from app.repositories import session_repository, bulk_repository
+from app.serialization import rows_response
 import httpx
+from app.openf1_client import OpenF1Client, get_openf1_client
 
 # initializing router 
 router = APIRouter(prefix="/sessions", tags=["Sessions"])
 
-OPENF1_SESSIONS_URL = "https://api.openf1.org/v1/sessions"
+OPENF1_SESSIONS_ENDPOINT = "sessions"
 
 # dependency for the database
-def get_db():
-    db = database.SessionLocal()
-    try:
+async def get_db():
+    async with database.AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 # endpoint for retrieving all sessions -> GET /sessions/
 @router.get("/", response_model=List[schemas.Session])
-def get_all_sessions(db: Session = Depends(get_db)):
-    return session_repository.get_all_sessions(db)
+async def get_all_sessions(db: AsyncSession = Depends(database.get_async_read_db)):
+    return rows_response(await session_repository.get_all_sessions_async(db))
 
 # endpoint for retrieving a session by session_id -> GET /sessions/{id}
 @router.get("/{id}", response_model=schemas.Session)
-def get_session_by_id(id: int, db: Session = Depends(get_db)):
-    return session_repository.get_session_by_id(db, id)
+async def get_session_by_id(id: int, db: AsyncSession = Depends(database.get_async_read_db)):
+    return await session_repository.get_session_by_id_async(db, id)
+
+# endpoint for pace summary per driver in a session -> GET /sessions/{session_id}/pace
+# session_id is the OpenF1 session key used by laps (not the id of the session row)
+@router.get("/{session_id}/pace", response_model=List[schemas.DriverPace])
+async def get_session_pace(session_id: int, db: AsyncSession = Depends(database.get_async_read_db)):
+    return await session_repository.get_session_pace_async(db, session_id)
 
 # endpoint for creating a new session -> POST /sessions/
 @router.post("/", response_model=schemas.Session, status_code=201)
-def create_session(session: schemas.SessionCreate, db: Session = Depends(get_db)):
-    return session_repository.create_session(db, session)
+async def create_session(session: schemas.SessionCreate, db: AsyncSession = Depends(get_db)):
+    return await session_repository.create_session_async(db, session)
 
 # endpoint for updating a session -> PUT /sessions/{id}
 @router.put("/{id}", response_model=schemas.Session)
-def update_session(id: int, session: schemas.SessionUpdate, db: Session = Depends(get_db)):
-    return session_repository.update_session(db, id, session)
+async def update_session(id: int, session: schemas.SessionUpdate, db: AsyncSession = Depends(get_db)):
+    return await session_repository.update_session_async(db, id, session)
 
 # endpoint for deleting a session -> DELETE /sessions/{id}
 @router.delete("/{id}")
-def delete_session(id: int, db: Session = Depends(get_db)):
-    return session_repository.delete_session(db, id)
+async def delete_session(id: int, db: AsyncSession = Depends(get_db)):
+    return await session_repository.delete_session_async(db, id)
 
-# fetch all sessions by race_id from OpenF1 API and save/update them in the database -> POST /sessions/sync/{race_id}
+# fetch all sessions by race_id from OpenF1 API and save/update them in the database
 # returns count of created and updated session
-@router.post("/sync/{race_id}")
-def fetch_sessions(race_id: int, db: Session = Depends(get_db)):
-    try:
-        response = httpx.get(OPENF1_SESSIONS_URL, params={"meeting_key": race_id}, timeout=10)
-        response.raise_for_status()
-        sessions_json = response.json()
-    except httpx.HTTPError as e:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=f"Error retrieving sessions from OpenF1 API: {str(e)}"
-        )
+async def sync_sessions(db: AsyncSession, openf1: OpenF1Client, race_id: int, job: Optional[jobs.Job] = None) -> dict:
+    with jobs.stage(job, "fetch"):
+        try:
+            sessions_json = await openf1.get_json(OPENF1_SESSIONS_ENDPOINT, params={"meeting_key": race_id})
+        except httpx.HTTPError as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Error retrieving sessions from OpenF1 API: {str(e)}"
+            )
     
     if not isinstance(sessions_json, list) or len(sessions_json) == 0:
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail=f"OpenF1 API returned an invalid or empty response."
         )
+    jobs.count(job, fetched=len(sessions_json))
 
-    created = 0
-    updated = 0
-
-    for s in sessions_json:
-        session_id = s.get("session_key")
-        race_id = s.get("meeting_key")
-        session_name = s.get("session_name")
-        session_type = s.get("session_type")
-
-        session_data = schemas.SessionCreate(
-            session_id = session_id,
-            race_id = race_id,
-            session_name = session_name,
-            session_type = session_type 
+    sessions = [
+        schemas.SessionCreate(
+            session_id = s.get("session_key"),
+            race_id = s.get("meeting_key"),
+            session_name = s.get("session_name"),
+            session_type = s.get("session_type")
         )
+        for s in sessions_json
+    ]
 
-        session_exists = db.query(models.Session).filter(models.Session.session_id == session_data.session_id).first()
-        
-        if session_exists:
-            update_data = session_data.model_dump(exclude_unset=True)
-            for field, value in update_data.items():
-                if value is not None:
-                    setattr(session_exists, field, value)
-            db.commit()
-            db.refresh(session_exists)
-            updated += 1
-        else:
-            session_repository.create_session(db, session_data)
-            created += 1
-        
-    return {"created": created, "updated": updated, "total": len(sessions_json)}
+    with jobs.stage(job, "write"):
+        result = await bulk_repository.upsert_sessions_async(
+            sessions, on_batch=lambda created, updated: jobs.count(job, created=created, updated=updated)
+        )
 
+    return {"created": result["created"], "updated": result["updated"], "total": len(sessions_json)}
 
+# endpoint for syncing sessions from OpenF1 -> POST /sessions/sync/{race_id}
+# with ?background=true returns 202 with a job right away (progress: GET /jobs/{job_id}),
+# a request while the same sync is queued or running gets the existing job
+@router.post("/sync/{race_id}", responses={202: {"model": schemas.Job}})
+async def fetch_sessions(race_id: int, request: Request, background: bool = False, db: AsyncSession = Depends(get_db), openf1: OpenF1Client = Depends(get_openf1_client)):
+    if background:
+        return jobs.submit_sync(request.app, f"sessions:{race_id}", lambda db, openf1, job: sync_sessions(db, openf1, race_id, job))
+    return await sync_sessions(db, openf1, race_id)
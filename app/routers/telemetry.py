@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Annotated, List
 from app import models, schemas, database
+from app.pagination import set_next_cursor
+from app.serialization import rows_response
+from app.streaming import get_stream_format, stream_rows, STREAM_BATCH_SIZE
 from app.repositories import telemetry_repository
 import httpx
 
@@ -9,35 +12,56 @@ import httpx
 router = APIRouter(prefix="/telemetry", tags=["Telemetry"])
 
 # dependency for the database
-def get_db():
-    db = database.SessionLocal()
-    try:
+async def get_db():
+    async with database.AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-# endpoint for retrieving all telemetry data -> GET /telemetry/
+# endpoint for retrieving telemetry data (filtered, one page per cursor) -> GET /telemetry/
+# with ?format=ndjson|csv (or Accept: application/x-ndjson / text/csv) all matching rows are streamed instead
 @router.get("/", response_model=List[schemas.Telemetry])
-def get_all_telemetry(db: Session = Depends(get_db)):
-    return telemetry_repository.get_all_telemetry(db)
+async def get_all_telemetry(
+    request: Request,
+    params: Annotated[schemas.LapStreamParams, Query()],
+    db: AsyncSession = Depends(database.get_async_read_db)
+):
+    stream_format = get_stream_format(request, params.format)
+    if stream_format:
+        columns = [column.key for column in models.Telemetry.__table__.columns]
+        return stream_rows(lambda stream_db: telemetry_repository.stream_telemetry(stream_db, params, STREAM_BATCH_SIZE), columns, stream_format)
+
+    telemetry, next_cursor = await telemetry_repository.get_all_telemetry_async(db, params)
+    response = rows_response(telemetry)
+    set_next_cursor(response, next_cursor)
+    return response
+
+# endpoint for a downsampled speed/throttle/brake trace of one lap -> GET /telemetry/trace
+# (raw samples from the telemetry store reduced to `points` points with LTTB, declared before /{telemetry_id})
+@router.get("/trace", response_model=schemas.TelemetryTrace)
+async def get_telemetry_trace(
+    session_id: int,
+    driver_number: int,
+    lap_number: int,
+    points: Annotated[int, Query(ge=3, le=10000)] = 500
+):
+    return await telemetry_repository.get_telemetry_trace_async(session_id, driver_number, lap_number, points)
 
 # endpoint for retrieving a telemetry by telemetry_id -> GET /telemetry/{id}
 @router.get("/{telemetry_id}", response_model=schemas.Telemetry)
-def get_telemetry_by_id(telemetry_id: int, db: Session = Depends(get_db)):
-    return telemetry_repository.get_telemetry_by_telemetry_id(db, telemetry_id)
+async def get_telemetry_by_id(telemetry_id: int, db: AsyncSession = Depends(database.get_async_read_db)):
+    return await telemetry_repository.get_telemetry_by_telemetry_id_async(db, telemetry_id)
 
 # endpoint for creating a new telemetry -> POST /telemetry/
 @router.post("/", response_model=schemas.Telemetry, status_code=201)
-def create_telemetry(telemetry: schemas.TelemetryCreate, db: Session = Depends(get_db)):
-    return telemetry_repository.create_telemetry(db, telemetry)
+async def create_telemetry(telemetry: schemas.TelemetryCreate, db: AsyncSession = Depends(get_db)):
+    return await telemetry_repository.create_telemetry_async(db, telemetry)
 
 # endpoint for updating a telemetry -> PUT /telemetry/{id}
 @router.put("/{telemetry_id}", response_model=schemas.Telemetry)
-def update_telemetry(telemetry_id: int, telemetry: schemas.TelemetryUpdate, db: Session = Depends(get_db)):
-    return telemetry_repository.update_telemetry(db, telemetry_id, telemetry)
+async def update_telemetry(telemetry_id: int, telemetry: schemas.TelemetryUpdate, db: AsyncSession = Depends(get_db)):
+    return await telemetry_repository.update_telemetry_async(db, telemetry_id, telemetry)
 
 # endpoint for deleting a telemetry -> DELETE /telemetry/{id}
 @router.delete("/{telemetry_id}")
-def delete_telemetry(telemetry_id: int, db: Session = Depends(get_db)):
-    return telemetry_repository.delete_telemetry(db, telemetry_id)
+async def delete_telemetry(telemetry_id: int, db: AsyncSession = Depends(get_db)):
+    return await telemetry_repository.delete_telemetry_async(db, telemetry_id)
 
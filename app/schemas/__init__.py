@@ -3,4 +3,8 @@ from .race import Race, RaceCreate, RaceUpdate
 from .lap import Lap, LapCreate, LapUpdate
 from .session import Session, SessionCreate, SessionUpdate
 from .stint import Stint, StintCreate, StintUpdate
-from .telemetry import Telemetry, TelemetryCreate, TelemetryUpdate
\ No newline at end of file
+from .telemetry import Telemetry, TelemetryCreate, TelemetryUpdate, TelemetryTrace
+from .pagination import PageParams, LapListParams, LapStreamParams
+from .pace import DriverPace
+from .job import Job
+from .prediction import RacePaceFeatures, RacePaceRequest, RacePacePrediction
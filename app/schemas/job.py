@@ -0,0 +1,19 @@
+from pydantic import BaseModel, ConfigDict
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+# background sync job (see app/jobs.py), timings are seconds per stage
+class Job(BaseModel):
+    job_id: str
+    key: str
+    status: str
+    stage: Optional[str] = None
+    progress: Dict[str, int] = {}
+    timings: Dict[str, float] = {}
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
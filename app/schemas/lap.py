@@ -40,5 +40,7 @@ class LapUpdate(BaseModel):
 # fields returned
 class Lap(LapBase):
     lap_id: int
+    stint_id: Optional[int] = None
+    stint_lap_number: Optional[int] = None
 
     model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,16 @@
+from pydantic import BaseModel, ConfigDict
+from typing import Optional
+
+# pace summary of one driver in a session (lap times in seconds)
+class DriverPace(BaseModel):
+    driver_number: int
+    lap_count: int
+    best_lap: Optional[float] = None
+    median_lap: Optional[float] = None
+    best_sector_1: Optional[float] = None
+    best_sector_2: Optional[float] = None
+    best_sector_3: Optional[float] = None
+    # sum of best sectors (None if any sector time is missing)
+    theoretical_best: Optional[float] = None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+
+# query parameters for keyset pagination
+class PageParams(BaseModel):
+    cursor: Optional[int] = Field(None, description="Value of X-Next-Cursor header from the previous page.")
+    limit: int = Field(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+
+# query parameters for lap-level lists (laps, stints, telemetry)
+class LapListParams(PageParams):
+    race_id: Optional[int] = None
+    session_id: Optional[int] = None
+    driver_number: Optional[int] = None
+    lap_number_min: Optional[int] = Field(None, ge=0)
+    lap_number_max: Optional[int] = Field(None, ge=0)
+
+# lap-level list parameters for endpoints that can also stream the whole result (laps, telemetry)
+class LapStreamParams(LapListParams):
+    format: Optional[Literal["json", "ndjson", "csv"]] = Field(None, description="ndjson/csv stream all matching rows (limit is ignored).")
@@ -0,0 +1,28 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+# largest batch scored in one request
+MAX_PREDICTION_BATCH = 10000
+
+# features of one lap, same columns as table lap_features (missing numeric values are imputed by the model)
+class RacePaceFeatures(BaseModel):
+    driver_id: str
+    tyre_compound: str
+    circuit_location: str
+    session_name: str = "Race"
+    lap_number: Optional[int] = None
+    stint_number: Optional[int] = None
+    stint_lap_number: Optional[int] = None
+    tyre_age_at_start: Optional[int] = None
+    pit_in_time: Optional[float] = None
+    pit_out_time: Optional[float] = None
+
+# batch of laps to score, model is the name of a model saved with ml.utils.save_model
+class RacePaceRequest(BaseModel):
+    model: Optional[str] = Field(default=None, pattern=r"^[A-Za-z0-9_\-]+$")
+    laps: List[RacePaceFeatures] = Field(min_length=1, max_length=MAX_PREDICTION_BATCH)
+
+# predicted lap durations in seconds, in the order of the requested laps
+class RacePacePrediction(BaseModel):
+    model: str
+    lap_durations: List[float]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from typing import List, Optional
 
 # field for Telemetry
 class TelemetryBase(BaseModel):
@@ -28,5 +28,18 @@ class TelemetryUpdate(BaseModel):
 class Telemetry(TelemetryBase):
     telemetry_id: int
 
-    class Config:
-        model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True)
+
+# downsampled trace of one lap for plotting (one list per channel, same length)
+# distance in meters and time in seconds from the lap start, speed in km/h, throttle in %, brake 0/1
+class TelemetryTrace(BaseModel):
+    session_id: int
+    driver_number: int
+    lap_number: int
+    samples: int
+    points: int
+    distance: List[float]
+    time: List[float]
+    speed: List[Optional[float]]
+    throttle: Optional[List[Optional[float]]] = None
+    brake: Optional[List[Optional[float]]] = None
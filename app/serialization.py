@@ -0,0 +1,47 @@
+"""
+Fast JSON path for list endpoints.
+
+Rows are selected as plain column tuples (no ORM objects) in the field order of the response schema
+and encoded straight to bytes, skipping Pydantic validation and jsonable_encoder.
+Endpoints keep `response_model=...` so the OpenAPI schema doesn't change.
+orjson is used when installed, otherwise the standard json module.
+"""
+
+import json
+from fastapi import Response
+from pydantic import BaseModel
+from sqlalchemy import Float, cast
+from typing import List, Optional, Sequence, Type, get_args
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def schema_columns(model, schema: Type[BaseModel]) -> List:
+    """
+    Table columns of `model` for every field of the response `schema`, in the same order.
+    Float fields are cast to REAL, so integers stored in float columns are encoded as 280.0 like Pydantic does.
+    """
+    columns = []
+    for field_name, field in schema.model_fields.items():
+        column = model.__table__.c[field_name]
+        if field.annotation is float or float in get_args(field.annotation):
+            column = cast(column, Float).label(field_name)
+        columns.append(column)
+    return columns
+
+def dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode()
+
+def encode_rows(rows: Sequence, fields: Optional[Sequence[str]] = None) -> bytes:
+    """Encode result rows (SQLAlchemy Row tuples) as a JSON array of objects."""
+    if not rows:
+        return b"[]"
+    fields = fields or rows[0]._fields
+    return dumps([dict(zip(fields, row)) for row in rows])
+
+def rows_response(rows: Sequence, status_code: int = 200) -> Response:
+    return Response(content=encode_rows(rows), status_code=status_code, media_type="application/json")
@@ -0,0 +1,71 @@
+import csv
+import io
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from typing import Callable, Iterable, List, Optional
+from app import database
+from app.serialization import dumps
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv"
+
+# number of rows read from the database and written to the response at once
+STREAM_BATCH_SIZE = 1000
+
+def get_stream_format(request: Request, output_format: Optional[str]) -> Optional[str]:
+    """
+    Decide if a list endpoint should stream its response.
+    Explicit ?format= wins, otherwise the Accept header is checked.
+    Returns "ndjson", "csv" or None (regular JSON list).
+    """
+    if output_format in ("ndjson", "csv"):
+        return output_format
+    if output_format == "json":
+        return None
+
+    accept = request.headers.get("accept", "")
+    if NDJSON_MEDIA_TYPE in accept:
+        return "ndjson"
+    if CSV_MEDIA_TYPE in accept:
+        return "csv"
+    return None
+
+def _encode_ndjson(columns: List[str], rows: List[tuple]) -> bytes:
+    return b"".join(dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+
+def _encode_csv(rows: List[tuple]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+def stream_rows(
+    rows_factory: Callable[..., Iterable[tuple]],
+    columns: List[str],
+    stream_format: str,
+    batch_size: int = STREAM_BATCH_SIZE
+) -> StreamingResponse:
+    """
+    Stream rows produced by rows_factory(db) as NDJSON or CSV, batch_size rows per chunk.
+    The generator opens its own database session because the request session
+    is already closed when the response body is being sent.
+    """
+    def generate():
+        db = database.ReadSessionLocal()
+        try:
+            if stream_format == "csv":
+                yield _encode_csv([columns])
+
+            batch = []
+            for row in rows_factory(db):
+                batch.append(tuple(row))
+                if len(batch) >= batch_size:
+                    yield _encode_ndjson(columns, batch) if stream_format == "ndjson" else _encode_csv(batch)
+                    batch = []
+
+            if batch:
+                yield _encode_ndjson(columns, batch) if stream_format == "ndjson" else _encode_csv(batch)
+        finally:
+            db.close()
+
+    media_type = NDJSON_MEDIA_TYPE if stream_format == "ndjson" else CSV_MEDIA_TYPE
+    return StreamingResponse(generate(), media_type=media_type)
@@ -0,0 +1,153 @@
+"""
+On-disk columnar store of raw FastF1 car data, partitioned by session and driver.
+
+    {root}/{session_id}/{driver_number}/{channel}.npy   one file per channel, all samples of the session
+    {root}/{session_id}/{driver_number}/laps.npy        lap index: (lap_number, start, stop) sample offsets
+
+Channels are SessionTime (int64 nanoseconds), Distance (meters from the first sample of the session),
+Speed, RPM, nGear, Throttle, Brake and DRS. Samples are sorted by SessionTime, and a lap is
+samples[start:stop]. Like Lap.get_car_data() a lap includes samples with LapStartTime <= SessionTime <= Time,
+so a sample exactly on a boundary belongs to both laps.
+
+Columns are opened with numpy memory mapping, so DriverTelemetry.lap() returns views into the files
+(no parsing, no copy) and new per-lap aggregates can be computed without loading FastF1 sessions again.
+The files are written by scripts/sync_telemetry_from_fastf1.py. The root directory is data/telemetry_store,
+or F1_STATS_TELEMETRY_STORE.
+"""
+
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+import numpy as np
+import pandas as pd
+
+STORE_ROOT = Path(os.getenv("F1_STATS_TELEMETRY_STORE", "data/telemetry_store"))
+
+# stored channels and their dtypes (FastF1 values are whole numbers, float32 keeps them exact and allows NaN,
+# Brake is stored as 0/1)
+CHANNEL_DTYPES = {
+    "SessionTime": np.int64,
+    "Distance": np.float64,
+    "Speed": np.float32,
+    "RPM": np.float32,
+    "nGear": np.float32,
+    "Throttle": np.float32,
+    "Brake": np.float32,
+    "DRS": np.float32,
+}
+
+LAP_INDEX_DTYPE = np.dtype([("lap_number", np.int32), ("start", np.int64), ("stop", np.int64)])
+LAP_INDEX_FILE = "laps.npy"
+
+def _root(root: Optional[Union[str, Path]]) -> Path:
+    return Path(root) if root is not None else STORE_ROOT
+
+def driver_path(session_id: int, driver_number: int, root: Optional[Union[str, Path]] = None) -> Path:
+    return _root(root) / str(int(session_id)) / str(int(driver_number))
+
+def _session_time_ns(values) -> np.ndarray:
+    return pd.to_timedelta(values).to_numpy(dtype="timedelta64[ns]").astype(np.int64)
+
+def _distance(times: np.ndarray, speed: np.ndarray) -> np.ndarray:
+    """Integrated distance in meters (speed in km/h), like FastF1 Telemetry.add_distance()."""
+    seconds = np.diff(times, prepend=times[:1]) / 1e9
+    return np.cumsum(np.nan_to_num(speed.astype(np.float64)) / 3.6 * seconds)
+
+def lap_index(times: np.ndarray, laps: pd.DataFrame) -> np.ndarray:
+    """
+    Sample offsets of every lap in sorted `times` (int64 ns). Laps without lap number, times or samples are left out.
+    """
+    laps = laps[laps["LapNumber"].notna() & laps["LapStartTime"].notna() & laps["Time"].notna()]
+    index = np.empty(len(laps), dtype=LAP_INDEX_DTYPE)
+    index["lap_number"] = laps["LapNumber"].to_numpy().astype(np.int32)
+    index["start"] = np.searchsorted(times, _session_time_ns(laps["LapStartTime"]), side="left")
+    index["stop"] = np.searchsorted(times, _session_time_ns(laps["Time"]), side="right")
+    return index[index["stop"] > index["start"]]
+
+def write_driver_telemetry(
+    session_id: int,
+    driver_number: int,
+    car_data: pd.DataFrame,
+    laps: pd.DataFrame,
+    root: Optional[Union[str, Path]] = None
+) -> Optional[Path]:
+    """
+    Save the car data of one driver and session (FastF1 session.car_data[driver_number]) with the lap index
+    of `laps` (LapNumber, LapStartTime, Time). Replaces an existing partition, readers never see a partial one.
+    Returns the partition directory, None if there is no car data.
+    """
+    if car_data is None or car_data.empty or "SessionTime" not in car_data.columns:
+        return None
+
+    times = _session_time_ns(car_data["SessionTime"])
+    order = np.argsort(times, kind="stable")
+    times = times[order]
+
+    columns = {"SessionTime": times}
+    for name, dtype in CHANNEL_DTYPES.items():
+        if name in car_data.columns and name != "SessionTime":
+            columns[name] = car_data[name].to_numpy(dtype=dtype)[order]
+    if "Distance" not in columns and "Speed" in columns:
+        columns["Distance"] = _distance(times, columns["Speed"])
+
+    path = driver_path(session_id, driver_number, root)
+    tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+    for name, values in columns.items():
+        np.save(tmp_path / f"{name}.npy", values)
+    np.save(tmp_path / LAP_INDEX_FILE, lap_index(times, laps) if laps is not None else np.empty(0, dtype=LAP_INDEX_DTYPE))
+
+    # swap directories, the old partition is removed after the new one is in place
+    old_path = path.with_name(f"{path.name}.old-{os.getpid()}")
+    if path.exists():
+        path.rename(old_path)
+    tmp_path.rename(path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return path
+
+class DriverTelemetry:
+    """Memory-mapped telemetry of one driver in one session."""
+    def __init__(self, path: Path):
+        self.path = path
+        self.laps: np.ndarray = np.load(path / LAP_INDEX_FILE)
+        self.channels: List[str] = [name for name in CHANNEL_DTYPES if (path / f"{name}.npy").exists()]
+        self._columns: Dict[str, np.ndarray] = {}
+        # changes when the partition is rewritten (used as part of cache keys)
+        self.modified: int = (path / LAP_INDEX_FILE).stat().st_mtime_ns
+        self._offsets = {int(lap["lap_number"]): (int(lap["start"]), int(lap["stop"])) for lap in self.laps}
+
+    def column(self, name: str) -> np.ndarray:
+        """All samples of one channel (memory-mapped, read-only)."""
+        if name not in self._columns:
+            if name not in self.channels:
+                raise KeyError(f"Channel '{name}' is not stored for {self.path}.")
+            self._columns[name] = np.load(self.path / f"{name}.npy", mmap_mode="r")
+        return self._columns[name]
+
+    @property
+    def lap_numbers(self) -> List[int]:
+        return list(self._offsets)
+
+    def lap(self, lap_number: int, channels: Optional[List[str]] = None) -> Optional[Dict[str, np.ndarray]]:
+        """Samples of one lap as {channel: view}, None if the lap has no samples."""
+        offsets = self._offsets.get(int(lap_number))
+        if offsets is None:
+            return None
+        start, stop = offsets
+        return {name: self.column(name)[start:stop] for name in (channels or self.channels)}
+
+def open_driver_telemetry(session_id: int, driver_number: int, root: Optional[Union[str, Path]] = None) -> Optional[DriverTelemetry]:
+    """Stored telemetry of one driver and session, None if it wasn't stored."""
+    path = driver_path(session_id, driver_number, root)
+    if not (path / LAP_INDEX_FILE).exists():
+        return None
+    return DriverTelemetry(path)
+
+def session_driver_numbers(session_id: int, root: Optional[Union[str, Path]] = None) -> List[int]:
+    """Driver numbers with stored telemetry in one session."""
+    path = _root(root) / str(int(session_id))
+    if not path.is_dir():
+        return []
+    return sorted(int(child.name) for child in path.iterdir() if child.name.isdigit() and (child / LAP_INDEX_FILE).exists())
@@ -0,0 +1,142 @@
+"""
+Downsampled lap traces (speed / throttle / brake over distance) from the telemetry store for plotting.
+
+Traces are reduced with largest-triangle-three-buckets (LTTB) on speed over distance, the other channels
+are taken at the same samples. For every lap a pyramid of decimation levels (each half the size of the
+previous one) is built once and kept in an LRU cache, a request for N points reduces the smallest level
+that still has >= N points (less than 2N), so repeated requests with different N cost O(N).
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
+import numpy as np
+from app.telemetry_store import DriverTelemetry
+
+# smallest pyramid level (requests for fewer points reduce this level)
+MIN_LEVEL_POINTS = 64
+TRACE_CACHE_SIZE = 512
+
+TRACE_CHANNELS = ("Speed", "Throttle", "Brake")
+
+# buckets up to this size are reduced with plain Python (cheaper than numpy calls on a few values)
+SMALL_BUCKET = 16
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Indexes of `threshold` points selected by largest-triangle-three-buckets (first and last point always kept).
+    The area of the triangle (a, j, c) with a = point selected in the previous bucket, c = average of the next bucket is
+    |x_a * (y_j - y_c) + y_a * (x_c - x_j) + (x_j * y_c - x_c * y_j)|, the three terms that don't depend on a
+    are computed for all points at once, so only the choice of a runs bucket by bucket.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # inner points 1..n-2 split into threshold-2 buckets, bucket i = [edges[i], edges[i + 1])
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    counts = np.diff(edges)
+    average_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    average_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+    # the third point of the last bucket is the last point
+    average_x = np.append(average_x[1:], x[-1])
+    average_y = np.append(average_y[1:], y[-1])
+
+    # per point terms with the average of the point's next bucket
+    bucket = np.repeat(np.arange(threshold - 2), counts)
+    next_x, next_y = average_x[bucket], average_y[bucket]
+    inner_x, inner_y = x[1:n - 1], y[1:n - 1]
+    p = np.empty(n)
+    q = np.empty(n)
+    r = np.empty(n)
+    p[1:n - 1] = inner_y - next_y
+    q[1:n - 1] = next_x - inner_x
+    r[1:n - 1] = inner_x * next_y - next_x * inner_y
+    p_list, q_list, r_list = p.tolist(), q.tolist(), r.tolist()
+
+    selected = [0] * threshold
+    selected[-1] = n - 1
+    x_list, y_list = x.tolist(), y.tolist()
+    edge_list = edges.tolist()
+    a = 0
+    for i in range(threshold - 2):
+        start, stop = edge_list[i], edge_list[i + 1]
+        xa, ya = x_list[a], y_list[a]
+        if stop - start <= SMALL_BUCKET:
+            a = max(range(start, stop), key=lambda j: abs(xa * p_list[j] + ya * q_list[j] + r_list[j]))
+        else:
+            a = start + int(np.argmax(np.abs(xa * p[start:stop] + ya * q[start:stop] + r[start:stop])))
+        selected[i + 1] = a
+    return np.array(selected, dtype=np.int64)
+
+@dataclass
+class LapTrace:
+    """All samples of one lap (distance and time from the lap start) and its decimation levels (sample indexes)."""
+    distance: np.ndarray
+    time: np.ndarray
+    channels: dict
+    levels: List[np.ndarray]
+
+    @property
+    def samples(self) -> int:
+        return len(self.distance)
+
+    def indices(self, points: int) -> np.ndarray:
+        """Sample indexes of a trace with at most `points` points."""
+        # levels go from all samples to the smallest, use the smallest one with enough points
+        level = next((level for level in reversed(self.levels) if len(level) >= points), self.levels[0])
+        if len(level) <= points:
+            return level
+        speed = self.channels["Speed"]
+        return level[lttb_indices(self.distance[level], speed[level], points)]
+
+def build_lap_trace(telemetry: DriverTelemetry, lap_number: int) -> Optional[LapTrace]:
+    """LapTrace of one stored lap, None if the lap or its speed samples are not stored."""
+    if "Speed" not in telemetry.channels:
+        return None
+    samples = telemetry.lap(lap_number, [name for name in ("SessionTime", "Distance", *TRACE_CHANNELS) if name in telemetry.channels])
+    if samples is None:
+        return None
+
+    # copies of one lap (small), so the cache doesn't keep the memory-mapped files open
+    distance = np.asarray(samples["Distance"], dtype=np.float64)
+    distance = distance - distance[0]
+    time = (np.asarray(samples["SessionTime"]) - samples["SessionTime"][0]) / 1e9
+    channels = {name: np.asarray(samples[name], dtype=np.float64) for name in TRACE_CHANNELS if name in samples}
+    speed = np.nan_to_num(channels["Speed"])
+
+    levels = [np.arange(len(distance))]
+    while len(levels[-1]) >= 2 * MIN_LEVEL_POINTS:
+        level = levels[-1]
+        levels.append(level[lttb_indices(distance[level], speed[level], len(level) // 2)])
+    return LapTrace(distance, time, channels, levels)
+
+class TraceCache:
+    """LRU cache of LapTrace per stored partition (path + modification time, so rewritten partitions are rebuilt) and lap."""
+    def __init__(self, max_entries: int = TRACE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Optional[LapTrace]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, telemetry: DriverTelemetry, lap_number: int) -> Optional[LapTrace]:
+        key = (str(telemetry.path), telemetry.modified, int(lap_number))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        trace = build_lap_trace(telemetry, lap_number)
+        with self._lock:
+            self._entries[key] = trace
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return trace
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# shared cache of the API process
+trace_cache = TraceCache()
@@ -0,0 +1,180 @@
+"""
+Load benchmark: mixed read / sync traffic against the laps router in one worker.
+
+Compares two apps on the same temporary SQLite file:
+- "threadpool": handlers as they were before (def endpoints with sync Session, sync writes in run_in_threadpool)
+- "async": app.routers.laps (async endpoints with AsyncSession / aiosqlite)
+
+Readers page through GET /laps/, writers call POST /laps/sync/{race_id} against a mocked OpenF1 API
+with a fixed response latency. Requests go through httpx.ASGITransport, so client and app share one event loop
+like a single uvicorn worker.
+
+    python -m benchmarks.bench_async_api --readers 32 --writers 4 --seconds 10
+"""
+
+import os
+import tempfile
+
+# the app modules create their engines on import, point them to a temporary database first
+_tmp_dir = tempfile.TemporaryDirectory()
+os.environ["F1_STATS_DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir.name, 'bench.db')}"
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Annotated, List
+import anyio
+import httpx
+from fastapi import Depends, FastAPI, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from app import database, models, schemas
+from app.openf1_client import OpenF1Client, get_openf1_client
+from app.pagination import set_next_cursor
+from app.repositories import bulk_repository, lap_repository
+from app.routers import laps
+
+RACES = 8
+DRIVERS = 20
+LAPS_PER_DRIVER = 60
+
+def openf1_laps(race_id: int) -> list:
+    return [
+        {
+            "session_key": race_id,
+            "driver_number": driver_number,
+            "lap_number": lap_number,
+            "lap_duration": 90 + random.random(),
+            "duration_sector_1": 30.0,
+            "duration_sector_2": 30.0,
+            "duration_sector_3": 30.0,
+            "i1_speed": 280,
+            "i2_speed": 290,
+            "st_speed": 310,
+            "is_pit_out_lap": False
+        }
+        for driver_number in range(1, DRIVERS + 1)
+        for lap_number in range(1, LAPS_PER_DRIVER + 1)
+    ]
+
+def mock_openf1_client(latency: float) -> OpenF1Client:
+    payloads = {race_id: openf1_laps(race_id) for race_id in range(1, RACES + 1)}
+
+    async def handler(request: httpx.Request):
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json=payloads[int(request.url.params["meeting_key"])])
+
+    return OpenF1Client(transport=httpx.MockTransport(handler), rate_per_second=1e6, burst=1e6)
+
+def threadpool_app() -> FastAPI:
+    """The laps endpoints before the async port: sync Session, blocking work in the threadpool."""
+    app = FastAPI()
+
+    def get_db():
+        db = database.SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @app.get("/laps/", response_model=List[schemas.Lap])
+    def get_all_laps(response: Response, params: Annotated[schemas.LapListParams, Query()], db: Session = Depends(database.get_read_db)):
+        rows, next_cursor = lap_repository.get_all_laps(db, params)
+        set_next_cursor(response, next_cursor)
+        return rows
+
+    @app.post("/laps/sync/{race_id}")
+    async def fetch_laps(race_id: int, db: Session = Depends(get_db), openf1: OpenF1Client = Depends(get_openf1_client)):
+        laps_json = await openf1.get_json(laps.OPENF1_LAPS_ENDPOINT, params={"meeting_key": race_id})
+        rows = [schemas.LapCreate(race_id=race_id, session_id=l["session_key"], **{key: l[key] for key in l if key != "session_key"}) for l in laps_json]
+        result = await run_in_threadpool(bulk_repository.upsert_laps, db, rows)
+        return {"created": result["created"], "updated": result["updated"], "total": len(laps_json)}
+
+    return app
+
+def async_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(laps.router)
+    return app
+
+async def run_load(name: str, app: FastAPI, readers: int, writers: int, seconds: float, latency: float):
+    openf1 = mock_openf1_client(latency)
+    app.dependency_overrides[get_openf1_client] = lambda: openf1
+
+    read_latencies = []
+    syncs = 0
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        async def reader():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                params = {"session_id": random.randint(1, RACES), "driver_number": random.randint(1, DRIVERS), "limit": 100}
+                start = time.perf_counter()
+                try:
+                    response = await client.get("/laps/", params=params)
+                except Exception:
+                    # for example pool timeout when sessions wait for a free thread to be closed
+                    errors += 1
+                    continue
+                if response.status_code == 200:
+                    read_latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        async def writer():
+            nonlocal syncs, errors
+            while time.perf_counter() < deadline:
+                try:
+                    response = await client.post(f"/laps/sync/{random.randint(1, RACES)}")
+                except Exception:
+                    errors += 1
+                    continue
+                if response.status_code == 200:
+                    syncs += 1
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(reader() for _ in range(readers)), *(writer() for _ in range(writers)))
+        elapsed = time.perf_counter() - start
+
+    await openf1.aclose()
+    read_latencies.sort()
+    total = len(read_latencies) + syncs
+    print(f"\n[{name}]")
+    print(f"  {total / elapsed:.0f} requests/s ({len(read_latencies)} reads, {syncs} syncs, {errors} errors in {elapsed:.1f} s)")
+    if read_latencies:
+        p99 = read_latencies[min(len(read_latencies) - 1, int(len(read_latencies) * 0.99))]
+        print(f"  reads: p50={statistics.median(read_latencies) * 1000:.1f} ms, p99={p99 * 1000:.1f} ms")
+
+async def main(readers: int, writers: int, seconds: float, latency: float, threads: int):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = threads
+    models.Base.metadata.create_all(bind=database.engine)
+
+    # seed every race once so readers hit real rows in both runs
+    db = database.SessionLocal()
+    for race_id in range(1, RACES + 1):
+        rows = [schemas.LapCreate(race_id=race_id, session_id=l["session_key"], **{key: l[key] for key in l if key != "session_key"}) for l in openf1_laps(race_id)]
+        bulk_repository.upsert_laps(db, rows)
+    db.close()
+
+    await run_load("threadpool", threadpool_app(), readers, writers, seconds, latency)
+    await run_load("async", async_app(), readers, writers, seconds, latency)
+
+    await database.async_engine.dispose()
+    await database.async_read_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=32)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--latency", type=float, default=0.2, help="mocked OpenF1 response time in seconds")
+    parser.add_argument("--threads", type=int, default=40, help="threadpool size of the worker")
+    args = parser.parse_args()
+    asyncio.run(main(args.readers, args.writers, args.seconds, args.latency, args.threads))
+    _tmp_dir.cleanup()
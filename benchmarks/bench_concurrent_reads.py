@@ -0,0 +1,135 @@
+"""
+Load benchmark: concurrent API-style readers while a bulk lap sync is writing.
+
+Runs the same workload twice on a temporary SQLite file:
+- "default": engine as it was before (rollback journal, 5 s sqlite3 timeout, one pool for everything)
+- "production": app.database.create_db_engine profile (WAL, synchronous=NORMAL, busy_timeout, cache/mmap)
+  with a separate read-only pool for readers
+
+    python -m benchmarks.bench_concurrent_reads --readers 8 --laps 200000
+"""
+
+import argparse
+from itertools import islice
+import random
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from app import database, models, schemas
+from app.repositories import bulk_repository, lap_repository
+
+DRIVERS = 20
+LAPS_PER_DRIVER = 60
+
+def synthetic_laps(count: int):
+    sessions = max(1, count // (DRIVERS * LAPS_PER_DRIVER))
+    for session_id in range(1, sessions + 1):
+        for driver_number in range(1, DRIVERS + 1):
+            for lap_number in range(1, LAPS_PER_DRIVER + 1):
+                yield {
+                    "race_id": 1,
+                    "session_id": session_id,
+                    "driver_number": driver_number,
+                    "lap_number": lap_number,
+                    "lap_duration": 90 + random.random(),
+                    "duration_sector_1": None,
+                    "duration_sector_2": None,
+                    "duration_sector_3": None,
+                    "i1_speed": None,
+                    "i2_speed": None,
+                    "st_speed": None,
+                    "is_pit_out_lap": False,
+                    "pit_in_time": None,
+                    "pit_out_time": None,
+                    "track_status": None
+                }
+
+def run_profile(name: str, write_engine, read_engine, readers: int, laps: int):
+    models.Base.metadata.create_all(bind=write_engine)
+    WriteSession = sessionmaker(bind=write_engine)
+    ReadSession = sessionmaker(bind=read_engine)
+
+    # seed one session so readers have something to read from the start
+    seed_db = WriteSession()
+    bulk_repository.bulk_upsert(seed_db, models.Lap, islice(synthetic_laps(0), DRIVERS * LAPS_PER_DRIVER), ["session_id", "driver_number", "lap_number"])
+    seed_db.close()
+
+    done = threading.Event()
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def reader():
+        db = ReadSession()
+        try:
+            while not done.is_set():
+                params = schemas.LapListParams(session_id=1, driver_number=random.randint(1, DRIVERS), limit=100)
+                start = time.perf_counter()
+                try:
+                    lap_repository.get_all_laps(db, params)
+                    db.rollback()
+                    with lock:
+                        latencies.append(time.perf_counter() - start)
+                except OperationalError as e:
+                    db.rollback()
+                    with lock:
+                        errors.append(str(e.orig))
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+
+    write_db = WriteSession()
+    write_start = time.perf_counter()
+    write_error = None
+    try:
+        result = bulk_repository.bulk_upsert(write_db, models.Lap, synthetic_laps(laps), ["session_id", "driver_number", "lap_number"], batch_size=5000)
+    except OperationalError as e:
+        write_error = str(e.orig)
+        result = {"created": 0, "updated": 0}
+    write_elapsed = time.perf_counter() - write_start
+    write_db.close()
+
+    done.set()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    print(f"\n[{name}]")
+    print(f"  writer: {result['created'] + result['updated']} laps in {write_elapsed:.2f} s" + (f" (FAILED: {write_error})" if write_error else ""))
+    if latencies:
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"  readers: {len(latencies)} reads ({len(latencies) / write_elapsed:.0f}/s), "
+              f"p50={statistics.median(latencies) * 1000:.1f} ms, p99={p99 * 1000:.1f} ms, max={latencies[-1] * 1000:.1f} ms")
+    print(f"  'database is locked' / other read errors: {len(errors)}")
+
+def run(readers: int, laps: int):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "default.db"
+        url = f"sqlite:///{db_path}"
+        # engine exactly as app/database.py created it before the production profile
+        engine = create_engine(url, connect_args={"check_same_thread": False}, pool_size=readers + 1)
+        run_profile("default", engine, engine, readers, laps)
+        engine.dispose()
+
+        db_path = Path(tmp_dir) / "production.db"
+        url = f"sqlite:///{db_path}"
+        write_engine = database.create_db_engine(url)
+        read_engine = database.create_db_engine(url, read_only=True, pool_size=readers)
+        run_profile("production", write_engine, read_engine, readers, laps)
+        write_engine.dispose()
+        read_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--laps", type=int, default=200000)
+    args = parser.parse_args()
+    run(args.readers, args.laps)
@@ -0,0 +1,128 @@
+"""
+Benchmark: POST /drivers/sync payload processing, per-row rescan vs single-pass merge.
+
+- "rescan": the previous loop, for every row without country_code the whole payload is scanned again
+  and normalize_driver_id runs on every row (O(n^2) for rows with a missing country_code)
+- "merge": merge_openf1_drivers (app/routers/drivers.py), rows grouped by driver_id in one pass
+
+The payload is a recorded OpenF1 /drivers response (--fixtures, see scripts/record_openf1_fixtures.py)
+or a synthetic one (--rows rows of --drivers drivers, --missing share of rows without country_code).
+End to end, POST /drivers/sync is replayed offline against a temporary database.
+
+    python -m benchmarks.bench_driver_sync --rows 6000
+    python -m benchmarks.bench_driver_sync --fixtures data/openf1_fixtures
+"""
+
+import os
+import tempfile
+
+# the app modules create their engines on import, point them to a temporary database first
+_tmp_dir = tempfile.TemporaryDirectory()
+os.environ["F1_STATS_DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir.name, 'bench.db')}"
+
+import argparse
+import asyncio
+import random
+import time
+from pathlib import Path
+import httpx
+from fastapi import FastAPI
+from app import database, models, schemas
+from app.openf1_client import OpenF1Client, get_openf1_client
+from app.openf1_fixtures import ReplayTransport, read_fixture, write_fixture
+from app.routers import drivers
+from app.routers.drivers import merge_openf1_drivers
+from app.utils import normalize_driver_id, normalize_full_name
+
+def synthetic_payload(rows: int, drivers_count: int, missing: float) -> list:
+    rng = random.Random(0)
+    return [
+        {
+            "full_name": f"Driver{number} LASTNAME{number}", "first_name": f"Driver{number}", "last_name": f"Lastname{number}",
+            "driver_number": number, "name_acronym": f"D{number:02d}", "team_name": f"Team {number % 10}",
+            "country_code": None if rng.random() < missing else "GBR", "session_key": i
+        }
+        for i in range(rows)
+        for number in [rng.randint(1, drivers_count)]
+    ]
+
+def rescan_drivers(drivers_json: list) -> list:
+    """The loop POST /drivers/sync used before merge_openf1_drivers (last row per driver wins in the upsert)."""
+    result = {}
+    for d in drivers_json:
+        openf1_full_name = d.get("full_name", "").strip()
+        driver_id = normalize_driver_id(openf1_full_name)
+        clean_full_name = normalize_full_name(openf1_full_name)
+
+        country_code = d.get("country_code")
+        if not country_code:
+            for entry in drivers_json:
+                if normalize_driver_id(entry.get("full_name")) == driver_id and entry.get("country_code"):
+                    country_code = entry.get("country_code")
+                    break
+        if not country_code:
+            country_code = ""
+
+        result[driver_id] = schemas.DriverCreate(
+            driver_id = driver_id,
+            full_name = clean_full_name,
+            first_name = d.get("first_name") or "",
+            last_name = d.get("last_name") or "",
+            driver_number = d.get("driver_number", 0),
+            name_acronym = d.get("name_acronym") or "",
+            team_name = d.get("team_name") or "",
+            country_code = country_code
+        )
+    return list(result.values())
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+async def sync_end_to_end(fixtures: Path) -> float:
+    app = FastAPI()
+    app.include_router(drivers.router)
+
+    async def replay_openf1_client():
+        async with OpenF1Client(base_url="http://openf1.replay/v1", rate_per_second=1000, burst=1000, transport=ReplayTransport(fixtures)) as client:
+            yield client
+
+    app.dependency_overrides[get_openf1_client] = replay_openf1_client
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        response = await client.post("/drivers/sync")
+        response.raise_for_status()
+        elapsed = time.perf_counter() - start
+    await database.async_engine.dispose()
+    await database.async_read_engine.dispose()
+    return elapsed
+
+def run(args):
+    if args.fixtures:
+        fixtures = Path(args.fixtures)
+        payload = read_fixture(fixtures, "drivers")
+        print(f"recorded payload: {len(payload)} rows")
+    else:
+        fixtures = Path(_tmp_dir.name) / "fixtures"
+        payload = synthetic_payload(args.rows, args.drivers, args.missing)
+        write_fixture(fixtures, "drivers", None, payload)
+        print(f"synthetic payload: {len(payload)} rows, {args.drivers} drivers, {args.missing:.0%} without country_code")
+
+    rescan_time, expected = timed(rescan_drivers, payload)
+    merge_time, result = timed(merge_openf1_drivers, payload)
+    assert {d.driver_id for d in expected} == {d.driver_id for d in result}
+    print(f"  rescan: {rescan_time * 1000:9.1f} ms")
+    print(f"  merge:  {merge_time * 1000:9.1f} ms  ({rescan_time / merge_time:.0f}x), {len(result)} drivers")
+
+    models.Base.metadata.create_all(bind=database.engine)
+    print(f"  POST /drivers/sync end to end: {asyncio.run(sync_end_to_end(fixtures)) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help="recorded fixture directory with drivers.json.gz")
+    parser.add_argument("--rows", type=int, default=6000)
+    parser.add_argument("--drivers", type=int, default=80)
+    parser.add_argument("--missing", type=float, default=0.3)
+    run(parser.parse_args())
+    _tmp_dir.cleanup()
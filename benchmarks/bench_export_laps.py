@@ -0,0 +1,98 @@
+"""
+Benchmark: peak memory and time of the laps dataset export (scripts/export_laps.py), whole join vs chunks.
+
+- full: the whole join in one DataFrame, cleaned and written at once (how the export worked before)
+- chunked: write_laps_export, rows read with yield_per and cleaned/written chunk by chunk
+
+A synthetic database with --races races (20 drivers, 2 exported sessions, --laps laps each) is created in a
+temporary directory. Peak memory is measured with tracemalloc.
+
+    python -m benchmarks.bench_export_laps --races 20 --laps 60 --chunk-size 50000
+"""
+
+import os
+import tempfile
+
+# the app modules create their engines on import, point them to a temporary database first
+_tmp_dir = tempfile.TemporaryDirectory()
+os.environ["F1_STATS_DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir.name, 'bench.db')}"
+
+import argparse
+import random
+import time
+import tracemalloc
+import pandas as pd
+from sqlalchemy import insert
+from app import database, models
+from scripts.export_laps import EXPORT_COLUMNS, clean_laps_dataframe, export_laps_query, write_laps_export
+
+SESSION_NAMES = ["Practice 2", "Race"]
+
+def create_data(races: int, laps: int, drivers: int = 20):
+    models.Base.metadata.create_all(bind=database.engine)
+    rng = random.Random(0)
+    db = database.SessionLocal()
+    db.execute(insert(models.Driver), [
+        {"driver_id": f"driver_{number}", "full_name": f"Driver {number}", "driver_number": number} for number in range(1, drivers + 1)
+    ])
+    for race_id in range(1, races + 1):
+        db.execute(insert(models.Race), [{"race_id": race_id, "race_name": f"Grand Prix {race_id}", "location": f"City {race_id}", "year": 2024}])
+        session_ids = [race_id * 10 + i for i in range(len(SESSION_NAMES))]
+        db.execute(insert(models.Session), [
+            {"session_id": session_id, "race_id": race_id, "session_name": name} for session_id, name in zip(session_ids, SESSION_NAMES)
+        ])
+        db.execute(insert(models.Stint), [
+            {"race_id": race_id, "session_id": session_id, "driver_number": number, "stint_number": stint,
+             "lap_start": (stint - 1) * laps // 2 + 1, "lap_end": stint * laps // 2, "tyre_compound": rng.choice(["SOFT", "MEDIUM", "HARD"]),
+             "tyre_age_at_start": rng.randint(0, 5)}
+            for session_id in session_ids for number in range(1, drivers + 1) for stint in (1, 2)
+        ])
+        db.execute(insert(models.Lap), [
+            {"race_id": race_id, "session_id": session_id, "driver_number": number, "lap_number": lap,
+             "lap_duration": 90 + rng.random() * 5, "duration_sector_1": 30 + rng.random(), "duration_sector_2": 30 + rng.random(),
+             "duration_sector_3": 30 + rng.random(), "pit_in_time": None, "pit_out_time": None, "track_status": "1"}
+            for session_id in session_ids for number in range(1, drivers + 1) for lap in range(1, laps + 1)
+        ])
+    db.commit()
+    db.close()
+
+def full_export(output_file: str) -> int:
+    db = database.SessionLocal()
+    try:
+        df = pd.DataFrame(export_laps_query(db).all(), columns=list(EXPORT_COLUMNS))
+        df_clean = clean_laps_dataframe(df)
+        df_clean.to_csv(output_file, index=False)
+        return len(df_clean)
+    finally:
+        db.close()
+
+def chunked_export(output_file: str, chunk_size: int) -> int:
+    db = database.SessionLocal()
+    try:
+        return write_laps_export(db, output_file, chunk_size=chunk_size)["rows"]
+    finally:
+        db.close()
+
+def measure(name: str, export, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = export(*args)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {name:8s} {rows:8d} rows {seconds:8.2f} s  peak {peak / 2**20:8.1f} MiB")
+
+def run(args):
+    create_data(args.races, args.laps)
+    print(f"{args.races} races x 2 sessions x 20 drivers x {args.laps} laps, chunk size {args.chunk_size}:")
+    measure("full", full_export, os.path.join(_tmp_dir.name, "full.csv"))
+    measure("chunked", chunked_export, os.path.join(_tmp_dir.name, "chunked.csv"), args.chunk_size)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--races", type=int, default=20)
+    parser.add_argument("--laps", type=int, default=60, help="laps per driver and session")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    run(parser.parse_args())
+    database.engine.dispose()
+    _tmp_dir.cleanup()
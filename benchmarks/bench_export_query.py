@@ -0,0 +1,138 @@
+"""
+Benchmark: the laps export query (scripts/export_laps.py), range join vs stint_id equi-join.
+
+- range join: laps joined to stints on session/driver and lap_number BETWEEN lap_start AND lap_end
+  (how the export query worked before laps.stint_id)
+- equi-join: export_laps_query, laps joined to their stint by laps.stint_id
+- assign: lap_repository.assign_lap_stints for all races (the pass done during stint/lap sync)
+
+Both queries are timed for the whole export and for an incremental export (--since-race, last quarter of races).
+
+A synthetic database with --races races (20 drivers, 2 exported sessions, --laps laps and --stints stints each)
+is created in a temporary directory. Both queries are checked to return the same rows.
+
+    python -m benchmarks.bench_export_query --races 20 --laps 60 --stints 4
+"""
+
+import os
+import tempfile
+
+# the app modules create their engines on import, point them to a temporary database first
+_tmp_dir = tempfile.TemporaryDirectory()
+os.environ["F1_STATS_DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir.name, 'bench.db')}"
+
+import argparse
+import random
+import time
+from sqlalchemy import and_, insert
+from app import database, models
+from app.repositories import lap_repository
+from scripts.export_laps import export_laps_query
+
+SESSION_NAMES = ["Practice 2", "Race"]
+
+def create_data(races: int, laps: int, stints: int, drivers: int = 20):
+    models.Base.metadata.create_all(bind=database.engine)
+    rng = random.Random(0)
+    db = database.SessionLocal()
+    db.execute(insert(models.Driver), [
+        {"driver_id": f"driver_{number}", "full_name": f"Driver {number}", "driver_number": number} for number in range(1, drivers + 1)
+    ])
+    for race_id in range(1, races + 1):
+        db.execute(insert(models.Race), [{"race_id": race_id, "race_name": f"Grand Prix {race_id}", "location": f"City {race_id}", "year": 2024}])
+        session_ids = [race_id * 10 + i for i in range(len(SESSION_NAMES))]
+        db.execute(insert(models.Session), [
+            {"session_id": session_id, "race_id": race_id, "session_name": name} for session_id, name in zip(session_ids, SESSION_NAMES)
+        ])
+        db.execute(insert(models.Stint), [
+            {"race_id": race_id, "session_id": session_id, "driver_number": number, "stint_number": stint,
+             "lap_start": (stint - 1) * laps // stints + 1, "lap_end": stint * laps // stints,
+             "tyre_compound": rng.choice(["SOFT", "MEDIUM", "HARD"]), "tyre_age_at_start": rng.randint(0, 5)}
+            for session_id in session_ids for number in range(1, drivers + 1) for stint in range(1, stints + 1)
+        ])
+        db.execute(insert(models.Lap), [
+            {"race_id": race_id, "session_id": session_id, "driver_number": number, "lap_number": lap,
+             "lap_duration": 90 + rng.random() * 5, "duration_sector_1": 30 + rng.random(), "duration_sector_2": 30 + rng.random(),
+             "duration_sector_3": 30 + rng.random(), "track_status": "1"}
+            for session_id in session_ids for number in range(1, drivers + 1) for lap in range(1, laps + 1)
+        ])
+    db.commit()
+    db.close()
+
+# the export query before laps.stint_id: same columns, stint found by a range condition
+def range_join_query(db, since_race=None):
+    query = (
+        db.query(
+            models.Lap.race_id,
+            models.Lap.session_id,
+            models.Session.session_name,
+            models.Driver.driver_id,
+            models.Race.location.label("circuit_location"),
+            models.Lap.lap_number,
+            models.Stint.stint_number,
+            (models.Lap.lap_number - models.Stint.lap_start + 1).label("stint_lap_number"),
+            models.Stint.tyre_compound,
+            models.Stint.tyre_age_at_start,
+            models.Lap.duration_sector_1,
+            models.Lap.duration_sector_2,
+            models.Lap.duration_sector_3,
+            models.Lap.pit_in_time,
+            models.Lap.pit_out_time,
+            models.Lap.track_status,
+            models.Lap.lap_duration
+        )
+        .join(models.Race, models.Lap.race_id == models.Race.race_id)
+        .join(models.Session, models.Lap.session_id == models.Session.session_id)
+        .join(models.Driver, models.Lap.driver_number == models.Driver.driver_number)
+        .join(models.Stint, and_(
+            models.Lap.session_id == models.Stint.session_id,
+            models.Lap.driver_number == models.Stint.driver_number,
+            models.Lap.lap_number.between(models.Stint.lap_start, models.Stint.lap_end)
+        ))
+        .filter(models.Session.session_name.in_(["Race", "Practice 2"]))
+    )
+    if since_race is not None:
+        query = query.filter(models.Lap.race_id > since_race)
+    return query
+
+def assign_all(races: int) -> int:
+    db = database.SessionLocal()
+    try:
+        return sum(lap_repository.assign_lap_stints(db, race_id) for race_id in range(1, races + 1))
+    finally:
+        db.close()
+
+def measure(name: str, query, repeat: int, since_race=None) -> list:
+    db = database.SessionLocal()
+    try:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows = query(db, since_race).all()
+            times.append(time.perf_counter() - start)
+        print(f"  {name:10s} {len(rows):8d} rows  best {min(times) * 1000:8.1f} ms")
+        return sorted(map(tuple, rows))
+    finally:
+        db.close()
+
+def run(args):
+    create_data(args.races, args.laps, args.stints)
+    print(f"{args.races} races x 2 sessions x 20 drivers x {args.laps} laps, {args.stints} stints each:")
+    start = time.perf_counter()
+    assigned = assign_all(args.races)
+    print(f"  {'assign':10s} {assigned:8d} laps  {(time.perf_counter() - start) * 1000:8.1f} ms")
+    for since_race in (None, args.races * 3 // 4):
+        print(f" since race {since_race}:" if since_race else " whole export:")
+        range_rows = measure("range join", range_join_query, args.repeat, since_race)
+        equi_rows = measure("equi-join", export_laps_query, args.repeat, since_race)
+        assert range_rows == equi_rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--races", type=int, default=20)
+    parser.add_argument("--laps", type=int, default=60, help="laps per driver and session")
+    parser.add_argument("--stints", type=int, default=4, help="stints per driver and session")
+    parser.add_argument("--repeat", type=int, default=3)
+    run(parser.parse_args())
+    database.engine.dispose()
+    _tmp_dir.cleanup()
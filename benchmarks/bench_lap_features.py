@@ -0,0 +1,103 @@
+"""
+Benchmark: getting the training dataset after one new race is synced, full CSV re-export vs table lap_features.
+
+- export: scripts/export_laps.py exports all races to CSV again and training reads the CSV (how training worked before)
+- lap_features: the sync refreshes lap_features of the new race only (refresh_race_lap_features),
+  training reads the table (load_lap_features)
+
+A synthetic database with --races races (20 drivers, 2 dataset sessions, --laps laps each) is created in a
+temporary directory, lap_features is built for all races except the last one before timing.
+
+    python -m benchmarks.bench_lap_features --races 40 --laps 60
+"""
+
+import os
+import tempfile
+
+# the app modules create their engines on import, point them to a temporary database first
+_tmp_dir = tempfile.TemporaryDirectory()
+os.environ["F1_STATS_DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir.name, 'bench.db')}"
+
+import argparse
+import random
+import time
+import pandas as pd
+from sqlalchemy import insert
+from app import database, models
+from app.repositories import lap_feature_repository, lap_repository
+from scripts.export_laps import write_laps_export
+
+SESSION_NAMES = ["Practice 2", "Race"]
+
+def create_race(db, race_id: int, laps: int, drivers: int = 20, stints: int = 3):
+    rng = random.Random(race_id)
+    db.execute(insert(models.Race), [{"race_id": race_id, "race_name": f"Grand Prix {race_id}", "location": f"City {race_id}", "year": 2024}])
+    session_ids = [race_id * 10 + i for i in range(len(SESSION_NAMES))]
+    db.execute(insert(models.Session), [
+        {"session_id": session_id, "race_id": race_id, "session_name": name} for session_id, name in zip(session_ids, SESSION_NAMES)
+    ])
+    db.execute(insert(models.Stint), [
+        {"race_id": race_id, "session_id": session_id, "driver_number": number, "stint_number": stint,
+         "lap_start": (stint - 1) * laps // stints + 1, "lap_end": stint * laps // stints,
+         "tyre_compound": rng.choice(["SOFT", "MEDIUM", "HARD"]), "tyre_age_at_start": rng.randint(0, 5)}
+        for session_id in session_ids for number in range(1, drivers + 1) for stint in range(1, stints + 1)
+    ])
+    db.execute(insert(models.Lap), [
+        {"race_id": race_id, "session_id": session_id, "driver_number": number, "lap_number": lap,
+         "lap_duration": 90 + rng.random() * 5, "duration_sector_1": 30 + rng.random(), "duration_sector_2": 30 + rng.random(),
+         "duration_sector_3": 30 + rng.random(), "track_status": "1"}
+        for session_id in session_ids for number in range(1, drivers + 1) for lap in range(1, laps + 1)
+    ])
+    db.commit()
+    lap_repository.assign_lap_stints(db, race_id)
+
+def create_data(races: int, laps: int, drivers: int = 20):
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    db.execute(insert(models.Driver), [
+        {"driver_id": f"driver_{number}", "full_name": f"Driver {number}", "driver_number": number} for number in range(1, drivers + 1)
+    ])
+    for race_id in range(1, races):
+        create_race(db, race_id, laps, drivers)
+        lap_feature_repository.refresh_race_lap_features(db, race_id)
+    # the new race, synced just before retraining
+    create_race(db, races, laps, drivers)
+    db.close()
+
+def export_dataset(new_race_id: int) -> pd.DataFrame:
+    output_file = os.path.join(_tmp_dir.name, "laps_dataset.csv")
+    db = database.SessionLocal()
+    try:
+        write_laps_export(db, output_file)
+    finally:
+        db.close()
+    return pd.read_csv(output_file)
+
+def feature_dataset(new_race_id: int) -> pd.DataFrame:
+    db = database.SessionLocal()
+    try:
+        lap_feature_repository.refresh_race_lap_features(db, new_race_id)
+        return lap_feature_repository.load_lap_features(db)
+    finally:
+        db.close()
+
+def measure(name: str, dataset, new_race_id: int) -> int:
+    start = time.perf_counter()
+    rows = len(dataset(new_race_id))
+    print(f"  {name:12s} {rows:8d} rows {(time.perf_counter() - start) * 1000:8.1f} ms")
+    return rows
+
+def run(args):
+    create_data(args.races, args.laps)
+    print(f"{args.races} races x 2 sessions x 20 drivers x {args.laps} laps, dataset after syncing race {args.races}:")
+    exported = measure("export", export_dataset, args.races)
+    features = measure("lap_features", feature_dataset, args.races)
+    assert exported == features
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--races", type=int, default=40)
+    parser.add_argument("--laps", type=int, default=60, help="laps per driver and session")
+    run(parser.parse_args())
+    database.engine.dispose()
+    _tmp_dir.cleanup()
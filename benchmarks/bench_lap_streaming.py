@@ -0,0 +1,81 @@
+"""
+Benchmark: peak memory of parsing one large OpenF1 laps response, buffered vs streamed.
+
+- buffered: response.json() of the whole meeting and one LapCreate list (how laps were synced before)
+- streamed: OpenF1Client.iter_json_batches, every batch converted to LapCreate and dropped before the next one
+  (POST /laps/sync/{race_id}, sync_all_laps --stream)
+
+The synthetic payload (--laps laps) is generated lazily by a mock transport, so only memory allocated by the
+client side is measured (tracemalloc peak). Database writes are not included, they are the same in both modes.
+
+    python -m benchmarks.bench_lap_streaming --laps 500000 --batch-size 1000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import tracemalloc
+import httpx
+from app.openf1_client import OpenF1Client
+from scripts.sync_all_laps import to_lap_creates
+
+RACE_ID = 1229
+
+def lap_payload(laps: int, chunk_laps: int = 1000):
+    """Async byte iterator of a JSON array with `laps` synthetic OpenF1 laps."""
+    async def body():
+        rng = random.Random(0)
+        yield b"["
+        for start in range(0, laps, chunk_laps):
+            rows = [
+                json.dumps({
+                    "meeting_key": RACE_ID, "session_key": 9000 + n // 20000, "driver_number": n % 20 + 1,
+                    "lap_number": n // 20 % 1000 + 1, "date_start": "2024-03-02T15:03:40.208000+00:00",
+                    "lap_duration": 90 + rng.random() * 5, "duration_sector_1": 30 + rng.random(),
+                    "duration_sector_2": 30 + rng.random(), "duration_sector_3": 30 + rng.random(),
+                    "i1_speed": rng.randint(250, 300), "i2_speed": rng.randint(250, 300), "st_speed": rng.randint(290, 340),
+                    "is_pit_out_lap": False, "segments_sector_1": [2049, 2049, 2051, 2049]
+                })
+                for n in range(start, min(start + chunk_laps, laps))
+            ]
+            yield ("," if start else "").encode() + ",".join(rows).encode()
+        yield b"]"
+    return body
+
+def make_client(laps: int) -> OpenF1Client:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, headers={"Content-Type": "application/json"}, content=lap_payload(laps)())
+    return OpenF1Client(base_url="http://openf1.mock/v1", transport=httpx.MockTransport(handler))
+
+async def buffered(client: OpenF1Client, batch_size: int) -> int:
+    laps_json = await client.get_json("laps", {"meeting_key": RACE_ID})
+    return len(to_lap_creates(RACE_ID, laps_json))
+
+async def streamed(client: OpenF1Client, batch_size: int) -> int:
+    count = 0
+    async for laps_json in client.iter_json_batches("laps", {"meeting_key": RACE_ID}, batch_size):
+        count += len(to_lap_creates(RACE_ID, laps_json))
+    return count
+
+async def measure(name: str, parse, laps: int, batch_size: int):
+    async with make_client(laps) as client:
+        tracemalloc.start()
+        start = time.perf_counter()
+        count = await parse(client, batch_size)
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(f"  {name:10s} {count:8d} laps {seconds:8.2f} s  peak {peak / 2**20:9.1f} MiB")
+
+async def main(args):
+    print(f"{args.laps} laps, batch size {args.batch_size}:")
+    await measure("buffered", buffered, args.laps, args.batch_size)
+    await measure("streamed", streamed, args.laps, args.batch_size)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--laps", type=int, default=500000, help="laps in the synthetic response")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
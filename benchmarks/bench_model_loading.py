@@ -0,0 +1,111 @@
+"""
+Benchmark: load time and memory of a saved race pace model in 1 to 8 worker processes.
+
+A random forest pipeline (build_pipeline of ml/race_pace_random_forest.py) is trained on --train-rows synthetic laps
+and saved twice: "pickle" is the previous format (joblib.dump of the sklearn pipeline, every process unpickles its
+own copy of the trees), "mapped" is ml.utils.save_model (forest as flat arrays, uncompressed) loaded with
+ml.utils.load_model (mmap_mode="r"), so the tree arrays of all processes are the same pages of the page cache.
+
+For every worker count, that many processes are spawned (like uvicorn --workers), each one loads the model,
+scores a batch of --batch laps and reports its load time and the growth of its Rss and Pss (proportional set size,
+shared pages are divided between the processes that map them) from /proc/self/smaps_rollup (Linux).
+
+    python -m benchmarks.bench_model_loading --train-rows 20000 --workers 1 2 4 8
+"""
+
+import os
+import tempfile
+
+# the app modules create their engines on import, point them to a temporary database first
+_tmp_dir = tempfile.TemporaryDirectory()
+os.environ["F1_STATS_DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir.name, 'bench.db')}"
+
+import argparse
+import multiprocessing
+import time
+from pathlib import Path
+import joblib
+import numpy as np
+import pandas as pd
+from ml import utils
+from ml.race_pace_random_forest import build_pipeline, prepare_data
+
+DRIVERS = [f"driver_{number}" for number in range(1, 21)]
+CIRCUITS = [f"City {number}" for number in range(1, 11)]
+COMPOUNDS = ["SOFT", "MEDIUM", "HARD"]
+
+def make_laps(rows: int, rng: np.random.Generator) -> pd.DataFrame:
+    stint_lap_number = rng.integers(1, 30, rows)
+    return pd.DataFrame({
+        "lap_number": rng.integers(1, 60, rows),
+        "stint_number": rng.integers(1, 4, rows),
+        "stint_lap_number": stint_lap_number,
+        "tyre_age_at_start": rng.integers(0, 6, rows).astype(float),
+        "pit_in_time": np.where(rng.random(rows) < 0.05, 1800 + rng.random(rows) * 3600, np.nan),
+        "pit_out_time": np.where(rng.random(rows) < 0.05, 1800 + rng.random(rows) * 3600, np.nan),
+        "driver_id": rng.choice(DRIVERS, rows),
+        "tyre_compound": rng.choice(COMPOUNDS, rows),
+        "circuit_location": rng.choice(CIRCUITS, rows),
+        "session_name": "Race",
+        "lap_duration": 90 + stint_lap_number * 0.05 + rng.random(rows) * 2,
+    })
+
+# Rss and Pss of the current process in KiB
+def memory_kib() -> dict:
+    with open("/proc/self/smaps_rollup") as file:
+        fields = dict(line.split(":", 1) for line in file if ":" in line and line.split(":", 1)[0] in ("Rss", "Pss"))
+    return {name: int(value.split()[0]) for name, value in fields.items()}
+
+def worker(models_dir: str, model_name: str, batch: pd.DataFrame, loaded, measured, results):
+    before = memory_kib()
+    start = time.perf_counter()
+    if model_name == "pickle":
+        model = joblib.load(utils.model_path(model_name, Path(models_dir)))
+    else:
+        model = utils.load_model(model_name, Path(models_dir))
+    load_time = time.perf_counter() - start
+    model.predict(batch)
+    # Pss is read when all workers hold the model
+    loaded.wait()
+    after = memory_kib()
+    results.put((load_time, after["Rss"] - before["Rss"], after["Pss"] - before["Pss"]))
+    measured.wait()
+
+def measure(models_dir: Path, model_name: str, workers: int, batch: pd.DataFrame) -> str:
+    context = multiprocessing.get_context("spawn")
+    loaded, measured, results = context.Barrier(workers), context.Barrier(workers), context.Queue()
+    processes = [context.Process(target=worker, args=(str(models_dir), model_name, batch, loaded, measured, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    load_time = np.mean([report[0] for report in reports]) * 1000
+    rss, pss = (sum(report[index] for report in reports) / 1024 for index in (1, 2))
+    return f"load {load_time:8.1f} ms  rss {rss:8.1f} MiB  pss {pss:8.1f} MiB"
+
+def run(args):
+    models_dir = Path(_tmp_dir.name) / "models"
+    laps = make_laps(args.train_rows, np.random.default_rng(0))
+    X, y, num_attribs, cat_attribs = prepare_data(laps)
+    model = build_pipeline(num_attribs, cat_attribs).fit(X, y.values.ravel())
+
+    pickle_path = utils.model_path("pickle", models_dir)
+    pickle_path.parent.mkdir(parents=True, exist_ok=True)
+    joblib.dump(model, pickle_path)
+    mapped_path = utils.save_model(model, "mapped", models_dir)
+    print(f"random forest trained on {args.train_rows} laps, model.pkl pickle {pickle_path.stat().st_size / 2**20:.1f} MiB, "
+          f"mapped {mapped_path.stat().st_size / 2**20:.1f} MiB, totals of all workers (load time is the mean):")
+
+    batch, _, _, _ = prepare_data(make_laps(args.batch, np.random.default_rng(1)))
+    for workers in args.workers:
+        for model_name in ("pickle", "mapped"):
+            print(f"  {workers} workers  {model_name:6s}  {measure(models_dir, model_name, workers, batch)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--train-rows", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    run(parser.parse_args())
+    _tmp_dir.cleanup()
@@ -0,0 +1,149 @@
+"""
+Benchmark natural key lookups (the ones used by lap/stint/telemetry upserts) before and after
+the composite unique indexes from app/migrations.py.
+
+Builds a synthetic SQLite database in a temporary directory with the pre-migration schema
+(only single-column indexes), prints query plans and lookup times, applies migrations and repeats.
+
+    python -m benchmarks.bench_natural_key_indexes --sessions 100 --lookups 5000
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from app import migrations, models
+
+DRIVERS = 20
+LAPS_PER_SESSION = 60
+STINTS_PER_DRIVER = 3
+
+def build_database(engine, sessions: int):
+    """Create tables as they were before migration 2 and fill them with synthetic data."""
+    models.Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as conn:
+        for index_name in ("uq_laps_lap", "uq_stints_stint", "uq_telemetry_lap"):
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {index_name}")
+        conn.exec_driver_sql("PRAGMA user_version = 1")
+
+        laps = []
+        stints = []
+        telemetry = []
+        for session_id in range(1, sessions + 1):
+            race_id = (session_id + 4) // 5
+            for driver_number in range(1, DRIVERS + 1):
+                for lap_number in range(1, LAPS_PER_SESSION + 1):
+                    key = {"race_id": race_id, "session_id": session_id, "driver_number": driver_number, "lap_number": lap_number}
+                    laps.append({**key, "lap_duration": 90 + random.random()})
+                    telemetry.append({**key, "avg_speed": 200 + random.random()})
+                for stint_number in range(1, STINTS_PER_DRIVER + 1):
+                    stints.append({
+                        "race_id": race_id,
+                        "session_id": session_id,
+                        "driver_number": driver_number,
+                        "stint_number": stint_number,
+                        "lap_start": (stint_number - 1) * 20 + 1,
+                        "lap_end": stint_number * 20
+                    })
+
+        conn.execute(insert(models.Lap), laps)
+        conn.execute(insert(models.Stint), stints)
+        conn.execute(insert(models.Telemetry), telemetry)
+
+    return len(laps), len(stints)
+
+def lookup_queries(db, key):
+    race_id, session_id, driver_number, number = key
+    return {
+        "laps": db.query(models.Lap).filter(
+            models.Lap.race_id == race_id,
+            models.Lap.session_id == session_id,
+            models.Lap.driver_number == driver_number,
+            models.Lap.lap_number == number
+        ),
+        "stints": db.query(models.Stint).filter(
+            models.Stint.race_id == race_id,
+            models.Stint.session_id == session_id,
+            models.Stint.driver_number == driver_number,
+            models.Stint.stint_number == min(number, STINTS_PER_DRIVER)
+        ),
+        "telemetry": db.query(models.Telemetry).filter(
+            models.Telemetry.race_id == race_id,
+            models.Telemetry.session_id == session_id,
+            models.Telemetry.driver_number == driver_number,
+            models.Telemetry.lap_number == number
+        ),
+    }
+
+def print_query_plans(engine, db, key):
+    with engine.connect() as conn:
+        for table, query in lookup_queries(db, key).items():
+            sql = str(query.statement.compile(engine, compile_kwargs={"literal_binds": True}))
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").all()
+            print(f"  {table}: " + " | ".join(row[-1] for row in plan))
+
+def time_lookups(engine, db, keys):
+    """Time lookups through the ORM (as the sync code runs them) and the same SQL on the raw DBAPI cursor."""
+    results = {}
+    for table in ("laps", "stints", "telemetry"):
+        start = time.perf_counter()
+        for key in keys:
+            lookup_queries(db, key)[table].first()
+        orm_elapsed = time.perf_counter() - start
+
+        compiled = [lookup_queries(db, key)[table].statement.compile(engine) for key in keys]
+        statements = [(str(c), tuple(c.params.values())) for c in compiled]
+        raw_connection = engine.raw_connection()
+        try:
+            cursor = raw_connection.cursor()
+            start = time.perf_counter()
+            for sql, params in statements:
+                cursor.execute(sql, params).fetchone()
+            sql_elapsed = time.perf_counter() - start
+        finally:
+            raw_connection.close()
+
+        results[table] = sql_elapsed / len(keys) * 1e6
+        print(f"  {table}: {orm_elapsed / len(keys) * 1e6:.1f} us/lookup via ORM, {results[table]:.1f} us/lookup SQL only")
+    return results
+
+def run(sessions: int, lookups: int):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{Path(tmp_dir) / 'bench.db'}")
+        Session = sessionmaker(bind=engine)
+
+        lap_count, stint_count = build_database(engine, sessions)
+        print(f"Synthetic database: {sessions} sessions, {lap_count} laps, {stint_count} stints, {lap_count} telemetry rows.")
+
+        keys = [
+            ((s + 4) // 5, s, random.randint(1, DRIVERS), random.randint(1, LAPS_PER_SESSION))
+            for s in (random.randint(1, sessions) for _ in range(lookups))
+        ]
+
+        db = Session()
+        try:
+            print("\nBefore migration (single-column indexes):")
+            print_query_plans(engine, db, keys[0])
+            before = time_lookups(engine, db, keys)
+
+            migrations.upgrade(engine)
+
+            print("\nAfter migration (composite unique indexes):")
+            print_query_plans(engine, db, keys[0])
+            after = time_lookups(engine, db, keys)
+        finally:
+            db.close()
+            engine.dispose()
+
+        print("\nSQL lookup speedup: " + ", ".join(f"{table} x{before[table] / after[table]:.1f}" for table in before))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--lookups", type=int, default=5000)
+    args = parser.parse_args()
+    run(args.sessions, args.lookups)
@@ -0,0 +1,109 @@
+"""
+Benchmark: latency of POST /predict/race-pace (p50 / p99) for batch sizes 1 to 10k.
+
+A random forest pipeline (build_pipeline of ml/race_pace_random_forest.py) is trained on --train-rows synthetic laps
+and saved to a temporary models directory. Every batch size is requested --requests times through the ASGI app
+(JSON parsing and validation included), the model comes from the model cache after the first request.
+For comparison, "load per request" loads model.pkl on every request (batch size 1), like scoring with ml.utils.load_model.
+
+    python -m benchmarks.bench_predict --train-rows 20000 --requests 50
+"""
+
+import os
+import tempfile
+
+# the app modules create their engines on import, point them to a temporary database and models directory first
+_tmp_dir = tempfile.TemporaryDirectory()
+os.environ["F1_STATS_DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir.name, 'bench.db')}"
+os.environ["F1_STATS_MODELS_DIR"] = os.path.join(_tmp_dir.name, "models")
+
+import argparse
+import logging
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+from app import database, race_pace_model, schemas
+from app.main import app
+from ml import utils
+from ml.race_pace_random_forest import build_pipeline, prepare_data
+
+MODEL_NAME = "race_pace_bench"
+BATCH_SIZES = [1, 10, 100, 1000, 10000]
+DRIVERS = [f"driver_{number}" for number in range(1, 21)]
+CIRCUITS = [f"City {number}" for number in range(1, 11)]
+COMPOUNDS = ["SOFT", "MEDIUM", "HARD"]
+
+def make_laps(rows: int, rng: np.random.Generator) -> pd.DataFrame:
+    stint_lap_number = rng.integers(1, 30, rows)
+    return pd.DataFrame({
+        "lap_number": rng.integers(1, 60, rows),
+        "stint_number": rng.integers(1, 4, rows),
+        "stint_lap_number": stint_lap_number,
+        "tyre_age_at_start": rng.integers(0, 6, rows).astype(float),
+        "pit_in_time": np.where(rng.random(rows) < 0.05, 1800 + rng.random(rows) * 3600, np.nan),
+        "pit_out_time": np.where(rng.random(rows) < 0.05, 1800 + rng.random(rows) * 3600, np.nan),
+        "driver_id": rng.choice(DRIVERS, rows),
+        "tyre_compound": rng.choice(COMPOUNDS, rows),
+        "circuit_location": rng.choice(CIRCUITS, rows),
+        "session_name": "Race",
+        "lap_duration": 90 + stint_lap_number * 0.05 + rng.random(rows) * 2,
+    })
+
+# request body laps (features without lap_duration, NaN as null)
+def request_laps(batch_size: int) -> list:
+    laps = make_laps(batch_size, np.random.default_rng(batch_size)).drop(columns=["lap_duration"])
+    return laps.replace({np.nan: None}).to_dict("records")
+
+def train_model(rows: int):
+    X, y, num_attribs, cat_attribs = prepare_data(make_laps(rows, np.random.default_rng(0)))
+    model = build_pipeline(num_attribs, cat_attribs).fit(X, y.values.ravel())
+    path = utils.model_path(MODEL_NAME, race_pace_model.MODELS_DIR)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    joblib.dump(model, path)
+    return path
+
+def percentiles(times: list) -> str:
+    p50, p99 = np.percentile(np.array(times) * 1000, [50, 99])
+    return f"p50 {p50:9.2f} ms  p99 {p99:9.2f} ms"
+
+def measure_endpoint(client: TestClient, batch_size: int, requests: int) -> str:
+    body = {"model": MODEL_NAME, "laps": request_laps(batch_size)}
+    times = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.post("/predict/race-pace", json=body)
+        times.append(time.perf_counter() - start)
+        assert response.status_code == 200 and len(response.json()["lap_durations"]) == batch_size
+    return percentiles(times)
+
+def measure_load_per_request(requests: int) -> str:
+    laps = [schemas.RacePaceFeatures(**lap) for lap in request_laps(1)]
+    times = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        model = utils.load_model(MODEL_NAME, race_pace_model.MODELS_DIR)
+        race_pace_model.predict_lap_durations(model, laps)
+        times.append(time.perf_counter() - start)
+    return percentiles(times)
+
+def run(args):
+    path = train_model(args.train_rows)
+    print(f"random forest trained on {args.train_rows} laps, model.pkl {path.stat().st_size / 2**20:.1f} MiB, {args.requests} requests per batch size:")
+    client = TestClient(app)
+    # first request loads the model into the model cache
+    client.post("/predict/race-pace", json={"model": MODEL_NAME, "laps": request_laps(1)})
+    for batch_size in BATCH_SIZES:
+        print(f"  batch {batch_size:6d}   {measure_endpoint(client, batch_size, args.requests)}")
+    print(f"  load per request (batch 1)   {measure_load_per_request(min(args.requests, 10))}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--train-rows", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=50)
+    # no log line per request
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    run(parser.parse_args())
+    database.engine.dispose()
+    _tmp_dir.cleanup()
@@ -0,0 +1,115 @@
+"""
+Micro-benchmark: list response serialization, ORM objects + response_model vs column tuples + app.serialization.
+
+- "orm + pydantic": ORM objects validated into schemas.Lap and dumped in JSON mode, then json.dumps
+  (what FastAPI does for `response_model=List[schemas.Lap]` when a handler returns ORM objects)
+- "core + orjson": column tuples from schema_columns() encoded by encode_rows() (fast path used by list endpoints)
+
+Both are measured for the whole table (--rows) and end to end through GET /laps/ with the maximum page size.
+
+    python -m benchmarks.bench_serialization --rows 100000
+"""
+
+import os
+import tempfile
+
+# the app modules create their engines on import, point them to a temporary database first
+_tmp_dir = tempfile.TemporaryDirectory()
+os.environ["F1_STATS_DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir.name, 'bench.db')}"
+
+import argparse
+import json
+import random
+import time
+from typing import Annotated, List
+from fastapi import Depends, FastAPI, Query, Response
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app import database, models, schemas, serialization
+from app.pagination import set_next_cursor
+from app.schemas.pagination import MAX_PAGE_SIZE
+from app.repositories import bulk_repository, lap_repository
+from app.routers import laps
+
+def seed(rows: int):
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    bulk_repository.bulk_upsert(db, models.Lap, (
+        {
+            "race_id": 1, "session_id": 1 + i // 2000, "driver_number": 1 + (i // 100) % 20, "lap_number": 1 + i % 100,
+            "lap_duration": 90 + random.random(), "duration_sector_1": 30 + random.random(),
+            "duration_sector_2": 30 + random.random(), "duration_sector_3": 30 + random.random(),
+            "i1_speed": 280, "i2_speed": 290, "st_speed": 310, "is_pit_out_lap": False,
+            "pit_in_time": None, "pit_out_time": None, "track_status": "1"
+        }
+        for i in range(rows)
+    ), ["session_id", "driver_number", "lap_number"], batch_size=10000)
+    db.close()
+
+def best_of(repeat: int, fn):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+def orm_pydantic(db: Session) -> bytes:
+    rows = db.query(models.Lap).order_by(models.Lap.lap_id).all()
+    adapter = TypeAdapter(List[schemas.Lap])
+    content = adapter.dump_python(adapter.validate_python(rows), mode="json")
+    return json.dumps(content, separators=(",", ":")).encode()
+
+def core_orjson(db: Session) -> bytes:
+    rows = db.execute(select(*lap_repository.LAP_COLUMNS).order_by(models.Lap.lap_id)).all()
+    return serialization.encode_rows(rows)
+
+def response_model_app() -> FastAPI:
+    """GET /laps/ as it was before the fast path: ORM objects through response_model."""
+    app = FastAPI()
+
+    @app.get("/laps/", response_model=List[schemas.Lap])
+    def get_all_laps(response: Response, params: Annotated[schemas.LapListParams, Query()], db: Session = Depends(database.get_read_db)):
+        rows, next_cursor = lap_repository.get_all_laps(db, params)
+        set_next_cursor(response, next_cursor)
+        return rows
+
+    return app
+
+def fast_path_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(laps.router)
+    return app
+
+def run(rows: int, repeat: int):
+    seed(rows)
+    print(f"encoder: {'orjson' if serialization.orjson is not None else 'json (orjson not installed)'}")
+
+    db = database.SessionLocal()
+    orm_time, orm_body = best_of(repeat, lambda: orm_pydantic(db))
+    core_time, core_body = best_of(repeat, lambda: core_orjson(db))
+    db.close()
+    assert json.loads(orm_body) == json.loads(core_body)
+    print(f"\n{rows} laps, query + encode (best of {repeat}):")
+    print(f"  orm + pydantic: {orm_time * 1000:8.1f} ms")
+    print(f"  core + orjson:  {core_time * 1000:8.1f} ms  ({orm_time / core_time:.1f}x)")
+
+    limit = min(rows, MAX_PAGE_SIZE)
+    print(f"\nGET /laps/?limit={limit} end to end (best of {repeat}):")
+    timings = {}
+    for name, app in (("response_model", response_model_app()), ("fast path", fast_path_app())):
+        with TestClient(app) as client:
+            timings[name], response = best_of(repeat, lambda: client.get("/laps/", params={"limit": limit}))
+            assert response.status_code == 200 and len(response.json()) == limit
+    print(f"  response_model: {timings['response_model'] * 1000:8.1f} ms")
+    print(f"  fast path:      {timings['fast path'] * 1000:8.1f} ms  ({timings['response_model'] / timings['fast path']:.1f}x)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.rows, args.repeat)
+    _tmp_dir.cleanup()
@@ -0,0 +1,193 @@
+"""
+Benchmark: rows/sec of every OpenF1 sync entry point, replayed offline (app/openf1_fixtures.py).
+
+- API: POST /races/sync, /drivers/sync, /sessions/sync/{race_id}, /stints/sync/{race_id}, /laps/sync/{race_id}
+- scripts: sync_all_sessions, sync_all_stints, sync_all_laps, sync_all_laps --stream
+  (with force, so sync_state doesn't skip races)
+
+Every dataset size (number of meetings) starts from empty tables. By default a synthetic dataset is generated
+(--drivers x --laps laps per session, 5 sessions per meeting), or recorded fixtures can be replayed with
+--fixtures (see scripts/record_openf1_fixtures.py). Replay latency and the replay server rate limit are configurable,
+the OpenF1 client limits (--client-rate, --concurrency) apply like in production.
+
+    python -m benchmarks.bench_sync --sizes 1 4 16 --latency 0.05
+    python -m benchmarks.bench_sync --fixtures data/openf1_fixtures --sizes 1 3
+"""
+
+import os
+import tempfile
+
+# the app modules create their engines on import, point them to a temporary database first
+_tmp_dir = tempfile.TemporaryDirectory()
+os.environ["F1_STATS_DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir.name, 'bench.db')}"
+
+import argparse
+import asyncio
+import contextlib
+import functools
+import io
+import random
+import time
+from pathlib import Path
+import httpx
+from fastapi import FastAPI
+from app import database, models
+from app.openf1_client import OpenF1Client, get_openf1_client
+from app.openf1_fixtures import ReplayTransport, read_fixture, write_fixture
+from app.routers import drivers, laps, races, sessions, stints
+from scripts.sync_all_laps import sync_all_laps_async
+from scripts.sync_all_sessions import sync_all_sessions_async
+from scripts.sync_all_stints import sync_all_stints_async
+
+SESSION_NAMES = ["Practice 1", "Practice 2", "Practice 3", "Qualifying", "Race"]
+
+def generate_fixtures(directory: Path, meetings: int, drivers_count: int, laps_count: int):
+    """Synthetic OpenF1 responses for `meetings` meetings (meeting_key 1..N)."""
+    rng = random.Random(0)
+    meeting_keys = list(range(1, meetings + 1))
+    write_fixture(directory, "meetings", None, [
+        {"meeting_key": key, "meeting_name": f"Grand Prix {key}", "circuit_short_name": f"Circuit {key}",
+         "location": f"City {key}", "country_name": f"Country {key}", "year": 2024}
+        for key in meeting_keys
+    ])
+    write_fixture(directory, "drivers", None, [
+        {"full_name": f"Driver {number} Name", "first_name": "Driver", "last_name": f"Name{number}",
+         "driver_number": number, "name_acronym": f"D{number:02d}", "team_name": f"Team {number // 2}",
+         "country_code": "GBR", "meeting_key": key}
+        for key in meeting_keys
+        for number in range(1, drivers_count + 1)
+    ])
+    for key in meeting_keys:
+        session_keys = [key * 10 + i for i in range(len(SESSION_NAMES))]
+        write_fixture(directory, "sessions", {"meeting_key": key}, [
+            {"session_key": session_key, "meeting_key": key, "session_name": name,
+             "session_type": "Race" if name == "Race" else "Practice"}
+            for session_key, name in zip(session_keys, SESSION_NAMES)
+        ])
+        write_fixture(directory, "stints", {"meeting_key": key}, [
+            {"session_key": session_key, "driver_number": number, "stint_number": stint,
+             "lap_start": (stint - 1) * laps_count // 3 + 1, "lap_end": stint * laps_count // 3,
+             "compound": rng.choice(["SOFT", "MEDIUM", "HARD"]), "tyre_age_at_start": rng.randint(0, 5)}
+            for session_key in session_keys
+            for number in range(1, drivers_count + 1)
+            for stint in range(1, 4)
+        ])
+        write_fixture(directory, "laps", {"meeting_key": key}, [
+            {"session_key": session_key, "driver_number": number, "lap_number": lap,
+             "lap_duration": 90 + rng.random() * 5, "duration_sector_1": 30 + rng.random(),
+             "duration_sector_2": 30 + rng.random(), "duration_sector_3": 30 + rng.random(),
+             "i1_speed": rng.randint(250, 300), "i2_speed": rng.randint(250, 300), "st_speed": rng.randint(290, 340),
+             "is_pit_out_lap": lap == 1}
+            for session_key in session_keys
+            for number in range(1, drivers_count + 1)
+            for lap in range(1, laps_count + 1)
+        ])
+    return meeting_keys
+
+def recorded_meeting_keys(directory: Path) -> list:
+    """Meetings of a recorded fixture directory that have all per-meeting responses."""
+    return [
+        meeting["meeting_key"] for meeting in read_fixture(directory, "meetings")
+        if all((directory / f"{endpoint}__meeting_key={meeting['meeting_key']}.json.gz").exists() for endpoint in ("sessions", "stints", "laps"))
+    ]
+
+def reset_database():
+    models.Base.metadata.drop_all(bind=database.engine)
+    models.Base.metadata.create_all(bind=database.engine)
+
+def sync_app(make_client) -> FastAPI:
+    app = FastAPI()
+    for router in (races.router, drivers.router, sessions.router, stints.router, laps.router):
+        app.include_router(router)
+
+    async def replay_openf1_client():
+        async with make_client() as client:
+            yield client
+
+    app.dependency_overrides[get_openf1_client] = replay_openf1_client
+    return app
+
+async def bench_api(make_client, meeting_keys: list) -> dict:
+    """Time and synced rows (`total` of every response) per API endpoint."""
+    results = {}
+    transport = httpx.ASGITransport(app=sync_app(make_client))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def post(name: str, paths: list):
+            rows = 0
+            start = time.perf_counter()
+            for path in paths:
+                response = await client.post(path)
+                response.raise_for_status()
+                rows += response.json()["total"]
+            results[name] = (time.perf_counter() - start, rows)
+
+        await post("POST /races/sync", ["/races/sync"])
+        await post("POST /drivers/sync", ["/drivers/sync"])
+        for endpoint in ("sessions", "stints", "laps"):
+            await post(f"POST /{endpoint}/sync/{{race_id}}", [f"/{endpoint}/sync/{key}" for key in meeting_keys])
+    return results
+
+async def bench_scripts(make_client, meeting_keys: list) -> dict:
+    """Time and created + updated rows per sync script (races from the API run are kept, other tables emptied)."""
+    results = {}
+    db = database.SessionLocal()
+    for model in (models.Lap, models.Stint, models.Session, models.SyncState):
+        db.query(model).delete()
+    db.query(models.Race).filter(models.Race.race_id.notin_(meeting_keys)).delete()
+    db.commit()
+    db.close()
+
+    scripts = (
+        ("sync_all_sessions", sync_all_sessions_async),
+        ("sync_all_stints", sync_all_stints_async),
+        ("sync_all_laps", sync_all_laps_async),
+        ("sync_all_laps --stream", functools.partial(sync_all_laps_async, stream=True)),
+    )
+    for name, sync in scripts:
+        async with make_client() as client:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = await sync(client, force=True)
+            results[name] = (time.perf_counter() - start, result["created"] + result["updated"])
+    return results
+
+async def main(args):
+    fixtures = Path(args.fixtures) if args.fixtures else Path(_tmp_dir.name) / "fixtures"
+    all_keys = recorded_meeting_keys(fixtures) if args.fixtures else generate_fixtures(fixtures, max(args.sizes), args.drivers, args.laps)
+    print(f"fixtures: {fixtures} ({len(all_keys)} meetings), latency {args.latency * 1000:.0f} ms, "
+          f"server rate limit {args.server_rate or 'none'}, client rate {args.client_rate}/s, concurrency {args.concurrency}")
+
+    replay = ReplayTransport(fixtures, latency=args.latency, rate_per_second=args.server_rate, burst=args.concurrency)
+
+    def make_client():
+        return OpenF1Client(
+            base_url="http://openf1.replay/v1", max_concurrency=args.concurrency, rate_per_second=args.client_rate,
+            burst=args.concurrency, backoff=0.05, transport=replay
+        )
+
+    for size in args.sizes:
+        meeting_keys = all_keys[:size]
+        reset_database()
+        results = await bench_api(make_client, meeting_keys)
+        results.update(await bench_scripts(make_client, meeting_keys))
+
+        print(f"\n{len(meeting_keys)} meetings:")
+        for name, (seconds, rows) in results.items():
+            print(f"  {name:32s} {rows:8d} rows {seconds:8.3f} s {rows / seconds:10.0f} rows/s")
+    print(f"\nreplayed {replay.requests} requests, {replay.rate_limited} rate limited (429)")
+
+    await database.async_engine.dispose()
+    await database.async_read_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4, 16], help="dataset sizes in meetings")
+    parser.add_argument("--fixtures", help="recorded fixture directory (default: synthetic data)")
+    parser.add_argument("--drivers", type=int, default=20)
+    parser.add_argument("--laps", type=int, default=60, help="laps per driver and session (synthetic data)")
+    parser.add_argument("--latency", type=float, default=0.0, help="replay latency per response in seconds")
+    parser.add_argument("--server-rate", type=float, default=None, help="replay server rate limit (requests/s)")
+    parser.add_argument("--client-rate", type=float, default=1000.0, help="OpenF1Client rate limit (requests/s)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    asyncio.run(main(parser.parse_args()))
+    _tmp_dir.cleanup()
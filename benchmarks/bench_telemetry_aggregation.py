@@ -0,0 +1,132 @@
+"""
+Benchmark: per-lap telemetry aggregation vs whole-session aggregation (scripts/telemetry_utils.py).
+
+- "per lap": for every lap lap.get_car_data() + aggregate_lap_telemetry (how the sync script worked before)
+- "session": aggregate_session_telemetry once per driver on session.car_data
+
+With FastF1 installed the session is loaded from the local FastF1 cache (data/fastf1_cache), run the sync
+script once before to fill it. Without FastF1 a synthetic session (20 drivers, --laps laps each) is used,
+and laps are sliced with the same SessionTime mask as Lap.get_car_data().
+
+    python -m benchmarks.bench_telemetry_aggregation --year 2024 --event "Bahrain Grand Prix" --session Race
+"""
+
+import argparse
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from scripts.telemetry_utils import aggregate_lap_telemetry, aggregate_session_telemetry
+
+try:
+    import fastf1
+except ImportError:
+    fastf1 = None
+
+CACHE_DIR = Path("data/fastf1_cache")
+
+def load_fastf1_session(year: int, event: str, session_name: str):
+    fastf1.Cache.enable_cache(CACHE_DIR)
+    session = fastf1.get_session(year, event, session_name)
+    session.load(weather=False, messages=False)
+    return session
+
+def fastf1_per_lap(session) -> dict:
+    result = {}
+    for _, lap in session.laps.iterrows():
+        if pd.isna(lap["LapNumber"]):
+            continue
+        try:
+            aggregate = aggregate_lap_telemetry(lap.get_car_data())
+        except Exception:
+            continue
+        if aggregate:
+            result[(lap["DriverNumber"], int(lap["LapNumber"]))] = aggregate
+    return result
+
+def fastf1_session(session) -> dict:
+    result = {}
+    for driver_number, driver_laps in session.laps.groupby("DriverNumber"):
+        car_data = session.car_data.get(str(driver_number))
+        for lap_number, aggregate in aggregate_session_telemetry(car_data, driver_laps).items():
+            result[(driver_number, lap_number)] = aggregate
+    return result
+
+def synthetic_session(drivers: int, laps: int):
+    rng = np.random.default_rng(0)
+    samples = int(laps * 95 / 0.25)
+    lap_starts = pd.to_timedelta(np.arange(laps) * 95.0, unit="s")
+    driver_laps = pd.DataFrame({
+        "LapNumber": np.arange(1, laps + 1, dtype=float),
+        "LapStartTime": lap_starts,
+        "Time": lap_starts + pd.to_timedelta(95.0, unit="s")
+    })
+    car_data = {}
+    for driver_number in range(1, drivers + 1):
+        car_data[driver_number] = pd.DataFrame({
+            "SessionTime": pd.to_timedelta(np.cumsum(rng.uniform(0.2, 0.3, samples)), unit="s"),
+            "Speed": rng.uniform(80, 330, samples),
+            "RPM": rng.uniform(9000, 12500, samples),
+            "nGear": rng.integers(1, 9, samples),
+            "Throttle": rng.uniform(0, 100, samples),
+            "Brake": rng.random(samples) < 0.2,
+            "DRS": rng.choice([0, 1, 8, 10, 12], samples)
+        })
+    return car_data, driver_laps
+
+def synthetic_per_lap(car_data: dict, laps: pd.DataFrame) -> dict:
+    result = {}
+    for driver_number, data in car_data.items():
+        for _, lap in laps.iterrows():
+            mask = (data["SessionTime"] >= lap["LapStartTime"]) & (data["SessionTime"] <= lap["Time"])
+            aggregate = aggregate_lap_telemetry(data.loc[mask].reset_index(drop=True))
+            if aggregate:
+                result[(driver_number, int(lap["LapNumber"]))] = aggregate
+    return result
+
+def synthetic_whole_session(car_data: dict, laps: pd.DataFrame) -> dict:
+    result = {}
+    for driver_number, data in car_data.items():
+        for lap_number, aggregate in aggregate_session_telemetry(data, laps).items():
+            result[(driver_number, lap_number)] = aggregate
+    return result
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+def max_difference(expected: dict, result: dict) -> float:
+    assert expected.keys() == result.keys(), "different laps aggregated"
+    difference = 0.0
+    for key, metrics in expected.items():
+        for name, value in metrics.items():
+            if value is None or np.isnan(value):
+                assert result[key][name] is None or np.isnan(result[key][name])
+            else:
+                difference = max(difference, abs(result[key][name] - value) / max(abs(value), 1e-12))
+    return difference
+
+def run(args):
+    if fastf1 is not None:
+        session = load_fastf1_session(args.year, args.event, args.session)
+        print(f"FastF1 session: {args.year} {args.event} {args.session} ({len(session.laps)} laps)")
+        per_lap_time, expected = timed(fastf1_per_lap, session)
+        session_time, result = timed(fastf1_session, session)
+    else:
+        print(f"FastF1 not installed, synthetic session: 20 drivers x {args.laps} laps")
+        car_data, laps = synthetic_session(20, args.laps)
+        per_lap_time, expected = timed(synthetic_per_lap, car_data, laps)
+        session_time, result = timed(synthetic_whole_session, car_data, laps)
+
+    print(f"  per lap: {per_lap_time:8.3f} s")
+    print(f"  session: {session_time:8.3f} s  ({per_lap_time / session_time:.0f}x)")
+    print(f"  {len(result)} laps aggregated, max relative difference {max_difference(expected, result):.1e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--year", type=int, default=2024)
+    parser.add_argument("--event", default="Bahrain Grand Prix")
+    parser.add_argument("--session", default="Race")
+    parser.add_argument("--laps", type=int, default=57, help="laps per driver for the synthetic session")
+    run(parser.parse_args())
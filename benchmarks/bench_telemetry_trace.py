@@ -0,0 +1,58 @@
+"""
+Benchmark: GET /telemetry/trace reduction, LTTB on all samples per request vs cached pyramid levels (app/telemetry_trace.py).
+
+A synthetic lap with --samples samples is written to a temporary telemetry store, then traces with
+different point counts are requested (like zooming a plot) --repeat times each.
+
+    python -m benchmarks.bench_telemetry_trace --samples 20000 --points 200 500 1000 2000
+"""
+
+import argparse
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from app import telemetry_store
+from app.telemetry_trace import TraceCache, lttb_indices
+
+def write_lap(root: str, samples: int):
+    rng = np.random.default_rng(0)
+    session_time = pd.to_timedelta(np.cumsum(rng.uniform(0.004, 0.006, samples)), unit="s")
+    car_data = pd.DataFrame({
+        "SessionTime": session_time,
+        "Speed": 200 + 100 * np.sin(np.arange(samples) / 300) + rng.normal(0, 3, samples),
+        "Throttle": rng.uniform(0, 100, samples),
+        "Brake": rng.random(samples) < 0.2,
+    })
+    laps = pd.DataFrame({"LapNumber": [1.0], "LapStartTime": [session_time[0]], "Time": [session_time[-1]]})
+    telemetry_store.write_driver_telemetry(1, 1, car_data, laps, root=root)
+    return telemetry_store.open_driver_telemetry(1, 1, root=root)
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+def run(args):
+    with tempfile.TemporaryDirectory() as root:
+        stored = write_lap(root, args.samples)
+        samples = stored.lap(1)
+        distance = np.asarray(samples["Distance"])
+        speed = np.asarray(samples["Speed"], dtype=np.float64)
+
+        cache = TraceCache()
+        build = timed(lambda: TraceCache().get(stored, 1), 1)
+        cache.get(stored, 1)
+        print(f"{args.samples} samples, pyramid built in {build * 1000:.1f} ms")
+        for points in args.points:
+            full = timed(lambda: lttb_indices(distance, speed, points), args.repeat)
+            pyramid = timed(lambda: cache.get(stored, 1).indices(points), args.repeat)
+            print(f"  {points:6d} points: all samples {full * 1000:8.2f} ms  pyramid {pyramid * 1000:8.2f} ms  ({full / pyramid:.1f}x)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=20000, help="samples of the synthetic lap")
+    parser.add_argument("--points", type=int, nargs="+", default=[200, 500, 1000, 2000])
+    parser.add_argument("--repeat", type=int, default=20)
+    run(parser.parse_args())
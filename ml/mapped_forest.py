@@ -0,0 +1,122 @@
+# random forest stored as flat numpy arrays, so a saved model can be memory-mapped
+
+import numpy as np
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.pipeline import Pipeline
+
+# trees walked together in apply (all their nodes stay in CPU cache while the rows go down)
+TREE_GROUP = 10
+# tree levels walked between removing (row, tree) pairs that reached a leaf
+LEVELS_PER_PASS = 4
+
+class MappedForestRegressor(RegressorMixin, BaseEstimator):
+    """
+    Prediction-only copy of a fitted RandomForestRegressor (single output): the nodes of all trees
+    concatenated into flat arrays (feature, threshold, children, leaf value) with the root of every tree.
+
+    sklearn trees copy their node arrays into private memory when unpickled, these arrays are kept as they are,
+    so joblib.load(..., mmap_mode="r") leaves them memory-mapped and processes loading the same file share them
+    through the page cache. predict gives the same values as the forest (mean of the trees).
+    Prediction only: fit a RandomForestRegressor and convert it with map_forest.
+    """
+    @classmethod
+    def from_forest(cls, forest) -> "MappedForestRegressor":
+        if not is_mappable(forest):
+            raise ValueError("Only fitted single output random forest regressors can be mapped.")
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        if offsets[-1] >= 2**30:
+            raise ValueError("Forest is too large to be mapped.")
+
+        nodes = np.concatenate([tree.__getstate__()["nodes"] for tree in trees])
+        is_leaf = nodes["left_child"] < 0
+        index = np.arange(len(nodes))
+        node_offsets = np.repeat(offsets[:-1], [tree.node_count for tree in trees])
+
+        mapped = cls()
+        mapped.roots = offsets[:-1].astype(np.int64)
+        mapped.is_leaf = is_leaf
+        # leaves point to themselves (feature 0, threshold inf), so rows that reached a leaf can keep walking
+        mapped.feature = np.where(is_leaf, 0, nodes["feature"]).astype(np.int32)
+        mapped.threshold = np.where(is_leaf, np.inf, nodes["threshold"]).astype(np.float64)
+        mapped.missing_go_to_left = nodes["missing_go_to_left"].astype(bool)
+        # children of node i are children[2 * i] (left) and children[2 * i + 1] (right)
+        mapped.children = np.stack([
+            np.where(is_leaf, index, nodes["left_child"] + node_offsets),
+            np.where(is_leaf, index, nodes["right_child"] + node_offsets)
+        ], axis=1).astype(np.int32).ravel()
+        mapped.value = np.concatenate([tree.value[:, 0, 0] for tree in trees]).astype(np.float64)
+
+        mapped.n_estimators = len(trees)
+        mapped.n_features_in_ = forest.n_features_in_
+        mapped.feature_importances_ = forest.feature_importances_
+        return mapped
+
+    # sklearn only accepts estimators with a fit method (e.g. as a Pipeline step)
+    def fit(self, X, y):
+        raise TypeError("MappedForestRegressor can't be fitted, fit a RandomForestRegressor and convert it with map_forest.")
+
+    def _walk(self, arrays: dict, X_columns: np.ndarray, rows_count: int, roots: np.ndarray, has_missing: bool) -> np.ndarray:
+        """Leaves of all rows in the trees with the given roots, shape (trees, rows)."""
+        feature, threshold, children = arrays["feature"], arrays["threshold"], arrays["children"]
+        # int32 indexes are faster, int64 only for more than 2**31 feature values
+        rows = np.tile(np.arange(rows_count, dtype=np.int32 if len(X_columns) < 2**31 else np.int64), len(roots))
+        nodes = np.repeat(roots.astype(np.int32), rows_count)
+        positions = np.arange(len(nodes), dtype=np.int32)
+        leaves = np.empty(len(nodes), dtype=np.int32)
+
+        while len(positions):
+            for _ in range(LEVELS_PER_PASS):
+                # X_columns is column-major, value of (row, feature) is at feature * rows_count + row
+                values = np.take(X_columns, np.take(feature, nodes) * rows_count + rows)
+                # same comparison as sklearn: float32 feature value against float64 threshold
+                go_right = values > np.take(threshold, nodes)
+                if has_missing:
+                    go_right |= np.isnan(values) & ~np.take(arrays["missing_go_to_left"], nodes)
+                nodes = np.take(children, 2 * nodes + go_right)
+            at_leaf = np.take(arrays["is_leaf"], nodes)
+            leaves[positions[at_leaf]] = nodes[at_leaf]
+            walking = ~at_leaf
+            positions, rows, nodes = positions[walking], rows[walking], nodes[walking]
+        return leaves.reshape(len(roots), rows_count)
+
+    def _leaf_groups(self, X):
+        """Leaves of every row for each group of TREE_GROUP trees, shape (trees in the group, rows)."""
+        X = X.toarray() if hasattr(X, "toarray") else np.asarray(X)
+        X_columns = np.ascontiguousarray(X.T, dtype=np.float32).ravel()
+        has_missing = bool(np.isnan(X_columns).any())
+        # plain ndarray views of memory-mapped arrays (np.memmap results of every operation cost extra)
+        arrays = {name: np.asarray(getattr(self, name)) for name in ("feature", "threshold", "children", "is_leaf", "missing_go_to_left")}
+        for start in range(0, self.n_estimators, TREE_GROUP):
+            yield self._walk(arrays, X_columns, X.shape[0], self.roots[start:start + TREE_GROUP], has_missing)
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf (index in the flat arrays) of every row in every tree, shape (rows, trees)."""
+        return np.concatenate(list(self._leaf_groups(X))).T
+
+    def predict(self, X) -> np.ndarray:
+        value = np.asarray(self.value)
+        total = None
+        for leaves in self._leaf_groups(X):
+            group_sum = np.take(value, leaves).sum(axis=0)
+            total = group_sum if total is None else total + group_sum
+        return total / self.n_estimators
+
+def is_mappable(model) -> bool:
+    estimators = getattr(model, "estimators_", None)
+    return (
+        isinstance(estimators, list) and len(estimators) > 0
+        and all(hasattr(estimator, "tree_") for estimator in estimators)
+        and getattr(model, "n_outputs_", None) == 1
+        and not hasattr(model, "classes_")
+    )
+
+# replace the random forest of a fitted pipeline (step "regressor") or a forest itself with a MappedForestRegressor,
+# other models are returned unchanged
+def map_forest(model):
+    if hasattr(model, "named_steps") and "regressor" in model.named_steps:
+        if is_mappable(model.named_steps["regressor"]):
+            # new pipeline with the same fitted steps, the trained pipeline keeps its sklearn forest
+            model = Pipeline([(name, MappedForestRegressor.from_forest(step) if name == "regressor" else step) for name, step in model.steps])
+        return model
+    return MappedForestRegressor.from_forest(model) if is_mappable(model) else model
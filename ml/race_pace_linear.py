@@ -6,6 +6,7 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from pathlib import Path
+from typing import Optional
 from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
@@ -14,9 +15,9 @@ from sklearn.pipeline import Pipeline
 from sklearn.impute import SimpleImputer
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
-def load_data(csv_path: str = "laps_dataset.csv") -> pd.DataFrame:
-    """Load the dataset."""
-    return pd.read_csv(csv_path)
+def load_data(csv_path: Optional[str] = None, session_name: Optional[str] = None) -> pd.DataFrame:
+    """Load the dataset (table lap_features, or an exported CSV)."""
+    return utils.load_dataset(csv_path, session_name)
 
 # prepare data for training
 def prepare_data(df: pd.DataFrame):
@@ -116,8 +117,7 @@ def plot_scatter_predictions(y_test, y_pred):
     return fig
 
 def main():
-    df = load_data()
-    df = df[df["session_name"] == "Race"]
+    df = load_data(session_name="Race")
 
     X, y, num_attribs, cat_attribs = prepare_data(df)
 
@@ -5,6 +5,7 @@ from ml import utils
 import pandas as pd
 import numpy as np
 from pathlib import Path
+from typing import Optional
 from sklearn.model_selection import train_test_split, RandomizedSearchCV
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
@@ -13,9 +14,9 @@ from sklearn.pipeline import Pipeline
 from sklearn.impute import SimpleImputer
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
-def load_data(csv_path: str = "laps_dataset.csv") -> pd.DataFrame:
-    """Load the dataset."""
-    return pd.read_csv(csv_path)
+def load_data(csv_path: Optional[str] = None, session_name: Optional[str] = None) -> pd.DataFrame:
+    """Load the dataset (table lap_features, or an exported CSV)."""
+    return utils.load_dataset(csv_path, session_name)
 
 # prepare data for training
 def prepare_data(df: pd.DataFrame):
@@ -125,8 +126,7 @@ def train_and_evaluate(model, X, y, best_params=None, best_score=None, test_size
     return model, X_test, y_test, y_pred, metrics
 
 def main():
-    df = load_data()
-    df = df[df["session_name"] == "Race"]
+    df = load_data(session_name="Race")
 
     X, y, num_attribs, cat_attribs = prepare_data(df)
 
@@ -3,23 +3,52 @@
 import joblib
 import json
 from pathlib import Path
-import matplotlib.pyplot as plt
-import seaborn as sns
+from typing import Optional
 import numpy as np
 import pandas as pd
+from sqlalchemy import inspect
+from app import database
+from app.models import LapFeature
+from app.repositories import lap_feature_repository
+from ml.mapped_forest import map_forest
+
+# matplotlib is imported only by the plotting functions, so the API can load models without it
 
 # default path
 ML_DIR = Path("ml")
 
-def save_model(model, model_name: str):
-    """Save model in ml/models/{model_name}/model.pkl."""
-    model_dir = ML_DIR / "models" / model_name
-    model_dir.mkdir(parents=True, exist_ok=True)
-    model_path = model_dir / "model.pkl"
-
-    joblib.dump(model, model_path)
-
-    return model_path
+def load_dataset(csv_path: Optional[str] = None, session_name: Optional[str] = None) -> pd.DataFrame:
+    """
+    Load the training dataset from table lap_features (kept up to date by sync, no export needed).
+    With csv_path the dataset is read from a CSV exported by scripts/export_laps.py instead.
+    """
+    if csv_path is not None:
+        df = pd.read_csv(csv_path)
+        return df if session_name is None else df[df["session_name"] == session_name]
+
+    db = database.SessionLocal()
+    try:
+        if not inspect(db.get_bind()).has_table(LapFeature.__tablename__):
+            raise RuntimeError(
+                f"Table {LapFeature.__tablename__} doesn't exist in {database.engine.url}, "
+                "build it with: python -m scripts.build_lap_features"
+            )
+        return lap_feature_repository.load_lap_features(db, session_name)
+    finally:
+        db.close()
+
+def save_model(model, model_name: str, models_dir: Optional[Path] = None, mapped: bool = True):
+    """
+    Save model in ml/models/{model_name}/model.pkl (or in models_dir), uncompressed so it can be memory-mapped.
+    With mapped=True a random forest is saved as MappedForestRegressor (flat tree arrays that stay memory-mapped
+    when loaded, see ml/mapped_forest.py), other models are saved as they are.
+    """
+    path = model_path(model_name, models_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    joblib.dump(map_forest(model) if mapped else model, path, compress=0)
+
+    return path
     
 def save_metrics(metrics: dict, model_name: str):
     """Save metrics in ml/metrics/{model_name}/metrics.json."""
@@ -32,8 +61,10 @@ def save_metrics(metrics: dict, model_name: str):
 
     return metrics_path
 
-def save_plot(fig: plt.Figure, model_name: str, filename: str = "plot.png"):
+def save_plot(fig: "plt.Figure", model_name: str, filename: str = "plot.png"):
     """Save plot in ml/plots/{model_name}/{filename}"""
+    import matplotlib.pyplot as plt
+
     plot_dir = ML_DIR / "plots" / model_name
     plot_dir.mkdir(parents=True, exist_ok=True)
     plot_path = plot_dir / filename
@@ -42,15 +73,23 @@ def save_plot(fig: plt.Figure, model_name: str, filename: str = "plot.png"):
 
     return plot_path
 
-def load_model(model_name: str):
-    """Load saved .pkl model."""
-    model_path = ML_DIR / "models" / model_name / "model.pkl"
-    model = joblib.load(model_path)
+def model_path(model_name: str, models_dir: Optional[Path] = None) -> Path:
+    """Path of the saved model ml/models/{model_name}/model.pkl (or in models_dir)."""
+    return Path(models_dir or ML_DIR / "models") / model_name / "model.pkl"
+
+def load_model(model_name: str, models_dir: Optional[Path] = None, mmap_mode: Optional[str] = "r"):
+    """
+    Load saved .pkl model, numpy arrays memory-mapped read-only by default
+    (processes loading the same model share the tree arrays of a mapped forest through the page cache).
+    """
+    model = joblib.load(model_path(model_name, models_dir), mmap_mode=mmap_mode)
     
     return model
 
 def plot_feature_importance(model, X, model_name: str, filename="feature_importance_plot.png"):
     """Generate and save plot for top 10 feature importances for Random Forest model."""
+    import matplotlib.pyplot as plt
+
     regressor = model.named_steps["regressor"]
     preprocessor = model.named_steps["preprocessor"]
 
@@ -0,0 +1,29 @@
+"""
+Builds the ML feature table lap_features from laps, stints, races and drivers (all races or only --race).
+Syncs keep the table up to date for the synced races, this is only needed once for an existing database
+or after changing the feature columns.
+"""
+
+import argparse
+from typing import Optional
+from sqlalchemy import select
+from app import database, models
+from app.repositories import lap_feature_repository
+
+def build_lap_features(race_id: Optional[int] = None):
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        race_ids = [race_id] if race_id is not None else db.scalars(select(models.Race.race_id).order_by(models.Race.race_id)).all()
+        rows = 0
+        for race_id in race_ids:
+            rows += lap_feature_repository.refresh_race_lap_features(db, race_id)
+        print(f"Table lap_features built for {len(race_ids)} races ({rows} rows).")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the ML feature table lap_features.")
+    parser.add_argument("--race", type=int, help="only this race_id")
+    args = parser.parse_args()
+    build_lap_features(args.race)
@@ -1,105 +1,113 @@
+import argparse
+from pathlib import Path
+from typing import Iterator, Optional
 import pandas as pd
-from app import database, models
+from sqlalchemy.orm import Session
+from app import database
+from app.repositories import lap_feature_repository
+from app.repositories.lap_feature_repository import clean_laps_dataframe
 
-def clean_laps_dataframe(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Remove:
-    - NULL values for lap_duration, tyre_compound, sectors
-    - out laps
-    - outliers (very long or very short laps)
-    - if any of duration sectors is NULL
-    """
+# exported columns and their pandas dtypes (nullable integers stay integers in every chunk),
+# same join and cleaning as table lap_features
+EXPORT_COLUMNS = lap_feature_repository.LAP_FEATURE_COLUMNS
 
-    # remove laps where lap_duration is NULL
-    df = df[df["lap_duration"].notnull()]
+# rows read from the database, cleaned and written at once (one Parquet row group)
+EXPORT_CHUNK_SIZE = 50000
 
-    # remove laps with NULL or UNKNOWN tyre_compound
-    df = df[df["tyre_compound"].notnull()]
-    df = df[df["tyre_compound"] != "UNKNOWN"]
+def export_laps_query(db: Session, since_race: Optional[int] = None):
+    return lap_feature_repository.lap_features_query(db, since_race)
 
-    # remove outlaps
-    if "is_pit_out_lap" in df.columns:
-        df = df[df["is_pit_out_lap"] == False]
+def iter_clean_chunks(db: Session, chunk_size: int = EXPORT_CHUNK_SIZE, since_race: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """Cleaned export rows in DataFrames of up to chunk_size rows, read from the database with yield_per."""
+    result = db.execute(export_laps_query(db, since_race).statement.execution_options(yield_per=chunk_size))
+    for rows in result.partitions():
+        df = pd.DataFrame(rows, columns=list(EXPORT_COLUMNS)).astype(EXPORT_COLUMNS)
+        yield clean_laps_dataframe(df)
 
-    # remove outliers
-    df = df[(df["lap_duration"] > 60) & (df["lap_duration"] < 150)]
+# Parquet writer with a fixed schema (pyarrow is optional, only needed for Parquet) and a function writing one row group
+def _parquet_writer(output_file: str):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Parquet export needs pyarrow (pip install pyarrow), or export to .csv.")
 
-    # remove unless all sectors have assigned value
-    df = df[df[["duration_sector_1", "duration_sector_2", "duration_sector_3"]].notnull().all(axis=1)]
+    types = {"Int64": pa.int64(), "string": pa.string(), "float64": pa.float64()}
+    schema = pa.schema([(name, types[dtype]) for name, dtype in EXPORT_COLUMNS.items()])
+    writer = pq.ParquetWriter(output_file, schema)
+    return writer, lambda df: writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
 
-    # reset index
-    return df.reset_index(drop=True) 
+def write_laps_export(
+    db: Session,
+    output_file: str,
+    output_format: str = "csv",
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+    since_race: Optional[int] = None,
+    append: bool = False
+) -> dict:
+    """
+    Export the laps dataset chunk by chunk, memory depends on chunk_size and not on the number of laps.
+    CSV chunks are appended to the file (append=True adds to an existing file without header),
+    Parquet chunks are written as row groups. Returns exported rows and the last exported race_id.
+    """
+    rows = 0
+    last_race_id = None
+    parquet_writer = None
 
-def export_laps_to_csv(output_file: str = "laps_dataset.csv"):
-    db = database.SessionLocal()
+    if output_format == "parquet":
+        if append:
+            raise SystemExit("Parquet files can't be appended, export --since-race to a new file.")
+        parquet_writer, write_row_group = _parquet_writer(output_file)
+    header = not (append and Path(output_file).exists())
+    mode = "a" if append else "w"
 
-    # join laps + races + drivers + stints
     try:
-        query = (
-            db.query(
-                models.Lap.race_id,
-                models.Lap.session_id,
-                models.Session.session_name,
-                models.Driver.driver_id,
-                models.Race.location.label("circuit_location"),
-                models.Lap.lap_number,
-                models.Stint.stint_number,
-                (models.Lap.lap_number - models.Stint.lap_start + 1).label("stint_lap_number"),
-                models.Stint.tyre_compound,
-                models.Stint.tyre_age_at_start,
-                models.Lap.duration_sector_1,
-                models.Lap.duration_sector_2,
-                models.Lap.duration_sector_3,
-                models.Lap.pit_in_time,
-                models.Lap.pit_out_time,
-                models.Lap.track_status,
-                models.Lap.lap_duration
-            )
-            .join(models.Race, models.Lap.race_id == models.Race.race_id)
-            .join(models.Session, models.Lap.session_id == models.Session.session_id)
-            .join(models.Driver, models.Lap.driver_number == models.Driver.driver_number)
-            .join(
-                models.Stint,
-                (models.Lap.race_id == models.Stint.race_id) &
-                (models.Lap.session_id == models.Stint.session_id) &
-                (models.Lap.driver_number == models.Stint.driver_number) &
-                (models.Lap.lap_number >= models.Stint.lap_start) &
-                (models.Lap.lap_number <= models.Stint.lap_end)
-            )
-            # filter only Race and Practice 2
-            .filter(models.Session.session_name.in_(["Race", "Practice 2"]))
-        )
+        for df in iter_clean_chunks(db, chunk_size, since_race):
+            if parquet_writer is not None:
+                write_row_group(df)
+            else:
+                df.to_csv(output_file, mode=mode, header=header, index=False)
+                mode, header = "a", False
+            rows += len(df)
+            if len(df):
+                last_race_id = max(last_race_id or 0, int(df["race_id"].max()))
 
-        df = pd.DataFrame(query.all(), columns=[
-            "race_id",
-            "session_id",
-            "session_name",
-            "driver_id",
-            "circuit_location",
-            "lap_number",
-            "stint_number",
-            "stint_lap_number",
-            "tyre_compound",
-            "tyre_age_at_start",
-            "duration_sector_1",
-            "duration_sector_2",
-            "duration_sector_3",
-            "pit_in_time",
-            "pit_out_time",
-            "track_status",
-            "lap_duration"
-        ])
-
-        # clean dataframe
-        df_clean = clean_laps_dataframe(df)
+        # empty export still gets a header
+        if parquet_writer is None and header:
+            pd.DataFrame(columns=list(EXPORT_COLUMNS)).to_csv(output_file, mode=mode, index=False)
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
 
-        # export to csv file
-        df_clean.to_csv(output_file, index=False)
-        print(f"Laps dataset exported to {output_file} containing ({len(df_clean)} rows).")
+    return {"rows": rows, "last_race_id": last_race_id}
 
+def export_laps(
+    output_file: str = "laps_dataset.csv",
+    output_format: Optional[str] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+    since_race: Optional[int] = None,
+    append: bool = False
+):
+    output_format = output_format or ("parquet" if output_file.endswith(".parquet") else "csv")
+    db = database.SessionLocal()
+    try:
+        result = write_laps_export(db, output_file, output_format, chunk_size, since_race, append)
+        print(f"Laps dataset exported to {output_file} containing ({result['rows']} rows).")
+        if result["last_race_id"] is not None:
+            print(f"Last exported race_id={result['last_race_id']} (next incremental export: --since-race {result['last_race_id']}).")
+        return result
     finally:
         db.close()
 
+def export_laps_to_csv(output_file: str = "laps_dataset.csv"):
+    return export_laps(output_file, "csv")
+
 if __name__ == "__main__":
-    export_laps_to_csv()
-    
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Export the laps dataset for ML (CSV or Parquet), chunk by chunk.")
+    parser.add_argument("--out", default="laps_dataset.csv", help="output file, .parquet for Parquet (needs pyarrow)")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="output format (default: from the file extension)")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, help="rows per chunk / Parquet row group")
+    parser.add_argument("--since-race", type=int, help="only races with race_id greater than this one (incremental export)")
+    parser.add_argument("--append", action="store_true", help="append to an existing CSV file (with --since-race)")
+    args = parser.parse_args()
+    export_laps(args.out, args.format, args.chunk_size, args.since_race, args.append)
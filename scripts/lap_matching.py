@@ -0,0 +1,52 @@
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app import models
+
+# match FastF1 laps of one session to laps in the database
+def match_session_laps(db: Session, session_id: int, fastf1_laps: pd.DataFrame) -> pd.DataFrame:
+    """
+    Joins FastF1 laps (columns `driver` = upper case name acronym and `lap_number`, plus any data columns)
+    to the database laps of one session with two queries and one merge, instead of a query per lap.
+    - driver acronyms are mapped to driver numbers with the drivers table
+    - the result is merged with the session's laps on (driver_number, lap_number)
+    Returns the matched FastF1 rows with lap_id, race_id, session_id and driver_number of the database lap,
+    one row per FastF1 lap (the first match, like the old `.first()` query).
+    """
+    if fastf1_laps.empty:
+        return fastf1_laps.assign(lap_id=[], race_id=[], session_id=[], driver_number=[])
+
+    drivers = pd.DataFrame(
+        db.execute(select(models.Driver.name_acronym, models.Driver.driver_number)).all(),
+        columns=["driver", "driver_number"]
+    )
+    laps = pd.DataFrame(
+        db.execute(
+            select(models.Lap.lap_id, models.Lap.race_id, models.Lap.session_id, models.Lap.driver_number, models.Lap.lap_number)
+            .where(models.Lap.session_id == session_id)
+            .order_by(models.Lap.lap_id)
+        ).all(),
+        columns=["lap_id", "race_id", "session_id", "driver_number", "lap_number"]
+    )
+
+    fastf1_laps = fastf1_laps.reset_index(drop=True)
+    fastf1_laps["fastf1_row"] = fastf1_laps.index
+    fastf1_laps["lap_number"] = fastf1_laps["lap_number"].astype("Int64")
+    laps["lap_number"] = laps["lap_number"].astype("Int64")
+    laps["driver_number"] = laps["driver_number"].astype("Int64")
+    drivers["driver_number"] = drivers["driver_number"].astype("Int64")
+
+    matched = (
+        fastf1_laps
+        .merge(drivers, on="driver", how="inner")
+        .merge(laps, on=["driver_number", "lap_number"], how="inner")
+        .sort_values(["fastf1_row", "lap_id"], kind="stable")
+        .drop_duplicates("fastf1_row")
+        .drop(columns="fastf1_row")
+    )
+    return matched.reset_index(drop=True)
+
+def to_records(df: pd.DataFrame, columns: list) -> list:
+    """DataFrame columns -> list of dicts with plain Python values (NaN/NaT/NA become None) for executemany."""
+    values = df[columns].astype(object)
+    return values.where(values.notna(), None).to_dict("records")
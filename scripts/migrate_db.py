@@ -0,0 +1,28 @@
+"""
+Creates missing tables and applies schema migrations (app/migrations.py) to the existing local SQLite database.
+Migrations never delete data: if a unique index can't be created because of duplicate rows, the duplicate keys
+are listed and the duplicates are removed only with --remove-duplicates (the first inserted row is kept).
+"""
+
+import argparse
+from app import database, migrations, models
+
+def migrate_db(remove_duplicates: bool = False):
+    models.Base.metadata.create_all(bind=database.engine)
+
+    with database.engine.connect() as conn:
+        current_version = migrations.get_schema_version(conn)
+
+    if remove_duplicates:
+        for table, removed in migrations.remove_duplicate_keys(database.engine).items():
+            print(f"Removed {removed} duplicate rows from {table}.")
+
+    version = migrations.upgrade(database.engine)
+    print(f"Database schema version: {current_version} -> {version} (latest: {len(migrations.MIGRATIONS)}).")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--remove-duplicates", action="store_true",
+                        help="delete rows with the same natural key as an earlier row before creating unique indexes")
+    args = parser.parse_args()
+    migrate_db(args.remove_duplicates)
@@ -0,0 +1,44 @@
+"""
+Records OpenF1 responses used by the sync endpoints and sync scripts to gzip files (app/openf1_fixtures.py),
+so they can be replayed offline in tests and benchmarks (benchmarks/bench_sync.py).
+
+Records meetings and drivers (POST /races/sync, /drivers/sync) and sessions, stints and laps for every
+meeting of the chosen year (POST /{sessions,stints,laps}/sync/{race_id}, scripts/sync_all_*.py).
+
+    python -m scripts.record_openf1_fixtures --year 2024 --meetings 3 --out data/openf1_fixtures
+"""
+
+import argparse
+import asyncio
+from app.openf1_client import FETCH_ERRORS, OpenF1Client
+from app.openf1_fixtures import RecordingTransport
+
+RACE_ENDPOINTS = ["sessions", "stints", "laps"]
+
+async def record_openf1_fixtures(out: str, year: int, meetings: int = 0):
+    transport = RecordingTransport(out)
+    async with OpenF1Client(transport=transport) as openf1:
+        meetings_json = await openf1.get_json("meetings")
+        await openf1.get_json("drivers")
+
+        races = [m for m in meetings_json if m.get("year") == year]
+        if meetings:
+            races = races[:meetings]
+        print(f"Recording {len(races)} meetings from {year}.")
+
+        for endpoint in RACE_ENDPOINTS:
+            async for race, data in openf1.fetch_ordered(endpoint, races, lambda race: {"meeting_key": race["meeting_key"]}):
+                if isinstance(data, FETCH_ERRORS):
+                    print(f"Failed to record {endpoint} for meeting_key={race['meeting_key']}: {str(data)}")
+                    continue
+                print(f"{endpoint} meeting_key={race['meeting_key']} ({race.get('meeting_name')}): {len(data)} rows")
+
+    print(f"Recorded {transport.recorded} responses to {out}.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default="data/openf1_fixtures")
+    parser.add_argument("--year", type=int, default=2024)
+    parser.add_argument("--meetings", type=int, default=0, help="only the first N meetings of the year (0 = all)")
+    args = parser.parse_args()
+    asyncio.run(record_openf1_fixtures(args.out, args.year, args.meetings))
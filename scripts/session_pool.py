@@ -0,0 +1,46 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Iterable, NamedTuple, Optional
+
+# one FastF1 session to load (all fields are plain values so it can be sent to a worker process)
+class SessionJob(NamedTuple):
+    race_id: int
+    year: int
+    race_name: str
+    session_id: int
+    session_name: str
+    fastf1_session_name: str
+
+def run_sessions(
+    jobs: Iterable[SessionJob],
+    load: Callable[[SessionJob], Optional[list]],
+    write: Callable[[SessionJob, list], None],
+    workers: int = 1,
+    failed: Optional[Callable[[SessionJob, str], None]] = None
+):
+    """
+    Run load(job) for every session and pass its records to write(job, records).
+    With workers > 1 load runs in a ProcessPoolExecutor (FastF1 parsing and aggregation are CPU bound)
+    and write is called in this process as results come in, so there is a single database writer.
+    load must be a module level function, return compact records and not use the database.
+    Sessions where load returns None or raises are skipped, failed(job, reason) is called for the ones that raised.
+    """
+    def handle(job: SessionJob, result: Callable[[], Optional[list]]):
+        try:
+            records = result()
+        except Exception as e:
+            print(f"Error loading {job.year} {job.race_name} - {job.session_name}: {e}")
+            if failed is not None:
+                failed(job, str(e))
+            return
+        if records is not None:
+            write(job, records)
+
+    if workers <= 1:
+        for job in jobs:
+            handle(job, lambda: load(job))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(load, job): job for job in jobs}
+        for future in as_completed(futures):
+            handle(futures[future], future.result)
@@ -1,83 +1,164 @@
+import argparse
+import asyncio
+from datetime import timedelta
 import httpx
+from typing import List, Optional
 from sqlalchemy.orm import Session
 from app import database, models, schemas
-from app.repositories import lap_repository
+from app.openf1_client import FETCH_ERRORS, OpenF1Client
+from app.repositories import bulk_repository, lap_feature_repository, lap_repository, sync_state_repository
 
-OPENF1_LAPS_URL = "https://api.openf1.org/v1/laps"
+OPENF1_LAPS_ENDPOINT = "laps"
 
-# fetch laps from OpenF1 API and save/update them in the database
+# sync_state key of this script (synced per race)
+SYNC_SOURCE = "openf1"
+SYNC_STAGE = "laps"
+
+# laps of one race as LapCreate (laps without lap_duration are not stored)
+def to_lap_creates(race_id: int, laps_json: list) -> List[schemas.LapCreate]:
+    return [
+        schemas.LapCreate(
+            race_id = race_id,
+            session_id = l.get("session_key"),
+            driver_number = l.get("driver_number"),
+            lap_number = l.get("lap_number"),
+            lap_duration = l.get("lap_duration", 0),
+            duration_sector_1 = l.get("duration_sector_1", 0),
+            duration_sector_2 = l.get("duration_sector_2", 0),
+            duration_sector_3 = l.get("duration_sector_3", 0),
+            i1_speed = l.get("i1_speed", 0),
+            i2_speed = l.get("i2_speed", 0),
+            st_speed = l.get("st_speed", 0),
+            is_pit_out_lap = l.get("is_pit_out_lap", False)
+        )
+        for l in laps_json
+        if l.get("lap_duration") is not None
+    ]
+
+# fetch laps of one race as a stream and write every batch before the next one is parsed
+# (memory depends on batch_size, not on the size of the meeting); returns created, updated, total and the content hash
+async def stream_race_laps(db: Session, openf1: OpenF1Client, race_id: int, batch_size: int) -> dict:
+    created = 0
+    updated = 0
+    hasher = sync_state_repository.ContentHasher()
+    async for laps_json in openf1.iter_json_batches(OPENF1_LAPS_ENDPOINT, {"meeting_key": race_id}, batch_size):
+        hasher.update(laps_json)
+        result = await asyncio.to_thread(bulk_repository.upsert_laps, db, to_lap_creates(race_id, laps_json))
+        created += result["created"]
+        updated += result["updated"]
+    await asyncio.to_thread(lap_repository.assign_lap_stints, db, race_id)
+    await asyncio.to_thread(lap_feature_repository.refresh_race_lap_features, db, race_id)
+    return {"created": created, "updated": updated, "total": hasher.count, "content_hash": hasher.hexdigest()}
+
+# fetch laps for all races from OpenF1 API (races are fetched in parallel)
+# and save/update them in the database (written one race at a time, in race order)
+# with stream races are fetched one at a time and written in batches of batch_size laps while they download
+# (for very large meetings; the unchanged check isn't possible before writing, sync_state is still recorded)
 # returns count of created and updated laps
-def sync_all_laps():
+async def sync_all_laps_async(
+    openf1: Optional[OpenF1Client] = None,
+    latest: bool = False,
+    force: bool = False,
+    stream: bool = False,
+    batch_size: int = bulk_repository.BATCH_SIZE,
+    refetch_days: Optional[float] = None
+):
     db: Session = database.SessionLocal()
+    own_client = openf1 is None
+    openf1 = openf1 or OpenF1Client()
     try:
-        races = db.query(models.Race).all()
+        races = db.query(models.Race.race_id, models.Race.race_name).all()
         print(f"Found {len(races)} races in database.")
 
+        # only new races, races that failed or had no data before (resumes after a crash)
+        # and with refetch_days races synced longer ago than that (unchanged ones are not written again)
+        # with latest only the latest meeting, always fetched again because it may still change
+        states = sync_state_repository.get_states(db, SYNC_SOURCE, SYNC_STAGE)
+        refetch_after = timedelta(days=refetch_days) if refetch_days is not None else None
+        if latest:
+            latest_race_id = sync_state_repository.get_latest_race_id(db)
+            races = [race for race in races if race.race_id == latest_race_id]
+        else:
+            for race in races:
+                if not sync_state_repository.is_pending(states, race.race_id, force=force, refetch_after=refetch_after):
+                    print(f"Skipping race_id={race.race_id} ({race.race_name}) - already synced.")
+            races = [race for race in races if sync_state_repository.is_pending(states, race.race_id, force=force, refetch_after=refetch_after)]
+
         total_created = 0
         total_updated = 0
 
-        for race in races:
+        if stream:
+            for race in races:
+                try:
+                    result = await stream_race_laps(db, openf1, race.race_id, batch_size)
+                except (httpx.HTTPError, ValueError) as e:
+                    # batches written before the error stay, the race is synced again next time
+                    print(f"Failed to retrieve laps for race_id={race.race_id}: {str(e)}")
+                    sync_state_repository.record_state(
+                        db, SYNC_SOURCE, SYNC_STAGE, race.race_id,
+                        status=sync_state_repository.SYNC_FAILED, failure_reason=str(e)
+                    )
+                    continue
+
+                sync_state_repository.record_state(
+                    db, SYNC_SOURCE, SYNC_STAGE, race.race_id, row_count=result["total"], content_hash=result["content_hash"]
+                )
+                print(f"race_id={race.race_id} ({race.race_name}): {result['created']} created, {result['updated']} updated, total={result['total']}")
+
+                total_created += result["created"]
+                total_updated += result["updated"]
+
+            print(f"\nAll races synced. Created={total_created}, Updated={total_updated}")
+            return {"created": total_created, "updated": total_updated}
+
+        async for race, laps_json in openf1.fetch_ordered(OPENF1_LAPS_ENDPOINT, races, lambda race: {"meeting_key": race.race_id}):
             race_id = race.race_id
-            print(f"Fetching laps for race_id={race_id} ({race.race_name})")
-
-            try:
-                response = httpx.get(OPENF1_LAPS_URL, params={"meeting_key": race_id}, timeout=10)
-                response.raise_for_status()
-                laps_json = response.json()
-            except httpx.HTTPError as e:
-                print(f"Failed to retrieve laps for race_id={race_id}: {str(e)}")
+
+            if isinstance(laps_json, FETCH_ERRORS):
+                print(f"Failed to retrieve laps for race_id={race_id}: {str(laps_json)}")
+                sync_state_repository.record_state(
+                    db, SYNC_SOURCE, SYNC_STAGE, race_id,
+                    status=sync_state_repository.SYNC_FAILED, failure_reason=str(laps_json)
+                )
                 continue
 
-            created = 0
-            updated = 0
+            # skip writing if OpenF1 returned the same data as in the last sync
+            data_hash = sync_state_repository.content_hash(laps_json)
+            if not force and sync_state_repository.is_unchanged(states, race_id, sync_state_repository.RACE_LEVEL, data_hash):
+                print(f"race_id={race_id} ({race.race_name}): unchanged.")
+                sync_state_repository.record_state(db, SYNC_SOURCE, SYNC_STAGE, race_id, row_count=len(laps_json), content_hash=data_hash)
+                continue
 
-            for l in laps_json:
-                if l.get("lap_duration") is None:
-                    continue
+            # write in a thread so the next races keep downloading meanwhile
+            result = await asyncio.to_thread(bulk_repository.upsert_laps, db, to_lap_creates(race_id, laps_json))
+            await asyncio.to_thread(lap_repository.assign_lap_stints, db, race_id)
+            await asyncio.to_thread(lap_feature_repository.refresh_race_lap_features, db, race_id)
+            created = result["created"]
+            updated = result["updated"]
+            sync_state_repository.record_state(db, SYNC_SOURCE, SYNC_STAGE, race_id, row_count=len(laps_json), content_hash=data_hash)
 
-                lap_data = schemas.LapCreate(
-                    race_id = race_id,
-                    session_id = l.get("session_key"),
-                    driver_number = l.get("driver_number"),
-                    lap_number = l.get("lap_number"),
-                    lap_duration = l.get("lap_duration", 0),
-                    duration_sector_1 = l.get("duration_sector_1", 0),
-                    duration_sector_2 = l.get("duration_sector_2", 0),
-                    duration_sector_3 = l.get("duration_sector_3", 0),
-                    i1_speed = l.get("i1_speed", 0),
-                    i2_speed = l.get("i2_speed", 0),
-                    st_speed = l.get("st_speed", 0),
-                    is_pit_out_lap = l.get("is_pit_out_lap", False)
-                ) 
-
-                lap_exists = db.query(models.Lap).filter(
-                    models.Lap.race_id == race_id,
-                    models.Lap.session_id == lap_data.session_id,
-                    models.Lap.driver_number == lap_data.driver_number,
-                    models.Lap.lap_number == lap_data.lap_number
-                    ).first()
-                
-                if lap_exists:
-                    update_data = lap_data.model_dump(exclude_unset=True)
-                    for field, value in update_data.items():
-                        if value is not None:
-                            setattr(lap_exists, field, value)
-                    db.commit()
-                    db.refresh(lap_exists)
-                    updated += 1
-                else:
-                    lap_repository.create_lap(db, lap_data)
-                    created += 1
-
-            print(f"race_id={race_id}: {created} created, {updated} updated, total={len(laps_json)}")
+            print(f"race_id={race_id} ({race.race_name}): {created} created, {updated} updated, total={len(laps_json)}")
 
             total_created += created
             total_updated += updated
 
         print(f"\nAll races synced. Created={total_created}, Updated={total_updated}")
+        return {"created": total_created, "updated": total_updated}
 
     finally:
         db.close()
+        if own_client:
+            await openf1.aclose()
+
+def sync_all_laps(latest: bool = False, force: bool = False, stream: bool = False, batch_size: int = bulk_repository.BATCH_SIZE, refetch_days: Optional[float] = None):
+    return asyncio.run(sync_all_laps_async(latest=latest, force=force, stream=stream, batch_size=batch_size, refetch_days=refetch_days))
 
 if __name__ == "__main__":
-    sync_all_laps()
+    parser = argparse.ArgumentParser(description="Sync laps of all races from OpenF1.")
+    parser.add_argument("--latest", action="store_true", help="only the latest meeting (for nightly runs)")
+    parser.add_argument("--force", action="store_true", help="sync all races again, ignoring sync_state")
+    parser.add_argument("--refetch-days", type=float, help="also fetch races synced more than this many days ago again (without --stream written only if changed)")
+    parser.add_argument("--stream", action="store_true", help="parse and write each race in batches while it downloads (bounded memory)")
+    parser.add_argument("--batch-size", type=int, default=bulk_repository.BATCH_SIZE, help="laps per batch with --stream")
+    args = parser.parse_args()
+    sync_all_laps(args.latest, args.force, args.stream, args.batch_size, args.refetch_days)
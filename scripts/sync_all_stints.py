@@ -1,38 +1,66 @@
-import httpx
+import argparse
+import asyncio
+from datetime import timedelta
+from typing import Optional
 from sqlalchemy.orm import Session
 from app import database, models, schemas
-from app.repositories import stint_repository
+from app.openf1_client import FETCH_ERRORS, OpenF1Client
+from app.repositories import bulk_repository, lap_feature_repository, lap_repository, sync_state_repository
 
-OPENF1_STINTS_URL = "https://api.openf1.org/v1/stints"
+OPENF1_STINTS_ENDPOINT = "stints"
 
-# fetch all stints for all races from OpenF1 API and save/update them in the database
+# sync_state key of this script (synced per race)
+SYNC_SOURCE = "openf1"
+SYNC_STAGE = "stints"
+
+# fetch all stints for all races from OpenF1 API (races are fetched in parallel)
+# and save/update them in the database (written one race at a time, in race order)
 # returns count of created and updated stints
-def sync_all_stints():
+async def sync_all_stints_async(openf1: Optional[OpenF1Client] = None, latest: bool = False, force: bool = False, refetch_days: Optional[float] = None):
     db: Session = database.SessionLocal()
+    own_client = openf1 is None
+    openf1 = openf1 or OpenF1Client()
     try:
-        races = db.query(models.Race).all()
+        races = db.query(models.Race.race_id, models.Race.race_name).all()
         print(f"Found {len(races)} races in database.")
 
+        # only new races, races that failed or had no data before (resumes after a crash)
+        # and with refetch_days races synced longer ago than that (unchanged ones are not written again)
+        # with latest only the latest meeting, always fetched again because it may still change
+        states = sync_state_repository.get_states(db, SYNC_SOURCE, SYNC_STAGE)
+        refetch_after = timedelta(days=refetch_days) if refetch_days is not None else None
+        if latest:
+            latest_race_id = sync_state_repository.get_latest_race_id(db)
+            races = [race for race in races if race.race_id == latest_race_id]
+        else:
+            for race in races:
+                if not sync_state_repository.is_pending(states, race.race_id, force=force, refetch_after=refetch_after):
+                    print(f"Skipping race_id={race.race_id} ({race.race_name}) - already synced.")
+            races = [race for race in races if sync_state_repository.is_pending(states, race.race_id, force=force, refetch_after=refetch_after)]
+
         total_created = 0
         total_updated = 0
 
-        for race in races:
+        async for race, stints_json in openf1.fetch_ordered(OPENF1_STINTS_ENDPOINT, races, lambda race: {"meeting_key": race.race_id}):
             race_id = race.race_id
-            print(f"Fetching stints for race_id={race_id} ({race.race_name})")
-
-            try:
-                response = httpx.get(OPENF1_STINTS_URL, params={"meeting_key": race_id}, timeout=10)
-                response.raise_for_status()
-                stints_json = response.json()
-            except httpx.HTTPError as e:
-                print(f"Failed to retrieve stints for race_id={race_id}: {str(e)}")
+
+            if isinstance(stints_json, FETCH_ERRORS):
+                print(f"Failed to retrieve stints for race_id={race_id}: {str(stints_json)}")
+                sync_state_repository.record_state(
+                    db, SYNC_SOURCE, SYNC_STAGE, race_id,
+                    status=sync_state_repository.SYNC_FAILED, failure_reason=str(stints_json)
+                )
                 continue
 
-            created = 0
-            updated = 0
+            # skip writing if OpenF1 returned the same data as in the last sync
+            data_hash = sync_state_repository.content_hash(stints_json)
+            if not force and sync_state_repository.is_unchanged(states, race_id, sync_state_repository.RACE_LEVEL, data_hash):
+                print(f"race_id={race_id} ({race.race_name}): unchanged.")
+                sync_state_repository.record_state(db, SYNC_SOURCE, SYNC_STAGE, race_id, row_count=len(stints_json), content_hash=data_hash)
+                continue
 
-            for s in stints_json:
-                stint_data = schemas.StintCreate(
+            stints = [
+                schemas.StintCreate(
                     race_id = race_id,
                     session_id = s.get("session_key"),
                     driver_number = s.get("driver_number"),
@@ -41,36 +69,39 @@ def sync_all_stints():
                     lap_end = s.get("lap_end"),
                     tyre_compound = s.get("compound"),
                     tyre_age_at_start = s.get("tyre_age_at_start")
-                ) 
-
-                stint_exists = db.query(models.Stint).filter(
-                    models.Stint.race_id == stint_data.race_id,
-                    models.Stint.session_id == stint_data.session_id,
-                    models.Stint.driver_number == stint_data.driver_number,
-                    models.Stint.stint_number == stint_data.stint_number
-                ).first()
-                
-                if stint_exists:
-                    update_data = stint_data.model_dump(exclude_unset=True)
-                    for field, value in update_data.items():
-                        if value is not None:
-                            setattr(stint_exists, field, value)
-                    db.commit()
-                    db.refresh(stint_exists)
-                    updated += 1
-                else:
-                    stint_repository.create_stint(db, stint_data)
-                    created += 1
-
-            print(f"race_id={race_id}: {created} created, {updated} updated, total={len(stints_json)}")
+                )
+                for s in stints_json
+            ]
+
+            # write in a thread so the next races keep downloading meanwhile
+            result = await asyncio.to_thread(bulk_repository.upsert_stints, db, stints)
+            # laps synced before the stints get their stint_id now
+            await asyncio.to_thread(lap_repository.assign_lap_stints, db, race_id)
+            await asyncio.to_thread(lap_feature_repository.refresh_race_lap_features, db, race_id)
+            created = result["created"]
+            updated = result["updated"]
+            sync_state_repository.record_state(db, SYNC_SOURCE, SYNC_STAGE, race_id, row_count=len(stints_json), content_hash=data_hash)
+
+            print(f"race_id={race_id} ({race.race_name}): {created} created, {updated} updated, total={len(stints_json)}")
 
             total_created += created
             total_updated += updated
 
         print(f"\nAll races synced. Created={total_created}, Updated={total_updated}")
+        return {"created": total_created, "updated": total_updated}
 
     finally:
         db.close()
+        if own_client:
+            await openf1.aclose()
+
+def sync_all_stints(latest: bool = False, force: bool = False, refetch_days: Optional[float] = None):
+    return asyncio.run(sync_all_stints_async(latest=latest, force=force, refetch_days=refetch_days))
 
 if __name__ == "__main__":
-    sync_all_stints()
+    parser = argparse.ArgumentParser(description="Sync stints of all races from OpenF1.")
+    parser.add_argument("--latest", action="store_true", help="only the latest meeting (for nightly runs)")
+    parser.add_argument("--force", action="store_true", help="sync all races again, ignoring sync_state")
+    parser.add_argument("--refetch-days", type=float, help="also fetch races synced more than this many days ago again (written only if changed)")
+    args = parser.parse_args()
+    sync_all_stints(args.latest, args.force, args.refetch_days)
@@ -1,7 +1,14 @@
+import argparse
 import fastf1
+import pandas as pd
 from pathlib import Path
+from typing import List
 from app import database, models
+from sqlalchemy import update
 from sqlalchemy.orm import Session
+from app.repositories import lap_feature_repository, sync_state_repository
+from scripts.lap_matching import match_session_laps, to_records
+from scripts.session_pool import SessionJob, run_sessions
 
 # enable cache directory
 cache_dir = Path("data/fastf1_cache")
@@ -20,86 +27,124 @@ SESSION_MAPPING = {
     "Sprint Qualifying": "Sprint Qualifying" # for 2024 and 2025 season
 }
 
-def sync_laps_from_fastf1():
+# sync_state key of this script (synced per session)
+SYNC_SOURCE = "fastf1"
+SYNC_STAGE = "laps"
+
+def session_jobs(db: Session, states: dict, latest: bool = False, force: bool = False) -> List[SessionJob]:
+    """
+    Sessions of all races in the database that have a FastF1 counterpart and still have to be synced
+    (new or failed before, see sync_state_repository.is_pending). With latest only sessions of the latest meeting.
+    """
+    races = db.query(models.Race)
+    if latest:
+        races = races.filter(models.Race.race_id == sync_state_repository.get_latest_race_id(db))
+
+    jobs = []
+    for race in races.all():
+        sessions = db.query(models.Session).filter(models.Session.race_id == race.race_id).all()
+        for s in sessions:
+            # map OpenF1 name to FastF1 name
+            fastf1_session_name = SESSION_MAPPING.get(s.session_name)
+            if fastf1_session_name and sync_state_repository.is_pending(states, race.race_id, s.session_id, force or latest):
+                jobs.append(SessionJob(race.race_id, race.year, race.race_name.strip(), s.session_id, s.session_name, fastf1_session_name))
+    return jobs
+
+def load_session_laps(job: SessionJob) -> list:
+    """
+    Load one FastF1 session and return (driver_acronym, lap_number, pit_in_time, pit_out_time, track_status) per lap.
+    Runs in a worker process with --workers, doesn't use the database.
+    """
+    print(f"{job.year} -> {job.race_name}: {job.session_name} or {job.fastf1_session_name}")
+
+    # load FastF1 session by year, race name and session name
+    session = fastf1.get_session(job.year, job.race_name, job.fastf1_session_name)
+    session.load()
+    fastf1_laps = session.laps.copy()
+
+    # add only relevant FastF1 columns
+    fastf1_laps["pit_in_time"] = (fastf1_laps["PitInTime"].dt.total_seconds() 
+                                  if "PitInTime" in fastf1_laps 
+                                  else None)
+    fastf1_laps["pit_out_time"] = (fastf1_laps["PitOutTime"].dt.total_seconds() 
+                                   if "PitOutTime" in fastf1_laps 
+                                   else None)
+    fastf1_laps["track_status"] = fastf1_laps.get("TrackStatus", None)
+    fastf1_laps["lap_number"] = fastf1_laps["LapNumber"]
+    fastf1_laps["driver"] = fastf1_laps["Driver"].str.upper()
+
+    fastf1_laps = fastf1_laps[fastf1_laps["lap_number"].notna()]
+
+    return [
+        (lap["driver"], int(lap["lap_number"]), lap["pit_in_time"], lap["pit_out_time"], lap["track_status"])
+        for _, lap in fastf1_laps.iterrows()
+    ]
+
+# record a session that failed to load or save, it's synced again on the next run
+def record_failure(db: Session, job: SessionJob, reason: str):
+    sync_state_repository.record_state(
+        db, SYNC_SOURCE, SYNC_STAGE, job.race_id, job.session_id,
+        status=sync_state_repository.SYNC_FAILED, failure_reason=reason
+    )
+
+def write_session_laps(db: Session, job: SessionJob, records: list, states: dict, force: bool = False):
+    """
+    Update the laps of one session with FastF1 columns, commit and record the session in sync_state.
+    FastF1 laps are matched to database laps with one merge (match_session_laps)
+    and written with one executemany UPDATE by lap_id. Unchanged FastF1 data is not written again.
+    """
+    data_hash = sync_state_repository.content_hash(records)
+    if not force and sync_state_repository.is_unchanged(states, job.race_id, job.session_id, data_hash):
+        print(f"For {job.year} {job.race_name} {job.session_name} — unchanged.")
+        row_count = states[(job.race_id, job.session_id)].row_count
+        sync_state_repository.record_state(db, SYNC_SOURCE, SYNC_STAGE, job.race_id, job.session_id, row_count=row_count, content_hash=data_hash)
+        return
+
+    fastf1_laps = pd.DataFrame(records, columns=["driver", "lap_number", "pit_in_time", "pit_out_time", "track_status"])
+    matched = match_session_laps(db, job.session_id, fastf1_laps)
+
+    try:
+        if not matched.empty:
+            db.execute(update(models.Lap), to_records(matched, ["lap_id", "pit_in_time", "pit_out_time", "track_status"]))
+        db.commit()
+        # pit times are ML features, rebuild them for this session only
+        if not matched.empty:
+            lap_feature_repository.refresh_lap_features(db, [job.session_id])
+        print(f"For {job.year} {job.race_name} {job.session_name} — updated {len(matched)} laps.")
+    except Exception as e:
+        db.rollback()
+        print(f"Error saving {job.session_name}: {e}")
+        record_failure(db, job, str(e))
+        return
+
+    sync_state_repository.record_state(db, SYNC_SOURCE, SYNC_STAGE, job.race_id, job.session_id, row_count=len(matched), content_hash=data_hash)
+
+def sync_laps_from_fastf1(workers: int = 1, latest: bool = False, force: bool = False):
     """
     Fetches and syncs FastF1 data (pit_in_time, pit_out_time, track_status) to the already created table laps.
+    Only sessions that are new or failed before are synced (progress is kept in sync_state, so a crashed run resumes),
+    latest syncs only the latest meeting again, force syncs everything again.
+    With workers > 1 FastF1 sessions are loaded in parallel worker processes,
+    this process is the only database writer and commits once per session.
     """
     db: Session = database.SessionLocal()
 
     try:
-        # load all races from the database
-        races = db.query(models.Race).all()
-
-        for race in races:
-            year = race.year
-            race_name = race.race_name.strip()
-
-            print(f"{year} -> {race_name}")
-
-            # load all sessions for that race
-            sessions = db.query(models.Session).filter(models.Session.race_id == race.race_id).all()
-
-            for s in sessions:
-                session_name = s.session_name
-
-                # map OpenF1 name to FastF1 name
-                fastf1_session_name = SESSION_MAPPING.get(session_name)
-                if not fastf1_session_name:
-                    continue
-
-                print(f"{session_name} or {fastf1_session_name}")
-
-                try:
-                    # load FastF1 session by year, race name and session name
-                    session = fastf1.get_session(year, race_name, fastf1_session_name)
-                    session.load()
-                    fastf1_laps = session.laps.copy()
-
-                    # add only relevant FastF1 columns
-                    fastf1_laps["pit_in_time"] = (fastf1_laps["PitInTime"].dt.total_seconds() 
-                                                  if "PitInTime" in fastf1_laps 
-                                                  else None)
-                    fastf1_laps["pit_out_time"] = (fastf1_laps["PitOutTime"].dt.total_seconds() 
-                                                   if "PitOutTime" in fastf1_laps 
-                                                   else None)
-                    fastf1_laps["track_status"] = fastf1_laps.get("TrackStatus", None)
-                    fastf1_laps["lap_number"] = fastf1_laps["LapNumber"]
-                    fastf1_laps["driver"] = fastf1_laps["Driver"].str.upper()
-
-                    updated_count = 0
-
-                    # iterate through every FastF1 lap and try to find the same one in local database
-                    for _, lap in fastf1_laps.iterrows():
-                        driver_acronym = lap["driver"]
-                        lap_number = int(lap["lap_number"])
-
-                        # join by 'driver_number' because table Laps doesn't have driver_id
-                        db_lap = (
-                            db.query(models.Lap)
-                            .select_from(models.Lap)
-                            .join(models.Driver, models.Lap.driver_number == models.Driver.driver_number)
-                            .filter(
-                                models.Lap.session_id == s.session_id,
-                                models.Driver.name_acronym == driver_acronym,
-                                models.Lap.lap_number == lap_number,
-                            ).first())
-
-                        # if the lap exists update it with new columns
-                        if db_lap:
-                            db_lap.pit_in_time = lap["pit_in_time"]
-                            db_lap.pit_out_time = lap["pit_out_time"]
-                            db_lap.track_status = lap["track_status"]
-                            updated_count += 1
-
-                    db.commit()
-                    print(f"For {session_name} — updated {updated_count} laps.")
-
-                except Exception as e:
-                    print(f"Error loading {session_name}: {e}")
-                    continue
-
+        states = sync_state_repository.get_states(db, SYNC_SOURCE, SYNC_STAGE)
+        run_sessions(
+            session_jobs(db, states, latest, force),
+            load_session_laps,
+            lambda job, records: write_session_laps(db, job, records, states, force),
+            workers,
+            failed=lambda job, reason: record_failure(db, job, reason)
+        )
     finally:
         db.close()
 
 if __name__ == "__main__":
-    sync_laps_from_fastf1()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Sync pit times and track status from FastF1 into laps.")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes loading FastF1 sessions")
+    parser.add_argument("--latest", action="store_true", help="only the latest meeting (for nightly runs)")
+    parser.add_argument("--force", action="store_true", help="sync all sessions again, ignoring sync_state")
+    args = parser.parse_args()
+    sync_laps_from_fastf1(args.workers, args.latest, args.force)
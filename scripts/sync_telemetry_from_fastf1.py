@@ -1,9 +1,17 @@
+import argparse
 import fastf1
+import functools
 import pandas as pd
 from pathlib import Path
-from app import database, models
+from typing import List, Optional
+from app import database, models, telemetry_store
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
+from app.repositories import sync_state_repository
+from scripts.lap_matching import match_session_laps, to_records
+from scripts.session_pool import SessionJob, run_sessions
+from scripts.telemetry_utils import aggregate_session_telemetry
 
 # enable cache directory
 cache_dir = Path("data/fastf1_cache")
@@ -22,210 +30,178 @@ SESSION_MAPPING = {
     "Sprint Qualifying": "Sprint Qualifying" # for 2024 and 2025 season
 }
 
-# aggregate telemetry for one lap
-def aggregate_lap_telemetry(lap_telemetry: pd.DataFrame) -> dict:
+# aggregated metrics stored per lap in the telemetry table
+TELEMETRY_COLUMNS = ["avg_speed", "mean_rpm", "median_gear", "throttle_usage", "brake_usage", "drs_usage"]
+
+# sync_state key of this script (synced per session)
+SYNC_SOURCE = "fastf1"
+SYNC_STAGE = "telemetry"
+
+def session_jobs(db: Session, states: dict, latest: bool = False, force: bool = False) -> List[SessionJob]:
     """
-    Aggregates per-lap telemetry metrics from FastF1 Car Telemetry data:
-    - avg_speed: average speed (km/h)
-    - mean_rpm: average rpm
-    - median_gear: median gear
-    - throttle_usage: % time on throttle > 0.1 - eliminates values that aren't actual acceleration
-    - brake_usage: % time on brake > 0.1 or True 
-    - drs_usage: % time with open DRS == 1 
+    Sessions of all races in the database that have a FastF1 counterpart and still have to be synced
+    (new or failed before, see sync_state_repository.is_pending). With latest only sessions of the latest meeting.
+    Testing events are recorded as skipped in sync_state due to inconsistent FastF1 event mapping,
+    so they aren't tried again on the next runs.
     """
-    # if there's no data for that lap return empty
-    if lap_telemetry is None or lap_telemetry.empty:
-        return {}
-
-    df = lap_telemetry
-
-    total_samples = len(df)
-
-    # if a lap has no telemetry samples, return empty metrics to avoid calculation errors
-    if total_samples == 0:
-        return {}
-
-    # safe access za stupce
-    has_speed = "Speed" in df.columns
-    has_rpm = "RPM" in df.columns
-    has_gear = "nGear" in df.columns
-    has_throttle = "Throttle" in df.columns
-    has_brake = "Brake" in df.columns
-    has_drs = "DRS" in df.columns
-
-    # calculating if brake is used for both boolean and numeric value
-    if has_brake:
-        if df["Brake"].dtype == bool:
-            brake_active = df["Brake"]
-        else:
-            brake_active = df["Brake"] > 0.1
-        brake_usage = float(brake_active.sum() / total_samples)
-    else:
-        brake_usage = None
-
-    throttle_usage = (
-        float((df["Throttle"] > 0.1).sum() / total_samples) if has_throttle else None
-    )        
-
-    drs_usage = (
-        float((df["DRS"] == 1).sum() / total_samples) if has_drs else None
-    )
+    races = db.query(models.Race)
+    if latest:
+        races = races.filter(models.Race.race_id == sync_state_repository.get_latest_race_id(db))
+
+    jobs = []
+    for race in races.all():
+        race_name = race.race_name.strip()
+        sessions = db.query(models.Session).filter(models.Session.race_id == race.race_id).all()
+
+        for s in sessions:
+            # map OpenF1 name to FastF1 name
+            fastf1_session_name = SESSION_MAPPING.get(s.session_name)
+            if not fastf1_session_name or not sync_state_repository.is_pending(states, race.race_id, s.session_id, force or latest):
+                continue
 
-    return {
-        "avg_speed": float(df["Speed"].mean()) if has_speed else None,
-        "mean_rpm": float(df["RPM"].mean()) if has_rpm else None,
-        "median_gear": float(df["nGear"].median()) if has_gear else None,
-        "throttle_usage": throttle_usage,
-        "brake_usage": brake_usage,
-        "drs_usage": drs_usage
-    }
+            # skip if it's a testing event
+            if "Testing" in race_name:
+                print(f"{race.year} | {race_name}: skipping testing event (FastF1 name mismatch).")
+                sync_state_repository.record_state(
+                    db, SYNC_SOURCE, SYNC_STAGE, race.race_id, s.session_id,
+                    status=sync_state_repository.SYNC_SKIPPED, failure_reason="testing event (FastF1 name mismatch)"
+                )
+                continue
+
+            jobs.append(SessionJob(race.race_id, race.year, race_name, s.session_id, s.session_name, fastf1_session_name))
+    return jobs
 
-def sync_telemetry_from_fastf1():
+def load_session_telemetry(job: SessionJob, store_raw: bool = True) -> Optional[list]:
     """
-    Loads all races from the database and for each race loads all sessions.
-    Tries to load the same event from FastF1. 
-    Skips testing events due to inconsistent FastF1 event mapping.
-    For each lap, for each driver:
-    - retrieves lap-level telemetry data
-    - calculates aggregate metrics (aggregate_lap_telemetry)
-    - saves aggregated telemetry data to the Telemetry table in the database (per race_id + session_id + driver_number + lap_number)
-    Skips sessions that fail to load or return missing lap or telemetry data.
+    Load one FastF1 session and return (driver_acronym, lap_number, metrics) for every lap with telemetry.
+    For each driver the car data of the whole session is aggregated for all laps in one pass (aggregate_session_telemetry).
+    With store_raw the raw car data is also saved to the columnar telemetry store (app/telemetry_store.py).
+    Returns None if FastF1 has no laps for the session (it's tried again on the next run).
+    Runs in a worker process with --workers, doesn't use the database.
     """
-    db: Session = database.SessionLocal()
+    print(f"{job.year} | {job.race_name}: {job.session_name} - {job.fastf1_session_name}")
 
-    try:
-        # load all races from the database
-        races = db.query(models.Race).all()
+    # load FastF1 session by year, race name and session name
+    session = fastf1.get_session(job.year, job.race_name, job.fastf1_session_name)
+    session.load()
 
-        for race in races:
-            year = race.year
-            race_name = race.race_name.strip()
+    # skip sessions where FastF1 does not return lap data
+    if session.laps is None or session.laps.empty:
+        print(f"FastF1 returned empty laps for {job.year} {job.race_name} - {job.session_name}/{job.fastf1_session_name}.")
+        return None
 
-            print(f"{year} | {race_name}")
+    fastf1_laps = session.laps.copy()
+    records = []
 
-            # skip if it's a testing event
-            if "Testing" in race_name:
-                print("Skipping testing event (FastF1 name mismatch).")
-                continue
+    for driver_acronym in fastf1_laps["Driver"].unique():
+        driver_acronym = str(driver_acronym).upper()
 
-            # load all sessions for that race
-            sessions = (db.query(models.Session).filter(models.Session.race_id == race.race_id).all())
+        # all laps for that driver
+        driver_laps = fastf1_laps.pick_drivers(driver_acronym)
 
-            for s in sessions:
-                openf1_session_name = s.session_name
+        # aggregate telemetry of all laps from the driver's session car data
+        try:
+            car_data = session.car_data[str(driver_laps["DriverNumber"].iloc[0])]
+        except (KeyError, IndexError):
+            continue
 
-                # map OpenF1 name to FastF1 name
-                fastf1_session_name = SESSION_MAPPING.get(openf1_session_name)
-                if not fastf1_session_name:
-                    continue
+        if store_raw:
+            telemetry_store.write_driver_telemetry(job.session_id, int(driver_laps["DriverNumber"].iloc[0]), car_data, driver_laps)
 
-                print(f"{openf1_session_name} - {fastf1_session_name}")
+        # laps without telemetry samples are left out
+        for lap_number, aggregate in aggregate_session_telemetry(car_data, driver_laps).items():
+            records.append((driver_acronym, lap_number, aggregate))
 
-                # for error logging
-                session_desc = f"{year} {race_name} - {openf1_session_name}/{fastf1_session_name}"
+    return records
 
-                # load existing (driver_number, lap_number) keys for this session once
-                existing_keys = set(
-                    db.query(models.Telemetry.driver_number, models.Telemetry.lap_number)
-                    .filter(models.Telemetry.session_id == s.session_id)
-                    .all()
-                )
+# record a session that failed to load or save, it's synced again on the next run
+def record_failure(db: Session, job: SessionJob, reason: str):
+    sync_state_repository.record_state(
+        db, SYNC_SOURCE, SYNC_STAGE, job.race_id, job.session_id,
+        status=sync_state_repository.SYNC_FAILED, failure_reason=reason
+    )
 
-                try:
-                    # load FastF1 session by year, race name and session name
-                    session = fastf1.get_session(year, race_name, fastf1_session_name)
-                    session.load()
-
-                    if session.laps is None or session.laps.empty:
-                        print("FastF1 returned empty laps.")
-                        continue
-
-                    fastf1_laps = session.laps.copy()
-
-                    # skip sessions where FastF1 does not return lap data
-                    if fastf1_laps.empty:
-                        print("No laps in FastF1 for this session.")
-                        continue
-
-                    for driver_acronym in fastf1_laps["Driver"].unique():
-                        driver_acronym = str(driver_acronym).upper()
-
-                        # all laps for that driver
-                        driver_laps = fastf1_laps.pick_drivers(driver_acronym)
-
-                        # iterate through laps in FastF1 for that driver
-                        for _, lap in driver_laps.iterrows():
-                            if pd.isna(lap.get("LapNumber")):
-                                continue
-                            lap_number = int(lap["LapNumber"]) 
-
-                            # find the correspoding lap in the database
-                            db_lap = (
-                                db.query(models.Lap)
-                                .select_from(models.Lap)
-                                .join(models.Driver, models.Lap.driver_number == models.Driver.driver_number)
-                                .filter(
-                                    models.Lap.session_id == s.session_id,
-                                    models.Driver.name_acronym == driver_acronym,
-                                    models.Lap.lap_number == lap_number                                
-                                ).first())
-
-                            if not db_lap:
-                                continue
-                            
-                            # skip duplicates
-                            key =(db_lap.driver_number, db_lap.lap_number)
-                            if key in existing_keys:
-                                continue
-
-                            # retrieve telemetry at lap level
-                            try:
-                                lap_telemetry = lap.get_car_data()
-                            except Exception:
-                                continue
-
-                            if lap_telemetry is None or lap_telemetry.empty:
-                                continue 
-
-                            # aggregate metrics into a dict
-                            aggregate = aggregate_lap_telemetry(lap_telemetry)
-                            if not aggregate:
-                                continue
-
-                            # create a Telemetry record in the database
-                            telemetry = models.Telemetry(
-                                race_id=db_lap.race_id,
-                                session_id=db_lap.session_id,
-                                lap_number=db_lap.lap_number,
-                                driver_number=db_lap.driver_number,
-
-                                avg_speed=aggregate["avg_speed"],
-                                mean_rpm=aggregate["mean_rpm"],
-                                median_gear=aggregate["median_gear"],
-                                throttle_usage=aggregate["throttle_usage"],
-                                brake_usage=aggregate["brake_usage"],
-                                drs_usage=aggregate["drs_usage"]
-                            )
-
-                            db.add(telemetry)
-
-                            # add key to existing keys
-                            existing_keys.add(key)
-
-                    try:
-                        db.commit()
-                        print("Telemetry synced.")
-                    except IntegrityError:
-                        db.rollback()
-                        print("Skipped duplicates.")
-            
-                except Exception as e:
-                    print(f"Error loading {session_desc}: {e}")
-                    db.rollback()
-                    continue
+def write_session_telemetry(db: Session, job: SessionJob, records: list, states: dict, force: bool = False):
+    """
+    Save aggregated telemetry of one session to the Telemetry table (per race_id + session_id + driver_number + lap_number),
+    commit and record the session in sync_state. FastF1 laps are matched to database laps with one merge (match_session_laps),
+    laps that already have telemetry are dropped and the rest is written with one executemany INSERT.
+    """
+    data_hash = sync_state_repository.content_hash(records)
+    if not force and sync_state_repository.is_unchanged(states, job.race_id, job.session_id, data_hash):
+        print(f"Telemetry unchanged for {job.year} {job.race_name} - {job.session_name}.")
+        row_count = states[(job.race_id, job.session_id)].row_count
+        sync_state_repository.record_state(db, SYNC_SOURCE, SYNC_STAGE, job.race_id, job.session_id, row_count=row_count, content_hash=data_hash)
+        return
+
+    fastf1_laps = pd.DataFrame(
+        [(driver_acronym, lap_number, *(aggregate[name] for name in TELEMETRY_COLUMNS)) for driver_acronym, lap_number, aggregate in records],
+        columns=["driver", "lap_number", *TELEMETRY_COLUMNS]
+    )
+    matched = match_session_laps(db, job.session_id, fastf1_laps)
+    row_count = len(matched)
+
+    # load existing (driver_number, lap_number) keys for this session once and skip duplicates
+    existing_keys = pd.DataFrame(
+        db.query(models.Telemetry.driver_number, models.Telemetry.lap_number)
+        .filter(models.Telemetry.session_id == job.session_id)
+        .all(),
+        columns=["driver_number", "lap_number"]
+    )
+    if not existing_keys.empty and not matched.empty:
+        existing = pd.MultiIndex.from_frame(existing_keys.astype("Int64"))
+        matched = matched[~pd.MultiIndex.from_frame(matched[["driver_number", "lap_number"]]).isin(existing)]
+    matched = matched.drop_duplicates(["driver_number", "lap_number"])
 
+    try:
+        if not matched.empty:
+            db.execute(
+                insert(models.Telemetry),
+                to_records(matched, ["race_id", "session_id", "driver_number", "lap_number", *TELEMETRY_COLUMNS])
+            )
+        db.commit()
+        print(f"Telemetry synced for {job.year} {job.race_name} - {job.session_name} ({len(matched)} laps).")
+    except IntegrityError:
+        db.rollback()
+        print("Skipped duplicates.")
+    except Exception as e:
+        db.rollback()
+        print(f"Error saving {job.year} {job.race_name} - {job.session_name}: {e}")
+        record_failure(db, job, str(e))
+        return
+
+    # row_count = laps with telemetry in the database for this session
+    sync_state_repository.record_state(db, SYNC_SOURCE, SYNC_STAGE, job.race_id, job.session_id, row_count=row_count, content_hash=data_hash)
+
+def sync_telemetry_from_fastf1(workers: int = 1, latest: bool = False, force: bool = False, store_raw: bool = True):
+    """
+    Loads races and their sessions from the database, loads the same sessions from FastF1,
+    aggregates per-lap telemetry and saves it to the Telemetry table.
+    Only sessions that are new or failed before are synced (progress is kept in sync_state, so a crashed run resumes),
+    latest syncs only the latest meeting again, force syncs everything again.
+    With workers > 1 FastF1 sessions are loaded and aggregated in parallel worker processes,
+    this process is the only database writer and commits once per session.
+    Workers also write the raw car data of every driver to the telemetry store (unless store_raw is False).
+    """
+    db: Session = database.SessionLocal()
+
+    try:
+        states = sync_state_repository.get_states(db, SYNC_SOURCE, SYNC_STAGE)
+        run_sessions(
+            session_jobs(db, states, latest, force),
+            functools.partial(load_session_telemetry, store_raw=store_raw),
+            lambda job, records: write_session_telemetry(db, job, records, states, force),
+            workers,
+            failed=lambda job, reason: record_failure(db, job, reason)
+        )
     finally:
         db.close()
 
 if __name__ == "__main__":
-    sync_telemetry_from_fastf1()
+    parser = argparse.ArgumentParser(description="Sync aggregated FastF1 telemetry into the telemetry table.")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes loading FastF1 sessions")
+    parser.add_argument("--latest", action="store_true", help="only the latest meeting (for nightly runs)")
+    parser.add_argument("--force", action="store_true", help="sync all sessions again, ignoring sync_state")
+    parser.add_argument("--no-raw", action="store_true", help="don't save raw car data to the telemetry store")
+    args = parser.parse_args()
+    sync_telemetry_from_fastf1(args.workers, args.latest, args.force, store_raw=not args.no_raw)
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+from typing import Dict
+
+# aggregate telemetry for one lap
+def aggregate_lap_telemetry(lap_telemetry: pd.DataFrame) -> dict:
+    """
+    Aggregates per-lap telemetry metrics from FastF1 Car Telemetry data:
+    - avg_speed: average speed (km/h)
+    - mean_rpm: average rpm
+    - median_gear: median gear
+    - throttle_usage: % time on throttle > 0.1 - eliminates values that aren't actual acceleration
+    - brake_usage: % time on brake > 0.1 or True
+    - drs_usage: % time with open DRS == 1
+    """
+    # if there's no data for that lap return empty
+    if lap_telemetry is None or lap_telemetry.empty:
+        return {}
+
+    df = lap_telemetry
+
+    total_samples = len(df)
+
+    # if a lap has no telemetry samples, return empty metrics to avoid calculation errors
+    if total_samples == 0:
+        return {}
+
+    # safe access za stupce
+    has_speed = "Speed" in df.columns
+    has_rpm = "RPM" in df.columns
+    has_gear = "nGear" in df.columns
+    has_throttle = "Throttle" in df.columns
+    has_brake = "Brake" in df.columns
+    has_drs = "DRS" in df.columns
+
+    # calculating if brake is used for both boolean and numeric value
+    if has_brake:
+        if df["Brake"].dtype == bool:
+            brake_active = df["Brake"]
+        else:
+            brake_active = df["Brake"] > 0.1
+        brake_usage = float(brake_active.sum() / total_samples)
+    else:
+        brake_usage = None
+
+    throttle_usage = (
+        float((df["Throttle"] > 0.1).sum() / total_samples) if has_throttle else None
+    )
+
+    drs_usage = (
+        float((df["DRS"] == 1).sum() / total_samples) if has_drs else None
+    )
+
+    return {
+        "avg_speed": float(df["Speed"].mean()) if has_speed else None,
+        "mean_rpm": float(df["RPM"].mean()) if has_rpm else None,
+        "median_gear": float(df["nGear"].median()) if has_gear else None,
+        "throttle_usage": throttle_usage,
+        "brake_usage": brake_usage,
+        "drs_usage": drs_usage
+    }
+
+def _to_ns(values) -> np.ndarray:
+    """Timedelta column -> int64 nanoseconds (NaT becomes the minimum int64)."""
+    return pd.to_timedelta(values).to_numpy(dtype="timedelta64[ns]").astype(np.int64)
+
+def _segment_means(values: np.ndarray, segment_starts: np.ndarray) -> np.ndarray:
+    """Mean of every segment ignoring NaN (like pandas mean), NaN for segments without values."""
+    valid = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(valid, values, 0.0), segment_starts)
+    counts = np.add.reduceat(valid.astype(np.int64), segment_starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+def _segment_medians(values: np.ndarray, segment_ids: np.ndarray, segments: int) -> np.ndarray:
+    """Median of every segment ignoring NaN (like pandas median), NaN for segments without values."""
+    valid = ~np.isnan(values)
+    values, segment_ids = values[valid], segment_ids[valid]
+    order = np.lexsort((values, segment_ids))
+    values = values[order]
+
+    counts = np.bincount(segment_ids, minlength=segments)
+    starts = np.cumsum(counts) - counts
+    medians = np.full(segments, np.nan)
+    has_values = counts > 0
+    lower = values[(starts + (counts - 1) // 2)[has_values]]
+    upper = values[(starts + counts // 2)[has_values]]
+    medians[has_values] = (lower + upper) / 2
+    return medians
+
+def aggregate_session_telemetry(car_data: pd.DataFrame, laps: pd.DataFrame) -> Dict[int, dict]:
+    """
+    Same metrics as aggregate_lap_telemetry for all laps of one driver in one pass.
+    - car_data: the driver's car data for the whole session (FastF1 session.car_data[driver_number])
+    - laps: the driver's laps with LapNumber, LapStartTime and Time (lap end)
+    Samples are assigned to laps with numpy.searchsorted on SessionTime. Like Lap.get_car_data(),
+    a lap includes samples with LapStartTime <= SessionTime <= Time, so a sample exactly on
+    a boundary belongs to both laps.
+    Returns {lap_number: metrics}; laps without lap number, times or samples are left out.
+    """
+    if car_data is None or car_data.empty or laps is None or laps.empty:
+        return {}
+
+    times = _to_ns(car_data["SessionTime"])
+    order = np.argsort(times, kind="stable")
+    if not np.all(order[:-1] < order[1:]):
+        car_data = car_data.iloc[order]
+        times = times[order]
+
+    laps = laps[laps["LapNumber"].notna() & laps["LapStartTime"].notna() & laps["Time"].notna()]
+    lap_numbers = laps["LapNumber"].to_numpy().astype(np.int64)
+    first = np.searchsorted(times, _to_ns(laps["LapStartTime"]), side="left")
+    end = np.searchsorted(times, _to_ns(laps["Time"]), side="right")
+    sample_counts = np.maximum(end - first, 0)
+
+    # laps without samples get no metrics (aggregate_lap_telemetry returns {} for them)
+    has_samples = sample_counts > 0
+    lap_numbers, first, sample_counts = lap_numbers[has_samples], first[has_samples], sample_counts[has_samples]
+    if len(lap_numbers) == 0:
+        return {}
+
+    # sample indexes of every lap one after another, segment_starts = where each lap begins
+    segment_starts = np.cumsum(sample_counts) - sample_counts
+    segment_ids = np.repeat(np.arange(len(lap_numbers)), sample_counts)
+    sample_index = np.arange(sample_counts.sum()) - segment_starts[segment_ids] + first[segment_ids]
+
+    def column(name: str, dtype=float) -> np.ndarray:
+        return car_data[name].to_numpy(dtype=dtype)[sample_index]
+
+    def fraction(active: np.ndarray) -> np.ndarray:
+        return np.add.reduceat(active.astype(np.int64), segment_starts) / sample_counts
+
+    metrics = {}
+    if "Speed" in car_data.columns:
+        metrics["avg_speed"] = _segment_means(column("Speed"), segment_starts)
+    if "RPM" in car_data.columns:
+        metrics["mean_rpm"] = _segment_means(column("RPM"), segment_starts)
+    if "nGear" in car_data.columns:
+        metrics["median_gear"] = _segment_medians(column("nGear"), segment_ids, len(lap_numbers))
+    if "Throttle" in car_data.columns:
+        metrics["throttle_usage"] = fraction(column("Throttle") > 0.1)
+    if "Brake" in car_data.columns:
+        brake = car_data["Brake"]
+        metrics["brake_usage"] = fraction(column("Brake", bool) if brake.dtype == bool else column("Brake") > 0.1)
+    if "DRS" in car_data.columns:
+        metrics["drs_usage"] = fraction(column("DRS") == 1)
+
+    names = ("avg_speed", "mean_rpm", "median_gear", "throttle_usage", "brake_usage", "drs_usage")
+    return {
+        int(lap_number): {name: float(metrics[name][i]) if name in metrics else None for name in names}
+        for i, lap_number in enumerate(lap_numbers)
+    }
@@ -3,6 +3,7 @@ from fastapi.testclient import TestClient
 from app.main import app
 from app.database import Base, engine, SessionLocal
 from app import models
+from app.routers.drivers import merge_openf1_drivers
 
 # create a new test client
 client = TestClient(app)
@@ -80,3 +81,20 @@ def test_delete_driver():
     data = response.json()
     assert data["detail"] == "Driver 'test_driver' is deleted."
 
+
+# test: OpenF1 rows of the same driver are merged, missing attributes come from other rows
+def test_merge_openf1_drivers():
+    drivers = merge_openf1_drivers([
+        {"full_name": "Patricio O'WARD", "first_name": "Patricio", "driver_number": 29, "team_name": "McLaren", "country_code": None},
+        {"full_name": "Lewis HAMILTON", "driver_number": 44, "name_acronym": "HAM", "team_name": "Mercedes", "country_code": "GBR"},
+        {"full_name": "Patricio  O'Ward ", "last_name": "O'Ward", "driver_number": 29, "name_acronym": "OWA", "team_name": "", "country_code": "MEX"},
+        {"full_name": "Lewis HAMILTON", "driver_number": 44, "team_name": "Ferrari", "country_code": ""},
+        {"full_name": "", "driver_number": 1},
+    ])
+
+    assert [driver.driver_id for driver in drivers] == ["patricio_oward", "lewis_hamilton"]
+    oward, hamilton = drivers
+    assert oward.full_name == "Patricio O'Ward"
+    assert (oward.first_name, oward.last_name, oward.name_acronym) == ("Patricio", "O'Ward", "OWA")
+    assert (oward.team_name, oward.country_code) == ("McLaren", "MEX")
+    assert (hamilton.team_name, hamilton.country_code, hamilton.first_name) == ("Ferrari", "GBR", "")
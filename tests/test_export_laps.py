@@ -0,0 +1,91 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import models
+from app.repositories import lap_repository
+from scripts.export_laps import EXPORT_COLUMNS, clean_laps_dataframe, export_laps_query, write_laps_export
+
+def make_db():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([
+        models.Driver(driver_id="max_verstappen", full_name="Max Verstappen", driver_number=1),
+        models.Driver(driver_id="lando_norris", full_name="Lando Norris", driver_number=4),
+        models.Race(race_id=1229, race_name="Bahrain Grand Prix", location="Sakhir", year=2024),
+        models.Race(race_id=1230, race_name="Saudi Arabian Grand Prix", location="Jeddah", year=2024),
+    ])
+    db.flush()
+    for race_id in (1229, 1230):
+        db.add_all([
+            models.Session(session_id=race_id * 10, race_id=race_id, session_name="Race"),
+            models.Session(session_id=race_id * 10 + 1, race_id=race_id, session_name="Qualifying"),
+        ])
+        for driver_number in (1, 4):
+            db.add_all([
+                models.Stint(race_id=race_id, session_id=race_id * 10, driver_number=driver_number, stint_number=1,
+                             lap_start=1, lap_end=10, tyre_compound="MEDIUM", tyre_age_at_start=None if driver_number == 4 else 3),
+                models.Stint(race_id=race_id, session_id=race_id * 10, driver_number=driver_number, stint_number=2,
+                             lap_start=11, lap_end=20, tyre_compound="UNKNOWN" if driver_number == 4 else "HARD", tyre_age_at_start=0),
+            ])
+            for lap_number in range(1, 21):
+                for session_id in (race_id * 10, race_id * 10 + 1):
+                    db.add(models.Lap(
+                        race_id=race_id, session_id=session_id, driver_number=driver_number, lap_number=lap_number,
+                        lap_duration=200.0 if lap_number == 5 else 90.0 + lap_number / 10,
+                        duration_sector_1=30.0, duration_sector_2=None if lap_number == 7 else 30.0, duration_sector_3=30.0,
+                        track_status="1"
+                    ))
+    db.commit()
+    # done by the stint and lap sync
+    for race_id in (1229, 1230):
+        lap_repository.assign_lap_stints(db, race_id)
+    return db
+
+# the export before chunking: whole join in one DataFrame, then clean_laps_dataframe
+def full_export(db, since_race=None) -> pd.DataFrame:
+    df = pd.DataFrame(export_laps_query(db, since_race).all(), columns=list(EXPORT_COLUMNS))
+    return clean_laps_dataframe(df)
+
+# test: chunked CSV export has the same rows as cleaning the whole join at once
+def test_chunked_csv_export(tmp_path):
+    db = make_db()
+    output_file = tmp_path / "laps.csv"
+    result = write_laps_export(db, str(output_file), chunk_size=7)
+
+    expected = full_export(db)
+    exported = pd.read_csv(output_file)
+    # race laps only, without lap 5 (outlier), lap 7 (missing sector) and UNKNOWN tyres
+    assert result == {"rows": len(expected), "last_race_id": 1230}
+    assert len(exported) == 2 * (18 + 8)
+    assert list(exported.columns) == list(EXPORT_COLUMNS)
+    assert exported["session_name"].unique().tolist() == ["Race"]
+    assert sorted(map(tuple, exported[["race_id", "driver_id", "lap_number"]].values.tolist())) == \
+        sorted(map(tuple, expected[["race_id", "driver_id", "lap_number"]].values.tolist()))
+    # nullable integers stay integers
+    assert exported["tyre_age_at_start"].isna().any()
+    assert not exported["stint_lap_number"].isna().any()
+
+# test: incremental export of later races appended to the CSV
+def test_incremental_csv_export(tmp_path):
+    db = make_db()
+    output_file = tmp_path / "laps.csv"
+    first = pd.DataFrame(full_export(db).query("race_id == 1229"))
+    first.to_csv(output_file, index=False)
+
+    result = write_laps_export(db, str(output_file), chunk_size=5, since_race=1229, append=True)
+    exported = pd.read_csv(output_file)
+    assert result["rows"] == len(full_export(db, since_race=1229))
+    assert exported["race_id"].value_counts().to_dict() == {1229: len(first), 1230: result["rows"]}
+
+# test: Parquet export writes one row group per chunk
+def test_parquet_export(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    db = make_db()
+    output_file = tmp_path / "laps.parquet"
+    result = write_laps_export(db, str(output_file), "parquet", chunk_size=20)
+
+    parquet_file = pq.ParquetFile(output_file)
+    assert parquet_file.metadata.num_rows == result["rows"] == len(full_export(db))
+    assert parquet_file.metadata.num_row_groups > 1
@@ -0,0 +1,150 @@
+import asyncio
+import random
+import threading
+import time
+import httpx
+from fastapi.testclient import TestClient
+from app.jobs import job_runner
+from app.main import app
+from app.openf1_client import OpenF1Client
+from app.repositories import lap_repository
+
+race_id = random.randint(900000, 999999)
+session_key = random.randint(900000, 999999)
+
+LAPS_JSON = [
+    {"session_key": session_key, "driver_number": 44, "lap_number": n, "lap_duration": 90.0 + n}
+    for n in range(1, 4)
+]
+
+# OpenF1 stub that holds every response until `release` is set
+def blocking_openf1(release: threading.Event) -> OpenF1Client:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        while not release.is_set():
+            await asyncio.sleep(0.01)
+        return httpx.Response(200, json=LAPS_JSON)
+    return OpenF1Client(transport=httpx.MockTransport(handler), rate_per_second=1000, burst=1000)
+
+def wait_for_job(client: TestClient, job_id: str, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} didn't finish")
+
+# test: background sync returns 202, identical requests are coalesced, progress and result are reported
+def test_background_sync_job():
+    release = threading.Event()
+    with TestClient(app) as client:
+        shared_client = app.state.openf1_client
+        app.state.openf1_client = blocking_openf1(release)
+        try:
+            response = client.post(f"/laps/sync/{race_id}", params={"background": True})
+            assert response.status_code == 202
+            job = response.json()
+            assert response.headers["location"] == f"/jobs/{job['job_id']}"
+            assert job["key"] == f"laps:{race_id}" and job["status"] in ("queued", "running")
+
+            # same sync while the first one is running -> same job
+            assert client.post(f"/laps/sync/{race_id}", params={"background": True}).json()["job_id"] == job["job_id"]
+            assert client.get(f"/jobs/{job['job_id']}").json()["stage"] == "fetch"
+
+            release.set()
+            job = wait_for_job(client, job["job_id"])
+            assert job["status"] == "succeeded"
+            assert job["result"] == {"created": 3, "updated": 0, "total": 3}
+            assert job["progress"] == {"fetched": 3, "created": 3, "updated": 0}
+            assert set(job["timings"]) == {"fetch", "write"}
+            assert job["finished_at"] is not None
+
+            # a finished job can't be cancelled, a new request starts a new job
+            assert client.post(f"/jobs/{job['job_id']}/cancel").status_code == 409
+            response = client.post(f"/laps/sync/{race_id}", params={"background": True})
+            assert response.json()["job_id"] != job["job_id"]
+            assert wait_for_job(client, response.json()["job_id"])["result"] == {"created": 0, "updated": 3, "total": 3}
+        finally:
+            client.portal.call(app.state.openf1_client.aclose)
+            app.state.openf1_client = shared_client
+
+        laps = client.get("/laps/", params={"session_id": session_key}).json()
+        for lap in laps:
+            assert client.delete(f"/laps/{lap['lap_id']}").status_code == 200
+
+# test: cancelling a running job, unknown jobs are 404
+def test_cancel_job():
+    release = threading.Event()
+    with TestClient(app) as client:
+        shared_client = app.state.openf1_client
+        app.state.openf1_client = blocking_openf1(release)
+        try:
+            job = client.post(f"/stints/sync/{race_id}", params={"background": True}).json()
+            response = client.post(f"/jobs/{job['job_id']}/cancel")
+            assert response.status_code == 200
+            assert response.json()["status"] == "cancelled"
+            assert client.get(f"/jobs/{job['job_id']}").json()["status"] == "cancelled"
+        finally:
+            release.set()
+            client.portal.call(app.state.openf1_client.aclose)
+            app.state.openf1_client = shared_client
+
+        assert client.get("/jobs/unknown").status_code == 404
+
+# test: jobs still running on app shutdown are cancelled before the OpenF1 client and engines are closed
+def test_shutdown_cancels_jobs():
+    # shared client of the app when the job is cancelled: closed or still open
+    client_closed_on_cancel = []
+    started = threading.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            client_closed_on_cancel.append(shared_client._client.is_closed)
+            raise
+        return httpx.Response(200, json=LAPS_JSON)
+
+    blocking_client = OpenF1Client(transport=httpx.MockTransport(handler), rate_per_second=1000, burst=1000)
+    with TestClient(app) as client:
+        shared_client = app.state.openf1_client
+        app.state.openf1_client = blocking_client
+        job = client.post(f"/laps/sync/{race_id}", params={"background": True}).json()
+        assert started.wait(5)
+    asyncio.run(blocking_client.aclose())
+
+    assert job_runner.get(job["job_id"]).status == "cancelled"
+    assert client_closed_on_cancel == [False]
+
+# test: a GET is answered while a background stint sync is inside the whole race stint / lap_features refresh
+def test_background_refresh_does_not_block_requests(monkeypatch):
+    inside, release = threading.Event(), threading.Event()
+    assign_lap_stints = lap_repository.assign_lap_stints
+    def slow_assign_lap_stints(db, race_id):
+        inside.set()
+        assert release.wait(5)
+        return assign_lap_stints(db, race_id)
+    monkeypatch.setattr(lap_repository, "assign_lap_stints", slow_assign_lap_stints)
+
+    stints_json = [{"session_key": session_key, "driver_number": 44, "stint_number": 1, "lap_start": 1, "lap_end": 3, "compound": "SOFT"}]
+    stints_client = OpenF1Client(transport=httpx.MockTransport(lambda request: httpx.Response(200, json=stints_json)), rate_per_second=1000, burst=1000)
+    with TestClient(app) as client:
+        shared_client = app.state.openf1_client
+        app.state.openf1_client = stints_client
+        try:
+            job = client.post(f"/stints/sync/{race_id}", params={"background": True}).json()
+            assert inside.wait(5)
+            start = time.monotonic()
+            assert client.get("/races/").status_code == 200
+            assert time.monotonic() - start < 2
+            assert client.get(f"/jobs/{job['job_id']}").json()["status"] == "running"
+            release.set()
+            assert wait_for_job(client, job["job_id"])["status"] == "succeeded"
+        finally:
+            release.set()
+            client.portal.call(stints_client.aclose)
+            app.state.openf1_client = shared_client
+
+        for stint in client.get("/stints/", params={"session_id": session_key}).json():
+            assert client.delete(f"/stints/{stint['stint_id']}").status_code == 200
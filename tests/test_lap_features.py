@@ -0,0 +1,121 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import database, models
+from app.database import SessionLocal
+from app.main import app
+from app.repositories import lap_feature_repository
+from ml import utils
+from tests.test_export_laps import full_export, make_db
+
+KEY = ["race_id", "driver_id", "lap_number"]
+
+def keys(df) -> list:
+    return sorted(map(tuple, df[KEY].values.tolist()))
+
+# test: lap_features has the same rows and values as the full export
+def test_refresh_lap_features():
+    db = make_db()
+    assert lap_feature_repository.refresh_race_lap_features(db, 1229) == 18 + 8
+    assert lap_feature_repository.refresh_race_lap_features(db, 1230) == 18 + 8
+
+    features = lap_feature_repository.load_lap_features(db)
+    expected = full_export(db)
+    assert list(features.columns) == list(lap_feature_repository.LAP_FEATURE_COLUMNS)
+    assert keys(features) == keys(expected)
+    merged = features.merge(expected, on=KEY, suffixes=("", "_expected"))
+    assert (merged["lap_duration"] == merged["lap_duration_expected"]).all()
+    assert (merged["stint_lap_number"] == merged["stint_lap_number_expected"]).all()
+    assert features["tyre_age_at_start"].isna().any()
+
+    assert keys(lap_feature_repository.load_lap_features(db, "Race")) == keys(expected)
+    assert lap_feature_repository.load_lap_features(db, "Qualifying").empty
+
+# test: refreshing one session rewrites only its rows
+def test_refresh_one_session():
+    db = make_db()
+    for race_id in (1229, 1230):
+        lap_feature_repository.refresh_race_lap_features(db, race_id)
+
+    # lap 3 of driver 1 becomes an outlier in both races, only race 1230 is refreshed
+    db.query(models.Lap).filter_by(driver_number=1, lap_number=3).update({"lap_duration": 190.0})
+    db.commit()
+    assert lap_feature_repository.refresh_lap_features(db, [12300]) == 18 + 8 - 1
+
+    counts = lap_feature_repository.load_lap_features(db)["race_id"].value_counts().to_dict()
+    assert counts == {1229: 18 + 8, 1230: 18 + 8 - 1}
+    assert lap_feature_repository.refresh_lap_features(db, []) == 0
+
+# test: laps and stints written through the API update lap_features, a deleted lap leaves no row
+def test_crud_refreshes_lap_features(monkeypatch):
+    # single row writes never rebuild a whole session
+    def whole_session(*args):
+        raise AssertionError("refresh_lap_features called for a single row write")
+    monkeypatch.setattr(lap_feature_repository, "refresh_lap_features", whole_session)
+    client = TestClient(app)
+    db = SessionLocal()
+    race_id, session_id, driver_number = 9991, 99910, 991
+    for model, key in ((models.LapFeature, "race_id"), (models.Lap, "race_id"), (models.Stint, "race_id"), (models.Race, "race_id")):
+        db.query(model).filter(getattr(model, key) == race_id).delete()
+    db.query(models.Session).filter_by(session_id=session_id).delete()
+    db.query(models.Driver).filter_by(driver_number=driver_number).delete()
+    db.add_all([
+        models.Race(race_id=race_id, race_name="Test Grand Prix", location="Test", year=2024),
+        models.Session(session_id=session_id, race_id=race_id, session_name="Race"),
+        models.Driver(driver_id="test_driver_features", full_name="Test Features Driver", driver_number=driver_number),
+    ])
+    db.commit()
+
+    def feature_laps() -> dict:
+        rows = db.query(models.LapFeature).filter_by(session_id=session_id).all()
+        return {row.lap_number: (row.tyre_compound, row.lap_duration) for row in rows}
+
+    keys = {"race_id": race_id, "session_id": session_id, "driver_number": driver_number}
+    sectors = {"duration_sector_1": 30.0, "duration_sector_2": 30.0, "duration_sector_3": 35.0}
+    stint = client.post("/stints/", json={**keys, "stint_number": 1, "lap_start": 1, "lap_end": 3, "tyre_compound": "SOFT"}).json()
+    lap_ids = [client.post("/laps/", json={**keys, "lap_number": lap_number, "lap_duration": 95.0, **sectors}).json()["lap_id"] for lap_number in (1, 2, 3)]
+    assert feature_laps() == {1: ("SOFT", 95.0), 2: ("SOFT", 95.0), 3: ("SOFT", 95.0)}
+
+    client.put(f"/laps/{lap_ids[0]}", json={"lap_duration": 96.5})
+    client.put(f"/stints/{stint['stint_id']}", json={"tyre_compound": "MEDIUM"})
+    assert feature_laps() == {1: ("MEDIUM", 96.5), 2: ("MEDIUM", 95.0), 3: ("MEDIUM", 95.0)}
+
+    assert client.delete(f"/laps/{lap_ids[1]}").status_code == 200
+    assert db.query(models.LapFeature).filter_by(lap_id=lap_ids[1]).count() == 0
+    assert client.delete(f"/stints/{stint['stint_id']}").status_code == 200
+    assert feature_laps() == {}
+    db.close()
+
+# test: rebuilding the rows of some laps gives the same rows as rebuilding their session
+def test_refresh_lap_feature_rows():
+    db = make_db()
+    lap_feature_repository.refresh_race_lap_features(db, 1229)
+    expected = lap_feature_repository.load_lap_features(db)
+
+    db.query(models.LapFeature).filter(models.LapFeature.lap_number <= 3).delete()
+    lap_ids = [lap.lap_id for lap in db.query(models.Lap).filter(models.Lap.race_id == 1229, models.Lap.lap_number <= 3)]
+    assert lap_feature_repository.refresh_lap_feature_rows(db, lap_ids) == 2 * 3
+    db.commit()
+    assert keys(lap_feature_repository.load_lap_features(db)) == keys(expected)
+
+# test: a lap whose lap_features row can't be written is not saved (same transaction)
+def test_lap_write_is_one_transaction(monkeypatch):
+    def failing_rows(db, lap_ids):
+        raise RuntimeError("lap_features is locked")
+    monkeypatch.setattr(lap_feature_repository, "refresh_lap_feature_rows", failing_rows)
+    client = TestClient(app, raise_server_exceptions=False)
+    lap = {"race_id": 9992, "session_id": 99920, "driver_number": 992, "lap_number": 1, "lap_duration": 95.0}
+    assert client.post("/laps/", json=lap).status_code == 500
+
+    db = SessionLocal()
+    assert db.query(models.Lap).filter_by(session_id=99920).count() == 0
+    db.close()
+
+# test: training on a database without table lap_features tells how to build it
+def test_load_dataset_without_table(monkeypatch):
+    engine = create_engine("sqlite://")
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=engine))
+    with pytest.raises(RuntimeError, match="scripts.build_lap_features"):
+        utils.load_dataset(session_name="Race")
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+from app import models
+from scripts.lap_matching import match_session_laps, to_records
+
+def make_db():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([
+        models.Driver(driver_id="max_verstappen", full_name="Max Verstappen", driver_number=1, name_acronym="VER"),
+        models.Driver(driver_id="lando_norris", full_name="Lando Norris", driver_number=4, name_acronym="NOR"),
+        models.Race(race_id=1, race_name="Bahrain Grand Prix", year=2024),
+        models.Session(session_id=10, race_id=1, session_name="Race"),
+        models.Session(session_id=11, race_id=1, session_name="Qualifying"),
+    ])
+    db.flush()
+    db.add_all([
+        models.Lap(race_id=1, session_id=10, driver_number=1, lap_number=1),
+        models.Lap(race_id=1, session_id=10, driver_number=1, lap_number=2),
+        models.Lap(race_id=1, session_id=10, driver_number=4, lap_number=1),
+        models.Lap(race_id=1, session_id=11, driver_number=1, lap_number=3),
+    ])
+    db.commit()
+    return db
+
+# test: FastF1 laps are matched by acronym -> driver_number and lap_number within one session
+def test_match_session_laps_and_bulk_update():
+    db = make_db()
+    fastf1_laps = pd.DataFrame({
+        "driver": ["VER", "VER", "NOR", "VER", "HAM"],
+        "lap_number": [1, 2, 1, 3, 1],
+        "pit_in_time": [np.nan, 1500.5, np.nan, 10.0, 20.0],
+        "pit_out_time": [60.25, np.nan, np.nan, 10.0, 20.0],
+        "track_status": ["1", "12", None, "1", "1"],
+    })
+
+    matched = match_session_laps(db, 10, fastf1_laps)
+    assert list(zip(matched["driver_number"], matched["lap_number"])) == [(1, 1), (1, 2), (4, 1)]
+    assert set(matched["session_id"]) == {10}
+
+    records = to_records(matched, ["lap_id", "pit_in_time", "pit_out_time", "track_status"])
+    assert records[0]["pit_in_time"] is None and records[2]["track_status"] is None
+    db.execute(update(models.Lap), records)
+    db.commit()
+
+    laps = {(lap.session_id, lap.driver_number, lap.lap_number): lap for lap in db.query(models.Lap).all()}
+    assert laps[(10, 1, 1)].pit_out_time == 60.25 and laps[(10, 1, 1)].pit_in_time is None
+    assert laps[(10, 1, 2)].pit_in_time == 1500.5 and laps[(10, 1, 2)].track_status == "12"
+    assert laps[(11, 1, 3)].pit_in_time is None
+    db.close()
+
+# test: no FastF1 laps -> empty result
+def test_match_session_laps_empty():
+    db = make_db()
+    matched = match_session_laps(db, 10, pd.DataFrame(columns=["driver", "lap_number"]))
+    assert matched.empty
+    db.close()
@@ -0,0 +1,135 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from app import models
+from app.database import SessionLocal
+from app.main import app
+from app.migrations import add_lap_stint_columns
+from app.repositories import lap_feature_repository, lap_repository
+
+def make_db():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([
+        models.Race(race_id=1229, race_name="Bahrain Grand Prix", location="Sakhir", year=2024),
+        models.Session(session_id=9472, race_id=1229, session_name="Race"),
+    ])
+    db.flush()
+    for driver_number in (1, 4):
+        # driver 4 has no stint after lap 12
+        db.add_all([
+            models.Stint(race_id=1229, session_id=9472, driver_number=driver_number, stint_number=1, lap_start=1, lap_end=8),
+            models.Stint(race_id=1229, session_id=9472, driver_number=driver_number, stint_number=2,
+                         lap_start=9, lap_end=15 if driver_number == 1 else 12),
+        ])
+        db.add_all([
+            models.Lap(race_id=1229, session_id=9472, driver_number=driver_number, lap_number=lap_number, lap_duration=95.0)
+            for lap_number in range(1, 16)
+        ])
+    db.commit()
+    return db
+
+def assignments(db) -> dict:
+    rows = db.execute(
+        select(models.Lap.driver_number, models.Lap.lap_number, models.Stint.stint_number, models.Lap.stint_lap_number)
+        .outerjoin(models.Stint, models.Lap.stint_id == models.Stint.stint_id)
+    ).all()
+    return {(driver_number, lap_number): (stint_number, stint_lap_number) for driver_number, lap_number, stint_number, stint_lap_number in rows}
+
+# test: every lap gets the stint containing it, laps outside all stints get NULL
+def test_assign_lap_stints():
+    db = make_db()
+    assert lap_repository.assign_lap_stints(db, 1229) == 2 * 15 - 3
+
+    result = assignments(db)
+    assert result[(1, 1)] == (1, 1)
+    assert result[(1, 8)] == (1, 8)
+    assert result[(1, 9)] == (2, 1)
+    assert result[(1, 15)] == (2, 7)
+    assert result[(4, 12)] == (2, 4)
+    assert result[(4, 13)] == (None, None)
+    # nothing changed, nothing written
+    assert lap_repository.assign_lap_stints(db, 1229) == 0
+
+    # stint 2 of driver 4 updated by a later sync: only the new laps are written
+    db.query(models.Stint).filter_by(driver_number=4, stint_number=2).update({"lap_end": 15})
+    db.commit()
+    assert lap_repository.assign_lap_stints(db, 1229) == 3
+    assert assignments(db)[(4, 15)] == (2, 7)
+
+# test: the migration backfill assigns the same stints as assign_lap_stints
+def test_migration_backfill():
+    db = make_db()
+    with db.get_bind().begin() as conn:
+        add_lap_stint_columns(conn)
+    backfilled = assignments(db)
+
+    db.query(models.Lap).update({"stint_id": None, "stint_lap_number": None})
+    db.commit()
+    lap_repository.assign_lap_stints(db, 1229)
+    assert assignments(db) == backfilled
+
+# test: the single lap lookup and the per driver assignment follow the same rule as assign_lap_stints
+def test_targeted_assignment():
+    db = make_db()
+    lap_repository.assign_lap_stints(db, 1229)
+    expected = assignments(db)
+    stints = {stint.stint_id: stint.stint_number for stint in db.query(models.Stint)}
+    for (driver_number, lap_number), (stint_number, stint_lap_number) in expected.items():
+        stint_id, found_lap_number = lap_repository.find_lap_stint(db, 9472, driver_number, lap_number)
+        assert (stints.get(stint_id), found_lap_number) == (stint_number, stint_lap_number)
+
+    db.query(models.Lap).update({"stint_id": None, "stint_lap_number": None})
+    for driver_number in (1, 4):
+        lap_ids = lap_repository.assign_driver_lap_stints(db, 9472, driver_number, 1, 15)
+        assert len(lap_ids) == 15
+    db.commit()
+    assert assignments(db) == expected
+
+# test: laps and stints written through the API are assigned and exported without a stint sync
+def test_crud_keeps_lap_stints(monkeypatch):
+    # single row writes never reassign the whole race
+    def whole_race(*args):
+        raise AssertionError("assign_lap_stints called for a single row write")
+    monkeypatch.setattr(lap_repository, "assign_lap_stints", whole_race)
+    client = TestClient(app)
+    db = SessionLocal()
+    race_id, session_id, driver_number = 9990, 99900, 990
+    db.query(models.Lap).filter_by(race_id=race_id).delete()
+    db.query(models.Stint).filter_by(race_id=race_id).delete()
+    db.query(models.Session).filter_by(session_id=session_id).delete()
+    db.query(models.Race).filter_by(race_id=race_id).delete()
+    db.query(models.Driver).filter_by(driver_number=driver_number).delete()
+    db.add_all([
+        models.Race(race_id=race_id, race_name="Test Grand Prix", location="Test", year=2024),
+        models.Session(session_id=session_id, race_id=race_id, session_name="Race"),
+        models.Driver(driver_id="test_driver_stints", full_name="Test Stints Driver", driver_number=driver_number),
+    ])
+    db.commit()
+
+    def exported() -> dict:
+        db.expire_all()
+        rows = lap_feature_repository.lap_features_query(db, session_ids=[session_id]).all()
+        return {row.lap_number: (row.stint_number, row.stint_lap_number) for row in rows}
+
+    keys = {"race_id": race_id, "session_id": session_id, "driver_number": driver_number}
+    stint = client.post("/stints/", json={**keys, "stint_number": 1, "lap_start": 1, "lap_end": 3, "tyre_compound": "SOFT"}).json()
+    for lap_number in (1, 2, 3):
+        response = client.post("/laps/", json={**keys, "lap_number": lap_number, "lap_duration": 95.0})
+        assert response.status_code == 201
+    assert response.json()["stint_id"] == stint["stint_id"]
+    assert exported() == {1: (1, 1), 2: (1, 2), 3: (1, 3)}
+
+    # shorter stint: lap 3 leaves the dataset, a new stint takes it
+    assert client.put(f"/stints/{stint['stint_id']}", json={"lap_end": 2}).status_code == 200
+    assert exported() == {1: (1, 1), 2: (1, 2)}
+    client.post("/stints/", json={**keys, "stint_number": 2, "lap_start": 3, "lap_end": 10, "tyre_compound": "HARD"})
+    assert exported() == {1: (1, 1), 2: (1, 2), 3: (2, 1)}
+
+    # deleted stint leaves no dangling stint_id
+    assert client.delete(f"/stints/{stint['stint_id']}").status_code == 200
+    db.expire_all()
+    assert db.query(models.Lap).filter_by(race_id=race_id, stint_id=stint["stint_id"]).count() == 0
+    assert exported() == {3: (2, 1)}
+    db.close()
@@ -1,8 +1,17 @@
 import pytest
 from fastapi.testclient import TestClient
+from fastapi import HTTPException
+from app import database, jobs
+from app.models import Lap
 from app.main import app
+from app.routers.laps import LAP_SYNC_BATCH_SIZE, sync_laps
 from app.database import Base, engine, SessionLocal
+from app.openf1_client import OpenF1Client, get_openf1_client
+from app.repositories import bulk_repository
+import asyncio
 import random
+import json
+import httpx
 
 # create a new test client
 client = TestClient(app)
@@ -63,6 +72,53 @@ def test_get_all_laps():
     assert isinstance(data, list)
     assert len(data) > 0
 
+# test: get laps page by page with filters
+def test_get_laps_paginated():
+    for lap_number in range(2, 6):
+        response = client.post("/laps/", json={
+            "race_id": 12345,
+            "session_id": 56789,
+            "driver_number": random_driver_number,
+            "lap_number": lap_number,
+            "lap_duration": 90.000 + lap_number
+        })
+        assert response.status_code == 201
+
+    params = {"driver_number": random_driver_number, "lap_number_min": 2, "limit": 3}
+    response = client.get("/laps/", params=params)
+    # checking if it's code HTTP 200 OK
+    assert response.status_code == 200
+    first_page = response.json()
+    assert [lap["lap_number"] for lap in first_page] == [2, 3, 4]
+    next_cursor = response.headers["X-Next-Cursor"]
+    assert next_cursor == str(first_page[-1]["lap_id"])
+
+    response = client.get("/laps/", params={**params, "cursor": next_cursor})
+    assert response.status_code == 200
+    second_page = response.json()
+    assert [lap["lap_number"] for lap in second_page] == [5]
+    assert "X-Next-Cursor" not in response.headers
+
+# test: stream laps as NDJSON and CSV
+def test_stream_laps():
+    response = client.get("/laps/", params={"driver_number": random_driver_number, "format": "ndjson"})
+    # checking if it's code HTTP 200 OK
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["lap_number"] for row in rows] == [1, 2, 3, 4, 5]
+
+    response = client.get("/laps/", params={"driver_number": random_driver_number}, headers={"Accept": "text/csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.splitlines()
+    assert lines[0].startswith("lap_id,race_id,session_id,driver_number,lap_number")
+    assert len(lines) == 6
+
+    # remove laps created for pagination and streaming tests
+    for row in rows[1:]:
+        assert client.delete(f"/laps/{row['lap_id']}").status_code == 200
+
 # test: get lap by lap id
 def test_get_lap_by_lap_id():
     assert created_lap_id is not None
@@ -93,4 +149,136 @@ def test_delete_lap():
     # checking if it's code HTTP 200 OK
     assert response.status_code == 200
     data = response.json()
-    assert data["detail"] == f"Lap '{created_lap_id}' is deleted."
\ No newline at end of file
+    assert data["detail"] == f"Lap '{created_lap_id}' is deleted."
+
+# test: sync laps from OpenF1 (mocked response), second sync updates the same laps
+def test_sync_laps():
+    laps_json = [
+        {"session_key": 56790, "driver_number": random_driver_number, "lap_number": n, "lap_duration": 80.0 + n}
+        for n in range(1, 4)
+    ]
+
+    async def override_get_openf1_client():
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json=laps_json))
+        async with OpenF1Client(transport=transport) as openf1:
+            yield openf1
+
+    app.dependency_overrides[get_openf1_client] = override_get_openf1_client
+    try:
+        response = client.post("/laps/sync/12345")
+        # checking if it's code HTTP 200 OK
+        assert response.status_code == 200
+        assert response.json() == {"created": 3, "updated": 0, "total": 3}
+
+        laps_json[0]["lap_duration"] = 70.0
+        response = client.post("/laps/sync/12345")
+        assert response.json() == {"created": 0, "updated": 3, "total": 3}
+    finally:
+        app.dependency_overrides.pop(get_openf1_client)
+
+    laps = client.get("/laps/", params={"session_id": 56790, "driver_number": random_driver_number}).json()
+    assert [lap["lap_duration"] for lap in laps] == [70.0, 82.0, 83.0]
+
+    for lap in laps:
+        assert client.delete(f"/laps/{lap['lap_id']}").status_code == 200
+
+# test: an invalid response body is a 502, laps that don't fit the lap schema are a separate error,
+# a failed write closes the streamed response
+def test_sync_laps_errors(monkeypatch):
+    closed = []
+
+    class TrackedStream(httpx.AsyncByteStream):
+        def __init__(self, body: bytes):
+            self.body = body
+
+        async def __aiter__(self):
+            for start in range(0, len(self.body), 1024):
+                yield self.body[start:start + 1024]
+
+        async def aclose(self):
+            closed.append(True)
+
+    bodies = {}
+    async def override_get_openf1_client():
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, stream=TrackedStream(bodies["body"])))
+        async with OpenF1Client(transport=transport) as openf1:
+            yield openf1
+
+    app.dependency_overrides[get_openf1_client] = override_get_openf1_client
+    try:
+        bodies["body"] = b'[{"session_key": 56790, "lap_number": 1}, {oops'
+        response = client.post("/laps/sync/12345")
+        assert response.status_code == 502
+
+        bodies["body"] = json.dumps([{"driver_number": random_driver_number, "lap_number": 1}]).encode()
+        response = client.post("/laps/sync/12345")
+        assert response.status_code == 500
+        assert "lap schema" in response.json()["detail"]
+    finally:
+        app.dependency_overrides.pop(get_openf1_client)
+
+    async def failing_upsert(*args, **kwargs):
+        raise RuntimeError("database is locked")
+    monkeypatch.setattr(bulk_repository, "upsert_laps_async", failing_upsert)
+    # more laps than one write batch, the response is still being read when the write fails
+    laps_json = [{"session_key": 56790, "driver_number": random_driver_number, "lap_number": n} for n in range(1, 2 * LAP_SYNC_BATCH_SIZE)]
+    bodies["body"] = json.dumps(laps_json).encode()
+    closed.clear()
+
+    async def run_sync_laps():
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, stream=TrackedStream(bodies["body"])))
+        async with OpenF1Client(transport=transport) as openf1, database.AsyncSessionLocal() as db:
+            # generators are kept referenced, so only sync_laps itself can close them (not garbage collection)
+            generators = []
+            iter_json_batches = openf1.iter_json_batches
+            def kept_iter_json_batches(*args, **kwargs):
+                generators.append(iter_json_batches(*args, **kwargs))
+                return generators[-1]
+            openf1.iter_json_batches = kept_iter_json_batches
+            with pytest.raises(RuntimeError):
+                await sync_laps(db, openf1, 12345)
+            assert closed
+
+    asyncio.run(run_sync_laps())
+
+# test: streamed laps are upserted batch by batch in a worker thread with the right created/updated counts,
+# batches written before a broken part of the response stay in the database
+def test_sync_laps_streamed_batches():
+    def laps_json(lap_numbers):
+        return [{"session_key": 56791, "driver_number": random_driver_number, "lap_number": n, "lap_duration": 80.0} for n in lap_numbers]
+
+    def saved_lap_numbers():
+        db = SessionLocal()
+        try:
+            return sorted(lap.lap_number for lap in db.query(Lap).filter(Lap.session_id == 56791, Lap.driver_number == random_driver_number))
+        finally:
+            db.close()
+
+    async def run_sync_laps(body: bytes, job=None):
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body))
+        async with OpenF1Client(transport=transport) as openf1, database.AsyncSessionLocal() as db:
+            return await sync_laps(db, openf1, 12345, job)
+
+    laps = 2 * LAP_SYNC_BATCH_SIZE + 10
+    assert asyncio.run(run_sync_laps(json.dumps(laps_json(range(1, 11))).encode())) == {"created": 10, "updated": 0, "total": 10}
+
+    job = jobs.Job("laps:12345")
+    result = asyncio.run(run_sync_laps(json.dumps(laps_json(range(1, laps + 1))).encode(), job))
+    assert result == {"created": laps - 10, "updated": 10, "total": laps}
+    assert job.progress == {"fetched": laps, "created": laps - 10, "updated": 10}
+    assert saved_lap_numbers() == list(range(1, laps + 1))
+
+    # the response breaks after the first batch: 502, the first batch is written, the rest isn't
+    with SessionLocal() as db:
+        db.query(Lap).filter(Lap.session_id == 56791, Lap.driver_number == random_driver_number).delete()
+        db.commit()
+    body = json.dumps(laps_json(range(1, laps + 1))).encode()
+    cut = body.index(b'{"session_key"', body.index(f'"lap_number": {LAP_SYNC_BATCH_SIZE + 5},'.encode()))
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(run_sync_laps(body[:cut] + b'{oops'))
+    assert error.value.status_code == 502
+    assert saved_lap_numbers() == list(range(1, LAP_SYNC_BATCH_SIZE + 1))
+
+    with SessionLocal() as db:
+        db.query(Lap).filter(Lap.session_id == 56791, Lap.driver_number == random_driver_number).delete()
+        db.commit()
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from ml import utils
+from ml.mapped_forest import MappedForestRegressor, map_forest
+from ml.race_pace_random_forest import build_pipeline, prepare_data
+from tests.test_predict import make_dataset
+
+# test: mapped forest predicts the same values as the sklearn forest, also for missing values
+def test_mapped_forest_predict():
+    rng = np.random.default_rng(0)
+    X = rng.random((500, 6))
+    y = X[:, 0] * 3 + np.sin(X[:, 1] * 6) + rng.random(500) * 0.1
+    X[rng.random(X.shape) < 0.05] = np.nan
+    forest = RandomForestRegressor(n_estimators=25, random_state=0).fit(X, y)
+    mapped = map_forest(forest)
+
+    assert isinstance(mapped, MappedForestRegressor)
+    X_test = rng.random((300, 6))
+    X_test[rng.random(X_test.shape) < 0.1] = np.nan
+    assert np.allclose(mapped.predict(X_test), forest.predict(X_test), rtol=0, atol=1e-9)
+    assert np.allclose(mapped.predict(X_test[:1]), forest.predict(X_test[:1]), rtol=0, atol=1e-9)
+    # leaves of every tree match sklearn (apply returns leaves in the flat arrays, shifted by the tree root)
+    assert np.array_equal(mapped.apply(X_test) - mapped.roots, forest.apply(X_test))
+    with pytest.raises(TypeError):
+        mapped.fit(X, y)
+
+# test: saved pipelines are loaded with memory-mapped tree arrays, other models are saved unchanged
+def test_save_and_load_mapped_model(tmp_path):
+    X, y, num_attribs, cat_attribs = prepare_data(make_dataset())
+    model = build_pipeline(num_attribs, cat_attribs).fit(X, y.values.ravel())
+    utils.save_model(model, "race_pace_test", tmp_path)
+
+    loaded = utils.load_model("race_pace_test", tmp_path)
+    regressor = loaded.named_steps["regressor"]
+    assert isinstance(regressor, MappedForestRegressor)
+    assert isinstance(regressor.children, np.memmap)
+    assert np.allclose(loaded.predict(X), model.predict(X), rtol=0, atol=1e-9)
+    # the trained model keeps its sklearn forest
+    assert isinstance(model.named_steps["regressor"], RandomForestRegressor)
+
+    utils.save_model(model, "race_pace_unmapped", tmp_path, mapped=False)
+    assert isinstance(utils.load_model("race_pace_unmapped", tmp_path).named_steps["regressor"], RandomForestRegressor)
+    assert isinstance(map_forest(LinearRegression()), LinearRegression)
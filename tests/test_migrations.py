@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from app import main, migrations, models
+
+# database at schema version 1 (before the unique indexes) with duplicate laps and laps without lap_number
+def make_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrate.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for _, _, index_name, _ in migrations.NATURAL_KEYS:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {index_name}")
+        conn.exec_driver_sql("PRAGMA user_version = 1")
+    db = sessionmaker(bind=engine)()
+    db.add_all([
+        models.Lap(race_id=1229, session_id=9472, driver_number=1, lap_number=1, lap_duration=95.0),
+        models.Lap(race_id=1229, session_id=9472, driver_number=1, lap_number=1, lap_duration=96.0),
+        models.Lap(race_id=1229, session_id=9472, driver_number=1, lap_number=2, lap_duration=95.0),
+        models.Lap(race_id=1229, session_id=9472, driver_number=1, lap_number=None),
+        models.Lap(race_id=1229, session_id=9472, driver_number=1, lap_number=None),
+    ])
+    db.commit()
+    db.close()
+    return engine
+
+def lap_count(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(models.Lap)).scalar()
+
+# test: duplicate keys stop the migration without deleting rows
+def test_duplicate_keys_stop_migration(tmp_path):
+    engine = make_engine(tmp_path)
+    with pytest.raises(migrations.DuplicateKeysError, match=r"laps has 1 duplicate keys .*\(9472, 1, 1\) x2"):
+        migrations.upgrade(engine)
+    assert lap_count(engine) == 5
+    with engine.connect() as conn:
+        assert migrations.get_schema_version(conn) == 1
+    engine.dispose()
+
+# test: remove_duplicate_keys keeps the first row and rows with a NULL key, then the migration is applied
+def test_remove_duplicate_keys(tmp_path):
+    engine = make_engine(tmp_path)
+    assert migrations.remove_duplicate_keys(engine) == {"laps": 1, "stints": 0, "telemetry": 0}
+    assert migrations.upgrade(engine) == len(migrations.MIGRATIONS)
+    with engine.connect() as conn:
+        durations = conn.execute(select(models.Lap.lap_duration).where(models.Lap.lap_number == 1)).scalars().all()
+    assert durations == [95.0]
+    assert lap_count(engine) == 4
+    engine.dispose()
+
+# ASGI lifespan startup like the server does it (uvicorn), returns the messages sent by the app
+async def start_app(app) -> list:
+    received = iter([{"type": "lifespan.startup"}])
+    sent = []
+    async def receive():
+        return next(received)
+    async def send(message):
+        sent.append(message)
+    with pytest.raises(SystemExit) as exit_info:
+        await app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, receive, send)
+    assert exit_info.value.code == 1
+    return sent
+
+# test: the API doesn't start on a database with duplicate keys, the affected tables and the command are logged
+def test_app_startup_with_duplicate_keys(tmp_path, monkeypatch, caplog):
+    engine = make_engine(tmp_path)
+    monkeypatch.setattr(main, "engine", engine)
+    sent = asyncio.run(start_app(main.app))
+    assert [message["type"] for message in sent] == ["lifespan.startup.failed"]
+    # the server shows the exit, not the migration traceback
+    assert "DuplicateKeysError" not in sent[0]["message"]
+    assert "tables with duplicate natural keys: laps (1 keys)" in caplog.text
+    assert "python -m scripts.migrate_db --remove-duplicates" in caplog.text
+    assert lap_count(engine) == 5
+
+    # after removing the duplicates the API starts and the database is migrated
+    migrations.remove_duplicate_keys(engine)
+    with TestClient(main.app) as client:
+        assert client.get("/healthz").status_code == 200
+    with engine.connect() as conn:
+        assert migrations.get_schema_version(conn) == len(migrations.MIGRATIONS)
+    engine.dispose()
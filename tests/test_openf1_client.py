@@ -0,0 +1,166 @@
+import asyncio
+import json
+import threading
+import time
+import pytest
+import httpx
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from app.openf1_client import FETCH_ERRORS, OpenF1Client, iter_json_array
+
+# local stub of the OpenF1 API
+# - /v1/laps?meeting_key=N -> [{"meeting_key": N}], slower for smaller N so responses finish out of order
+# - /v1/flaky -> 503 for the first 2 requests, then 200
+# - /v1/down -> always 503
+# - /v1/broken?meeting_key=N -> 200 with a body that is not JSON for N == 2
+class StubOpenF1Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+
+        try:
+            if url.path == "/v1/laps":
+                meeting_key = int(params["meeting_key"][0])
+                time.sleep(0.01 * (10 - meeting_key % 10))
+                self._send(200, [{"meeting_key": meeting_key}])
+            elif url.path == "/v1/broken":
+                meeting_key = int(params["meeting_key"][0])
+                if meeting_key == 2:
+                    self._send_text(200, "<html>maintenance</html>")
+                else:
+                    self._send(200, [{"meeting_key": meeting_key}])
+            elif url.path == "/v1/flaky":
+                with server.lock:
+                    server.flaky_calls += 1
+                    calls = server.flaky_calls
+                self._send(503 if calls <= 2 else 200, {"calls": calls})
+            else:
+                self._send(503, {"detail": "unavailable"})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send(self, status_code, body):
+        self._send_text(status_code, json.dumps(body))
+
+    def _send_text(self, status_code, text):
+        data = text.encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenF1Handler)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.in_flight = 0
+    server.max_in_flight = 0
+    server.flaky_calls = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def base_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+# test: results come back in input order with bounded concurrency
+def test_fetch_ordered(stub_server):
+    async def run():
+        async with OpenF1Client(base_url(stub_server), max_concurrency=3, rate_per_second=1000, burst=1000) as client:
+            return [
+                (item, data)
+                async for item, data in client.fetch_ordered("laps", range(10), lambda item: {"meeting_key": item})
+            ]
+
+    results = asyncio.run(run())
+    assert [item for item, _ in results] == list(range(10))
+    assert [data[0]["meeting_key"] for _, data in results] == list(range(10))
+    assert 1 < stub_server.max_in_flight <= 3
+
+# test: a response that is not JSON is yielded as the error of its item, the other items are still fetched
+def test_fetch_ordered_invalid_json(stub_server):
+    async def run():
+        async with OpenF1Client(base_url(stub_server), rate_per_second=1000, burst=1000) as client:
+            return [
+                (item, data)
+                async for item, data in client.fetch_ordered("broken", range(5), lambda item: {"meeting_key": item})
+            ]
+
+    results = dict(asyncio.run(run()))
+    assert isinstance(results[2], FETCH_ERRORS) and isinstance(results[2], ValueError)
+    assert [results[item][0]["meeting_key"] for item in (0, 1, 3, 4)] == [0, 1, 3, 4]
+
+# test: 503 responses are retried
+def test_retry_on_server_error(stub_server):
+    async def run():
+        async with OpenF1Client(base_url(stub_server), max_retries=3, backoff=0.01, rate_per_second=1000, burst=1000) as client:
+            return await client.get_json("flaky")
+
+    assert asyncio.run(run()) == {"calls": 3}
+
+# test: after all retries the error is raised (or yielded by fetch_ordered)
+def test_retry_gives_up(stub_server):
+    async def run():
+        async with OpenF1Client(base_url(stub_server), max_retries=2, backoff=0.01, rate_per_second=1000, burst=1000) as client:
+            with pytest.raises(httpx.HTTPStatusError):
+                await client.get_json("down")
+            return [data async for _, data in client.fetch_ordered("down", [1], lambda item: {})]
+
+    results = asyncio.run(run())
+    assert isinstance(results[0], httpx.HTTPStatusError)
+    assert stub_server.requests == 6
+
+# test: token bucket limits request rate after the initial burst
+def test_rate_limit(stub_server):
+    async def run():
+        async with OpenF1Client(base_url(stub_server), max_concurrency=10, rate_per_second=20, burst=2) as client:
+            start = time.monotonic()
+            await asyncio.gather(*(client.get_json("laps", {"meeting_key": 9}) for _ in range(6)))
+            return time.monotonic() - start
+
+    # 2 requests from the burst, then 4 more at 20/s -> at least 0.2 s
+    assert asyncio.run(run()) >= 0.19
+
+async def _chunks(text, size):
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+def parse_batches(text, chunk_size, batch_size):
+    async def run():
+        return [batch async for batch in iter_json_array(_chunks(text, chunk_size), batch_size)]
+    return asyncio.run(run())
+
+# test: streamed array parsing gives the same items for any chunk size, in batches of batch_size
+def test_iter_json_array():
+    laps = [{"lap_number": n, "lap_duration": 90.5 + n, "is_pit_out_lap": n == 1, "segments": [2048, 2049]} for n in range(1, 8)]
+    laps.append({"lap_number": 8, "lap_duration": None, "name": "a, b ] \" [c"})
+    text = json.dumps(laps, indent=1) + "\n"
+
+    for chunk_size in (1, 3, 7, 64, len(text)):
+        batches = parse_batches(text, chunk_size, 3)
+        assert [len(batch) for batch in batches] == [3, 3, 2]
+        assert [lap for batch in batches for lap in batch] == laps
+
+    # a number split between chunks is not cut off
+    assert parse_batches("[1234, 5678]", 2, 10) == [[1234, 5678]]
+    assert parse_batches(" [ ] ", 1, 10) == []
+
+# test: anything but one complete JSON array is rejected
+def test_iter_json_array_invalid():
+    for text in ('{"detail": "x"}', "[1, 2", "[1 2]", "[1,]", "[1] [2]", ""):
+        with pytest.raises(ValueError):
+            parse_batches(text, 2, 10)
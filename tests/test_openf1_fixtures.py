@@ -0,0 +1,47 @@
+import asyncio
+import httpx
+from app.openf1_client import OpenF1Client
+from app.openf1_fixtures import RecordingTransport, ReplayTransport, fixture_name, read_fixture, write_fixture
+
+# stub of the live API for recording
+def live_api(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/v1/laps":
+        return httpx.Response(200, json=[{"meeting_key": int(request.url.params["meeting_key"]), "lap_number": 1}])
+    return httpx.Response(404, json={"detail": "not found"})
+
+# test: recorded responses are replayed offline, missing fixtures are 404
+def test_record_and_replay(tmp_path):
+    async def record():
+        async with OpenF1Client(transport=RecordingTransport(tmp_path, httpx.MockTransport(live_api))) as client:
+            return await client.get_json("laps", {"meeting_key": 1229})
+
+    async def replay():
+        transport = ReplayTransport(tmp_path)
+        async with OpenF1Client(base_url="http://replay/v1", transport=transport, max_retries=0) as client:
+            data = await client.get_json("laps", {"meeting_key": 1229})
+            try:
+                await client.get_json("laps", {"meeting_key": 1230})
+                missing = None
+            except httpx.HTTPStatusError as e:
+                missing = e.response.status_code
+        return data, missing, transport.requests
+
+    recorded = asyncio.run(record())
+    assert (tmp_path / fixture_name("laps", {"meeting_key": 1229})).exists()
+    assert read_fixture(tmp_path, "laps", {"meeting_key": 1229}) == recorded
+
+    data, missing, requests = asyncio.run(replay())
+    assert data == recorded == [{"meeting_key": 1229, "lap_number": 1}]
+    assert missing == 404 and requests == 2
+
+# test: requests over the replay rate limit get 429 and the client retries after Retry-After
+def test_replay_rate_limit(tmp_path):
+    write_fixture(tmp_path, "drivers", None, [])
+    transport = ReplayTransport(tmp_path, rate_per_second=50, burst=1)
+
+    async def run():
+        async with OpenF1Client(base_url="http://replay/v1", transport=transport, rate_per_second=1000, burst=1000, backoff=0.01) as client:
+            return await asyncio.gather(*(client.get_json("drivers") for _ in range(3)))
+
+    assert asyncio.run(run()) == [[], [], []]
+    assert transport.rate_limited > 0
@@ -0,0 +1,105 @@
+import os
+import threading
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from app import race_pace_model, schemas
+from app.main import app
+from ml import utils
+from ml.race_pace_random_forest import build_pipeline, prepare_data
+
+client = TestClient(app)
+
+def make_dataset(rows: int = 300) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "lap_number": rng.integers(1, 58, rows),
+        "stint_number": rng.integers(1, 4, rows),
+        "stint_lap_number": rng.integers(1, 25, rows),
+        "tyre_age_at_start": rng.integers(0, 6, rows).astype(float),
+        "pit_in_time": np.where(rng.random(rows) < 0.05, 1800 + rng.random(rows) * 3600, np.nan),
+        "pit_out_time": np.where(rng.random(rows) < 0.05, 1800 + rng.random(rows) * 3600, np.nan),
+        "driver_id": rng.choice(["max_verstappen", "lando_norris"], rows),
+        "tyre_compound": rng.choice(["SOFT", "MEDIUM", "HARD"], rows),
+        "circuit_location": "Sakhir",
+        "session_name": "Race",
+    })
+    df["lap_duration"] = 95.0 + df["stint_lap_number"] * 0.05 + rng.random(rows)
+    return df
+
+# race pace model trained on synthetic laps, saved with ml.utils.save_model in a temporary models directory
+@pytest.fixture
+def models_dir(tmp_path, monkeypatch):
+    X, y, num_attribs, cat_attribs = prepare_data(make_dataset())
+    model = build_pipeline(num_attribs, cat_attribs).fit(X, y.values.ravel())
+    utils.save_model(model, "race_pace_test", tmp_path)
+
+    monkeypatch.setattr(race_pace_model, "MODELS_DIR", tmp_path)
+    race_pace_model.model_cache.clear()
+    yield tmp_path
+    race_pace_model.model_cache.clear()
+
+LAPS = [
+    {"driver_id": "max_verstappen", "tyre_compound": "MEDIUM", "circuit_location": "Sakhir", "lap_number": 12, "stint_number": 1, "stint_lap_number": 12, "tyre_age_at_start": 0},
+    {"driver_id": "lando_norris", "tyre_compound": "HARD", "circuit_location": "Sakhir", "lap_number": 30, "stint_number": 2, "stint_lap_number": 8},
+]
+
+# test: a batch is scored with the saved model, the model is loaded once
+def test_predict_race_pace(models_dir):
+    response = client.post("/predict/race-pace", json={"model": "race_pace_test", "laps": LAPS})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["model"] == "race_pace_test"
+
+    model = joblib.load(models_dir / "race_pace_test" / "model.pkl")
+    laps = [schemas.RacePaceFeatures(**lap) for lap in LAPS]
+    expected = model.predict(race_pace_model.features_frame(laps))
+    assert np.allclose(data["lap_durations"], expected)
+
+    cached = race_pace_model.model_cache.get("race_pace_test")
+    client.post("/predict/race-pace", json={"model": "race_pace_test", "laps": LAPS[:1]})
+    assert race_pace_model.model_cache.get("race_pace_test") is cached
+
+    # retrained model (newer model.pkl) is loaded again, the old version is dropped
+    stat = os.stat(models_dir / "race_pace_test" / "model.pkl")
+    os.utime(models_dir / "race_pace_test" / "model.pkl", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert race_pace_model.model_cache.get("race_pace_test") is not cached
+    assert len(race_pace_model.model_cache._entries) == 1
+
+# test: unknown model, unknown category and invalid batches
+def test_predict_race_pace_errors(models_dir):
+    assert client.post("/predict/race-pace", json={"model": "race_pace_missing", "laps": LAPS}).status_code == 404
+    unknown_driver = [{**LAPS[0], "driver_id": "unknown_driver"}]
+    assert client.post("/predict/race-pace", json={"model": "race_pace_test", "laps": unknown_driver}).status_code == 422
+    assert client.post("/predict/race-pace", json={"model": "race_pace_test", "laps": []}).status_code == 422
+    assert client.post("/predict/race-pace", json={"model": "../race_pace_test", "laps": LAPS}).status_code == 422
+
+# test: a cached model is served while another model is loading, concurrent requests load a model once
+def test_model_cache_loads_outside_lock(models_dir, monkeypatch):
+    utils.save_model(utils.load_model("race_pace_test", models_dir), "race_pace_other", models_dir)
+    cache = race_pace_model.ModelCache()
+    cached = cache.get("race_pace_test")
+
+    load_model = utils.load_model
+    loading, release, loads = threading.Event(), threading.Event(), []
+    def slow_load_model(model_name, models_dir=None):
+        loads.append(model_name)
+        loading.set()
+        assert release.wait(5)
+        return load_model(model_name, models_dir)
+    monkeypatch.setattr(utils, "load_model", slow_load_model)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("race_pace_other"))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    assert loading.wait(5)
+    # cache hit while race_pace_other is still loading
+    assert cache.get("race_pace_test") is cached
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert loads == ["race_pace_other"]
+    assert len(results) == 2 and results[0] is results[1]
@@ -78,3 +78,30 @@ def test_delete_race():
     data = response.json()
     assert data["detail"] == "Race '9999' is deleted."
 
+# test: GET responses carry an ETag, If-None-Match returns 304 until races change
+def test_races_etag():
+    response = client.get("/races/")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = client.get("/races/", headers={"If-None-Match": etag})
+    # checking if it's code HTTP 304 Not Modified
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    response = client.post("/races/", json={
+        "race_id": 9998,
+        "race_name": "Cache Test",
+        "circuit_name": "Test",
+        "location": "Test City",
+        "country_name": "Test Country",
+        "year": 2025
+    })
+    assert response.status_code == 201
+
+    response = client.get("/races/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert 9998 in [race["race_id"] for race in response.json()]
+
+    assert client.delete("/races/9998").status_code == 200
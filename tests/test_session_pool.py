@@ -0,0 +1,20 @@
+from scripts.session_pool import SessionJob, run_sessions
+
+JOBS = [SessionJob(1, 2024, "Bahrain Grand Prix", session_id, "Race", "Race") for session_id in range(1, 6)]
+
+# worker: compact records per session, None for a session that failed to load, exception for a crashed worker
+def load(job: SessionJob):
+    if job.session_id == 2:
+        return None
+    if job.session_id == 3:
+        raise ValueError("broken session")
+    return [(job.session_id, lap_number) for lap_number in range(3)]
+
+# test: sequential and process pool runs write the same records, skipping failed sessions
+def test_run_sessions_sequential_and_parallel():
+    for workers in (1, 2):
+        written = {}
+        run_sessions(JOBS, load, lambda job, records: written.setdefault(job.session_id, records), workers)
+
+        assert sorted(written) == [1, 4, 5]
+        assert written[4] == [(4, 0), (4, 1), (4, 2)]
@@ -87,4 +87,57 @@ def test_delete_session():
     # checking if it's code HTTP 200 OK
     assert response.status_code == 200
     data = response.json()
-    assert data["detail"] == f"Session '{created_id}' is deleted."
\ No newline at end of file
+    assert data["detail"] == f"Session '{created_id}' is deleted."
+
+# test: pace summary per driver, recomputed after laps of the session change
+def test_session_pace():
+    laps = [
+        # (driver_number, lap_number, lap_duration, sector 1, sector 2, sector 3)
+        (1, 1, 90.0, 30.0, 30.5, 29.5),
+        (1, 2, 94.0, 29.8, 32.0, 32.2),
+        (1, 3, 92.0, 30.2, 30.1, 31.7),
+        (1, 4, 0, 0, 0, 0),
+        (2, 1, 91.0, 30.0, 30.0, 31.0),
+        (2, 2, 93.0, 31.0, 31.0, 31.0),
+    ]
+    lap_ids = []
+    for driver_number, lap_number, lap_duration, s1, s2, s3 in laps:
+        response = client.post("/laps/", json={
+            "race_id": 54321,
+            "session_id": random_session_id,
+            "driver_number": driver_number,
+            "lap_number": lap_number,
+            "lap_duration": lap_duration,
+            "duration_sector_1": s1,
+            "duration_sector_2": s2,
+            "duration_sector_3": s3
+        })
+        assert response.status_code == 201
+        lap_ids.append(response.json()["lap_id"])
+
+    try:
+        response = client.get(f"/sessions/{random_session_id}/pace")
+        assert response.status_code == 200
+        first, second = response.json()
+        # untimed lap (0) counts as a lap but not as a lap time
+        assert first == {
+            "driver_number": 1, "lap_count": 4, "best_lap": 90.0, "median_lap": 92.0,
+            "best_sector_1": 29.8, "best_sector_2": 30.1, "best_sector_3": 29.5,
+            "theoretical_best": pytest.approx(89.4)
+        }
+        assert second["driver_number"] == 2
+        assert second["median_lap"] == 92.0
+
+        # a faster lap for driver 2 invalidates the cached summary of this session
+        response = client.post("/laps/", json={
+            "race_id": 54321, "session_id": random_session_id, "driver_number": 2, "lap_number": 3, "lap_duration": 89.0
+        })
+        lap_ids.append(response.json()["lap_id"])
+        data = client.get(f"/sessions/{random_session_id}/pace").json()
+        assert [row["driver_number"] for row in data] == [2, 1]
+        assert data[0]["median_lap"] == 91.0
+    finally:
+        for lap_id in lap_ids:
+            assert client.delete(f"/laps/{lap_id}").status_code == 200
+
+    assert client.get(f"/sessions/{random_session_id}/pace").status_code == 404
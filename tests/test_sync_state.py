@@ -0,0 +1,81 @@
+from datetime import timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import models
+from app.repositories import sync_state_repository as repo
+
+def make_db():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([
+        models.Race(race_id=1229, race_name="Bahrain Grand Prix", year=2024),
+        models.Race(race_id=1230, race_name="Saudi Arabian Grand Prix", year=2024),
+        models.Race(race_id=1141, race_name="Abu Dhabi Grand Prix", year=2023),
+    ])
+    db.commit()
+    return db
+
+# test: only new, failed and empty races are pending, force makes everything pending
+def test_sync_state_pending_and_resume():
+    db = make_db()
+    laps_json = [{"lap_number": 1, "lap_duration": 91.2}]
+    data_hash = repo.content_hash(laps_json)
+
+    repo.record_state(db, "openf1", "laps", 1229, row_count=1, content_hash=data_hash)
+    repo.record_state(db, "openf1", "laps", 1230, status=repo.SYNC_FAILED, failure_reason="HTTP 500")
+    repo.record_state(db, "openf1", "laps", 1141, row_count=0, content_hash=repo.content_hash([]))
+    repo.record_state(db, "openf1", "stints", 1229, status=repo.SYNC_SKIPPED, failure_reason="no data")
+
+    states = repo.get_states(db, "openf1", "laps")
+    assert not repo.is_pending(states, 1229)
+    assert repo.is_pending(states, 1230) and states[(1230, 0)].failure_reason == "HTTP 500"
+    assert repo.is_pending(states, 1141)
+    assert repo.is_pending(states, 9999)
+    assert repo.is_pending(states, 1229, force=True)
+    assert not repo.is_pending(repo.get_states(db, "openf1", "stints"), 1229)
+
+    assert repo.is_unchanged(states, 1229, 0, repo.content_hash([{"lap_number": 1, "lap_duration": 91.2}]))
+    assert not repo.is_unchanged(states, 1229, 0, repo.content_hash([{"lap_number": 1, "lap_duration": 91.3}]))
+
+    # a failed retry keeps the last successful row count and hash, one row per key
+    repo.record_state(db, "openf1", "laps", 1229, status=repo.SYNC_FAILED, failure_reason="timeout")
+    state = repo.get_states(db, "openf1", "laps")[(1229, 0)]
+    assert (state.status, state.row_count, state.content_hash) == (repo.SYNC_FAILED, 1, data_hash)
+    assert db.query(models.SyncState).count() == 4
+    db.close()
+
+# test: with refetch_after, races synced successfully longer ago than that are pending again
+def test_sync_state_refetch_after():
+    db = make_db()
+    repo.record_state(db, "openf1", "stints", 1229, row_count=1, content_hash=repo.content_hash([{"stint_number": 1}]))
+    repo.record_state(db, "openf1", "stints", 1230, status=repo.SYNC_SKIPPED, failure_reason="no data")
+    states = repo.get_states(db, "openf1", "stints")
+    assert not repo.is_pending(states, 1229, refetch_after=timedelta(days=7))
+
+    states[(1229, 0)].last_attempt_at -= timedelta(days=8)
+    states[(1230, 0)].last_attempt_at -= timedelta(days=8)
+    assert repo.is_pending(states, 1229, refetch_after=timedelta(days=7))
+    assert not repo.is_pending(states, 1229)
+    assert not repo.is_pending(states, 1230, refetch_after=timedelta(days=7))
+
+    # an unchanged refetch is recorded as a new attempt, so the race isn't pending for another 7 days
+    repo.record_state(db, "openf1", "stints", 1229, row_count=1, content_hash=repo.content_hash([{"stint_number": 1}]))
+    assert not repo.is_pending(repo.get_states(db, "openf1", "stints"), 1229, refetch_after=timedelta(days=7))
+    db.close()
+
+# test: latest meeting is the latest year, then the highest meeting key
+def test_latest_race_id():
+    db = make_db()
+    assert repo.get_latest_race_id(db) == 1230
+    db.close()
+
+# test: hashing a list in batches gives the same hash as hashing the whole list
+def test_content_hasher():
+    laps_json = [{"lap_number": n, "lap_duration": 90.0 + n} for n in range(5)]
+    hasher = repo.ContentHasher()
+    hasher.update(laps_json[:2])
+    hasher.update(laps_json[2:])
+    assert hasher.count == 5
+    assert hasher.hexdigest() == repo.content_hash(laps_json)
+    assert repo.ContentHasher().hexdigest() == repo.content_hash([])
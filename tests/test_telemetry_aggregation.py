@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scripts.telemetry_utils import aggregate_lap_telemetry, aggregate_session_telemetry
+
+# synthetic FastF1-like car data (~4 samples/s) and laps of one driver
+def make_session(laps_count: int = 12, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    samples = laps_count * 400
+    session_time = pd.to_timedelta(np.cumsum(rng.uniform(0.2, 0.3, samples)), unit="s")
+    car_data = pd.DataFrame({
+        "SessionTime": session_time,
+        "Speed": rng.uniform(80, 330, samples),
+        "RPM": rng.uniform(9000, 12500, samples),
+        "nGear": rng.integers(1, 9, samples),
+        "Throttle": rng.choice([0, 0.05, 50, 100], samples),
+        "Brake": rng.random(samples) < 0.2,
+        "DRS": rng.choice([0, 1, 8, 10, 12], samples),
+    })
+    car_data.loc[5, "Speed"] = np.nan
+
+    lap_starts = pd.to_timedelta(np.arange(laps_count) * 95.0 + 2.0, unit="s")
+    laps = pd.DataFrame({
+        "LapNumber": np.arange(1, laps_count + 1, dtype=float),
+        "LapStartTime": lap_starts,
+        "Time": lap_starts + pd.to_timedelta(95.0, unit="s"),
+    })
+    # a sample exactly on the boundary between lap 2 and 3 belongs to both laps
+    car_data.loc[800, "SessionTime"] = laps.loc[1, "Time"]
+    laps.loc[2, "LapStartTime"] = laps.loc[1, "Time"]
+    # lap without start time and lap without samples are skipped
+    laps.loc[5, "LapStartTime"] = pd.NaT
+    laps.loc[len(laps)] = [laps_count + 1.0, pd.to_timedelta(10**6, unit="s"), pd.to_timedelta(10**6 + 90, unit="s")]
+    return car_data, laps
+
+# the per-lap path of the sync script: slice like Lap.get_car_data(), then aggregate_lap_telemetry
+def per_lap_aggregates(car_data: pd.DataFrame, laps: pd.DataFrame) -> dict:
+    result = {}
+    for _, lap in laps.iterrows():
+        if pd.isna(lap["LapNumber"]) or pd.isna(lap["LapStartTime"]) or pd.isna(lap["Time"]):
+            continue
+        mask = (car_data["SessionTime"] >= lap["LapStartTime"]) & (car_data["SessionTime"] <= lap["Time"])
+        aggregate = aggregate_lap_telemetry(car_data[mask].reset_index(drop=True))
+        if aggregate:
+            result[int(lap["LapNumber"])] = aggregate
+    return result
+
+# test: session aggregation matches the per-lap aggregation
+def test_session_aggregation_matches_per_lap():
+    car_data, laps = make_session()
+    expected = per_lap_aggregates(car_data, laps)
+    result = aggregate_session_telemetry(car_data, laps)
+
+    assert result.keys() == expected.keys()
+    assert 6 not in result and 13 not in result
+    for lap_number, metrics in expected.items():
+        assert result[lap_number]["median_gear"] == metrics["median_gear"]
+        assert result[lap_number]["throttle_usage"] == metrics["throttle_usage"]
+        assert result[lap_number]["brake_usage"] == metrics["brake_usage"]
+        assert result[lap_number]["drs_usage"] == metrics["drs_usage"]
+        assert result[lap_number]["avg_speed"] == pytest.approx(metrics["avg_speed"], rel=1e-12)
+        assert result[lap_number]["mean_rpm"] == pytest.approx(metrics["mean_rpm"], rel=1e-12)
+
+# test: numeric brake, missing columns and unsorted car data
+def test_session_aggregation_numeric_brake_and_missing_columns():
+    car_data, laps = make_session(laps_count=4, seed=3)
+    car_data["Brake"] = car_data["Brake"].astype(float) * 0.5
+    car_data = car_data.drop(columns=["DRS"]).sample(frac=1, random_state=1)
+
+    expected = per_lap_aggregates(car_data.sort_values("SessionTime", kind="stable"), laps)
+    result = aggregate_session_telemetry(car_data, laps)
+
+    assert result.keys() == expected.keys()
+    for lap_number, metrics in expected.items():
+        assert result[lap_number]["drs_usage"] is None
+        assert result[lap_number]["brake_usage"] == metrics["brake_usage"]
+        assert result[lap_number]["median_gear"] == metrics["median_gear"]
+        assert result[lap_number]["avg_speed"] == pytest.approx(metrics["avg_speed"], rel=1e-12)
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app import telemetry_store
+from scripts.telemetry_utils import aggregate_lap_telemetry, aggregate_session_telemetry
+from tests.test_telemetry_aggregation import make_session
+
+# test: stored laps are memory-mapped slices with the same samples as Lap.get_car_data()
+def test_write_and_read_laps(tmp_path):
+    car_data, laps = make_session()
+    shuffled = car_data.sample(frac=1, random_state=1)
+    assert telemetry_store.write_driver_telemetry(9158, 44, shuffled, laps, root=tmp_path) is not None
+
+    stored = telemetry_store.open_driver_telemetry(9158, 44, root=tmp_path)
+    assert telemetry_store.session_driver_numbers(9158, root=tmp_path) == [44]
+    assert telemetry_store.open_driver_telemetry(9158, 1, root=tmp_path) is None
+    assert stored.channels == list(telemetry_store.CHANNEL_DTYPES)
+    # lap 6 has no start time, lap 13 has no samples
+    assert stored.lap_numbers == [1, 2, 3, 4, 5, 7, 8, 9, 10, 11, 12]
+    assert stored.lap(6) is None
+
+    for lap_number in (1, 3, 12):
+        lap = laps[laps["LapNumber"] == lap_number].iloc[0]
+        expected = car_data[(car_data["SessionTime"] >= lap["LapStartTime"]) & (car_data["SessionTime"] <= lap["Time"])]
+        expected = expected.sort_values("SessionTime", kind="stable")
+        samples = stored.lap(lap_number)
+        assert isinstance(samples["Speed"].base, np.memmap)
+        assert np.array_equal(samples["SessionTime"], telemetry_store._session_time_ns(expected["SessionTime"]))
+        assert np.array_equal(samples["nGear"], expected["nGear"].to_numpy(dtype=np.float32))
+        assert np.array_equal(samples["Brake"] > 0, expected["Brake"].to_numpy())
+
+    # the boundary sample belongs to lap 2 and lap 3
+    assert stored.lap(2)["SessionTime"][-1] == stored.lap(3)["SessionTime"][0]
+    # distance grows with speed over time
+    distance = stored.column("Distance")
+    assert distance[0] == 0 and np.all(np.diff(distance) >= 0)
+
+# test: aggregates computed from stored laps match the sync script's aggregates, a rewrite replaces the partition
+def test_aggregates_from_store(tmp_path):
+    car_data, laps = make_session(laps_count=4, seed=3)
+    car_data = car_data.drop(columns=["DRS"])
+    telemetry_store.write_driver_telemetry(9158, 1, car_data, laps, root=tmp_path)
+    telemetry_store.write_driver_telemetry(9158, 1, car_data, laps, root=tmp_path)
+    assert [child.name for child in (tmp_path / "9158").iterdir()] == ["1"]
+
+    stored = telemetry_store.open_driver_telemetry(9158, 1, root=tmp_path)
+    assert "DRS" not in stored.channels
+    expected = aggregate_session_telemetry(car_data, laps)
+    for lap_number in stored.lap_numbers:
+        result = aggregate_lap_telemetry(pd.DataFrame(stored.lap(lap_number, ["Speed", "RPM", "nGear", "Throttle", "Brake"])))
+        assert result["avg_speed"] == pytest.approx(expected[lap_number]["avg_speed"], rel=1e-6)
+        assert result["median_gear"] == expected[lap_number]["median_gear"]
+        assert result["brake_usage"] == expected[lap_number]["brake_usage"]
+        assert result["throttle_usage"] == expected[lap_number]["throttle_usage"]
@@ -0,0 +1,104 @@
+import os
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app import telemetry_store
+from app.main import app
+from app.telemetry_trace import TraceCache, lttb_indices, trace_cache
+from tests.test_telemetry_aggregation import make_session
+
+client = TestClient(app)
+
+# random session_id so cached responses of earlier runs don't match
+SESSION_ID = int(np.random.default_rng().integers(10**6, 10**7))
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(telemetry_store, "STORE_ROOT", tmp_path)
+    car_data, laps = make_session()
+    telemetry_store.write_driver_telemetry(SESSION_ID, 44, car_data, laps)
+    yield tmp_path
+    trace_cache.clear()
+
+# textbook LTTB, one bucket at a time
+def reference_lttb(x, y, threshold):
+    every = (len(x) - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start, stop = int(i * every) + 1, int((i + 1) * every) + 1
+        next_start, next_stop = stop, min(int((i + 2) * every) + 1, len(x))
+        if i == threshold - 3:
+            cx, cy = x[-1], y[-1]
+        else:
+            cx, cy = x[next_start:next_stop].mean(), y[next_start:next_stop].mean()
+        areas = [abs((x[a] - cx) * (y[j] - y[a]) - (x[a] - x[j]) * (cy - y[a])) for j in range(start, stop)]
+        a = start + int(np.argmax(areas))
+        selected.append(a)
+    return selected + [len(x) - 1]
+
+# test: LTTB keeps first and last point, the peaks and returns exactly `threshold` points
+def test_lttb_indices():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    y[333] = 10
+    y[777] = -10
+    indices = lttb_indices(x, y, 50)
+    assert len(indices) == 50
+    assert indices[0] == 0 and indices[-1] == 999
+    assert np.all(np.diff(indices) > 0)
+    assert 333 in indices and 777 in indices
+    assert np.array_equal(lttb_indices(x[:10], y[:10], 50), np.arange(10))
+
+    # small (plain Python) and large (numpy) buckets select the same points as the textbook version
+    rng = np.random.default_rng(1)
+    x = np.cumsum(rng.uniform(0.5, 1.5, 3000))
+    y = rng.normal(size=3000)
+    for threshold in (20, 500, 1700):
+        assert lttb_indices(x, y, threshold).tolist() == reference_lttb(x, y, threshold)
+
+# test: requests are reduced from the smallest pyramid level with enough points
+def test_trace_pyramid(store):
+    stored = telemetry_store.open_driver_telemetry(SESSION_ID, 44)
+    trace = TraceCache().get(stored, 3)
+    assert [len(level) for level in trace.levels] == [trace.samples, trace.samples // 2, trace.samples // 4]
+    for points in (10, 100, 150, 300):
+        indices = trace.indices(points)
+        assert len(indices) == points
+        assert np.all(np.diff(indices) > 0)
+    assert len(trace.indices(10000)) == trace.samples
+
+# test: GET /telemetry/trace returns a reduced trace, 404 for laps that are not stored
+def test_get_telemetry_trace(store):
+    response = client.get("/telemetry/trace", params={"session_id": SESSION_ID, "driver_number": 44, "lap_number": 3, "points": 100})
+    # checking if it's code HTTP 200 OK
+    assert response.status_code == 200
+    data = response.json()
+    assert data["points"] == 100 and data["samples"] > 100
+    assert len(data["distance"]) == len(data["time"]) == len(data["speed"]) == len(data["throttle"]) == len(data["brake"]) == 100
+    assert data["distance"][0] == 0 and data["time"][0] == 0
+    assert all(a < b for a, b in zip(data["time"], data["time"][1:]))
+
+    response = client.get("/telemetry/trace", params={"session_id": SESSION_ID, "driver_number": 44, "lap_number": 6})
+    assert response.status_code == 404
+    response = client.get("/telemetry/trace", params={"session_id": SESSION_ID, "driver_number": 1, "lap_number": 3})
+    assert response.status_code == 404
+    response = client.get("/telemetry/trace", params={"session_id": SESSION_ID, "driver_number": 44, "lap_number": 3, "points": 2})
+    assert response.status_code == 422
+
+# test: traces are not served from the response cache, a rewritten partition is returned right away
+def test_trace_not_cached(store):
+    params = {"session_id": SESSION_ID, "driver_number": 44, "lap_number": 3, "points": 50}
+    response = client.get("/telemetry/trace", params=params)
+    assert response.status_code == 200 and "etag" not in response.headers
+
+    car_data, laps = make_session()
+    car_data["Speed"] = car_data["Speed"] + 10
+    telemetry_store.write_driver_telemetry(SESSION_ID, 44, car_data, laps)
+    # modification time of the rewritten partition differs also on coarse file system clocks
+    index_file = telemetry_store.driver_path(SESSION_ID, 44) / telemetry_store.LAP_INDEX_FILE
+    stat = os.stat(index_file)
+    os.utime(index_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    rewritten = client.get("/telemetry/trace", params=params).json()
+    assert rewritten["speed"] != response.json()["speed"]